@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/1.11/ref/settings/
 from ipaddress import IPv4Network
 from os import environ
 from pathlib import Path
+from tempfile import gettempdir
 from typing import List
 
 import dj_database_url
@@ -229,6 +230,40 @@ GITHUB_APP_ID = env("GITHUB_APP_ID", default=0, type_=int)
 # Ugly hack to fix https://github.com/moby/moby/issues/12997
 DOCKER_GITHUB_APP_KEY = env("DOCKER_GITHUB_APP_KEY", default="").replace("\\n", "\n")
 GITHUB_APP_KEY = bytes(env("GITHUB_APP_KEY", default=DOCKER_GITHUB_APP_KEY), "utf-8")
+# Worker-local store of extracted repository snapshots, keyed by repo and
+# commit SHA. Set the directory to an empty string to disable it:
+GITHUB_SNAPSHOT_CACHE_DIR = env(
+    "GITHUB_SNAPSHOT_CACHE_DIR", default=str(Path(gettempdir(), "metecho-snapshots"))
+)
+GITHUB_SNAPSHOT_CACHE_MAX_BYTES = env(
+    "GITHUB_SNAPSHOT_CACHE_MAX_BYTES", default=2 * 1024 ** 3, type_=int
+)
+# Conditional-request cache for GitHub REST reads; 0 disables it:
+GITHUB_CACHE_TIMEOUT = env("GITHUB_CACHE_TIMEOUT", default=24 * 60 * 60, type_=int)
+GITHUB_CACHE_MAX_BYTES = env("GITHUB_CACHE_MAX_BYTES", default=1024 ** 2, type_=int)
+# Batch branch, pull request and collaborator reads through GraphQL:
+GITHUB_USE_GRAPHQL = env("GITHUB_USE_GRAPHQL", default=False, type_=boolish)
+# Without GraphQL, sparse checkouts of more files than this fetch the
+# whole archive instead of one blob per request:
+GITHUB_SPARSE_MAX_BLOBS = env("GITHUB_SPARSE_MAX_BLOBS", default=20, type_=int)
+# Requests left in a GitHub rate limit budget that bulk jobs won't spend:
+GITHUB_RATELIMIT_RESERVE = env("GITHUB_RATELIMIT_RESERVE", default=500, type_=int)
+# Longest interactive jobs will wait for a spent budget to reset:
+GITHUB_RATELIMIT_MAX_WAIT = env("GITHUB_RATELIMIT_MAX_WAIT", default=60, type_=int)
+# Logging in doesn't resync a user's repositories more often than this:
+GITHUB_REPOSITORY_SYNC_MINUTES = env(
+    "GITHUB_REPOSITORY_SYNC_MINUTES", default=60, type_=int
+)
+
+# Whether a user's org is a Dev Hub is cached for this many seconds (0
+# disables the cache)...
+DEVHUB_ENABLED_CACHE_TIMEOUT = env(
+    "DEVHUB_ENABLED_CACHE_TIMEOUT", default=7 * 24 * 60 * 60, type_=int
+)
+# ...and checked again in the background once it's this old:
+DEVHUB_ENABLED_REVALIDATE_AFTER = env(
+    "DEVHUB_ENABLED_REVALIDATE_AFTER", default=60 * 60, type_=int
+)
 
 
 # Salesforce Devhub settings:
@@ -407,14 +442,75 @@ CACHES = {
         },
     }
 }
+REDIS_JOB_TIMEOUT = env("REDIS_JOB_TIMEOUT", type_=int, default=3600)
+# Jobs are routed by class to their own queues (see
+# metecho/api/queueing.py). Workers pick the next queue to take a job from
+# at random, in proportion to these weights, so no class is starved. The
+# classes with long jobs are split by project into RQ_QUEUE_SHARDS queues,
+# so that one project's jobs can't hold up every other project's:
+RQ_JOB_CLASSES = {
+    "interactive": {
+        "timeout": env("RQ_INTERACTIVE_TIMEOUT", type_=int, default=15 * 60),
+        "weight": env("RQ_INTERACTIVE_WEIGHT", type_=int, default=8),
+        "sharded": False,
+    },
+    "polling": {
+        "timeout": env("RQ_POLLING_TIMEOUT", type_=int, default=10 * 60),
+        "weight": env("RQ_POLLING_WEIGHT", type_=int, default=4),
+        "sharded": False,
+    },
+    "provisioning": {
+        "timeout": REDIS_JOB_TIMEOUT,
+        "weight": env("RQ_PROVISIONING_WEIGHT", type_=int, default=2),
+        "sharded": True,
+    },
+    "bulk": {
+        "timeout": REDIS_JOB_TIMEOUT,
+        "weight": env("RQ_BULK_WEIGHT", type_=int, default=1),
+        "sharded": True,
+    },
+}
+RQ_QUEUE_SHARDS = env("RQ_QUEUE_SHARDS", type_=int, default=4)
+# The default queue only holds jobs scheduled before this routing existed:
 RQ_QUEUES = {
     "default": {
         "USE_REDIS_CACHE": "default",
-        "DEFAULT_TIMEOUT": env("REDIS_JOB_TIMEOUT", type_=int, default=3600),
+        "DEFAULT_TIMEOUT": REDIS_JOB_TIMEOUT,
         "DEFAULT_RESULT_TTL": 720,
     }
 }
-RQ = {"WORKER_CLASS": "metecho.rq_worker.ConnectionClosingWorker"}
+RQ_QUEUE_WEIGHTS = {"default": 1}
+RQ_JOB_CLASS_QUEUES = {}
+for job_class, options in RQ_JOB_CLASSES.items():
+    if options["sharded"] and RQ_QUEUE_SHARDS > 1:
+        names = [f"{job_class}-{shard}" for shard in range(RQ_QUEUE_SHARDS)]
+    else:
+        names = [job_class]
+    RQ_JOB_CLASS_QUEUES[job_class] = names
+    for name in names:
+        RQ_QUEUES[name] = {
+            "USE_REDIS_CACHE": "default",
+            "DEFAULT_TIMEOUT": options["timeout"],
+            "DEFAULT_RESULT_TTL": 720,
+        }
+        # Each queue gets its share of its class's weight:
+        RQ_QUEUE_WEIGHTS[name] = options["weight"] / len(names)
+RQ = {"WORKER_CLASS": "metecho.rq_worker.WeightedWorker"}
+# Workers fork a work horse per job. With RQ_WORKER_PRELOAD, they import
+# these modules and build the CumulusCI universal config before forking,
+# instead of every horse doing it again:
+RQ_WORKER_PRELOAD = env("RQ_WORKER_PRELOAD", type_=boolish, default=False)
+RQ_WORKER_PRELOAD_MODULES = [
+    "bs4",
+    "cumulusci.core.flowrunner",
+    "cumulusci.core.keychain",
+    "github3",
+    "simple_salesforce",
+    "metecho.api.jobs",
+]
+# A deduplicated job (see metecho/api/queueing.py) that is still queued or
+# running keeps identical jobs from being enqueued for up to this long:
+JOB_DEDUP_TIMEOUT = env("JOB_DEDUP_TIMEOUT", type_=int, default=2 * 60 * 60)
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -505,6 +601,29 @@ LOGGING = {
 }
 
 API_PAGE_SIZE = env("API_PAGE_SIZE", type_=int, default=50)
+# Task payloads include this many of the latest commits:
+TASK_RECENT_COMMITS = env("TASK_RECENT_COMMITS", type_=int, default=25)
+# Slug lookups are cached for this many seconds:
+SLUG_CACHE_TIMEOUT = env("SLUG_CACHE_TIMEOUT", type_=int, default=24 * 60 * 60)
+
+# Only the last this-many bytes of the CumulusCI log of a scratch org flow
+# run are kept, compressed in chunks of this many bytes:
+SCRATCH_ORG_LOG_MAX_BYTES = env(
+    "SCRATCH_ORG_LOG_MAX_BYTES", type_=int, default=5 * 1024 * 1024
+)
+SCRATCH_ORG_LOG_CHUNK_BYTES = env(
+    "SCRATCH_ORG_LOG_CHUNK_BYTES", type_=int, default=256 * 1024
+)
+# Run scratch org flows with CumulusCI's Python API in the job's own
+# process, instead of in a cci subprocess:
+RUN_FLOWS_IN_PROCESS = env("RUN_FLOWS_IN_PROCESS", type_=boolish, default=False)
+# While a flow runs, its latest output is sent to the scratch org's
+# subscribers at most every this-many seconds, up to this many lines at a
+# time:
+SCRATCH_ORG_PROGRESS_INTERVAL = env(
+    "SCRATCH_ORG_PROGRESS_INTERVAL", type_=float, default=2
+)
+SCRATCH_ORG_PROGRESS_LINES = env("SCRATCH_ORG_PROGRESS_LINES", type_=int, default=20)
 
 # New feature branch prefix:
 BRANCH_PREFIX = env("BRANCH_PREFIX", default=None)
@@ -12,4 +12,4 @@ TEMPLATES[0]["DIRS"] = [
     str(PROJECT_ROOT / "templates"),
 ]
 
-RQ = {"WORKER_CLASS": "metecho.rq_worker.ConnectionClosingHerokuWorker"}
+RQ = {"WORKER_CLASS": "metecho.rq_worker.WeightedHerokuWorker"}
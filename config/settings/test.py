@@ -5,3 +5,8 @@ CHANNEL_LAYERS = {
 }
 
 DEVHUB_USERNAME = None
+GITHUB_SNAPSHOT_CACHE_DIR = ""
+GITHUB_CACHE_TIMEOUT = 0
+DEVHUB_ENABLED_CACHE_TIMEOUT = 0
+SLUG_CACHE_TIMEOUT = 0
+JOB_DEDUP_TIMEOUT = 0
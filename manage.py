@@ -8,6 +8,7 @@ ALLOWED_PRODUCTION_COMMANDS = [
     "migrate",
     "rqscheduler",
     "rqworker",
+    "rqworker_all_queues",
     "showmigrations",
 ]
 
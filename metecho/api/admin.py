@@ -119,7 +119,6 @@ class TaskAdmin(admin.ModelAdmin):
         ("name", "epic"),
         "description",
         ("branch_name", "org_config_name"),
-        "commits",
         "origin_sha",
         "metecho_commits",
         "has_unmerged_commits",
@@ -130,7 +129,6 @@ class TaskAdmin(admin.ModelAdmin):
         ("assigned_dev", "assigned_qa"),
     )
     readonly_fields = (
-        "commits",
         "reviewers",
         "get_all_users_in_commits",
     )
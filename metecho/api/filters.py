@@ -1,10 +1,11 @@
 from django_filters import rest_framework as filters
 
 from .models import Epic, Project, ScratchOrg, Task
+from .slug_cache import get_ids_for_slug
 
 
 def slug_is_active(queryset, name, value):
-    return queryset.filter(**{f"{name}__slug": value, f"{name}__is_active": True})
+    return queryset.filter(pk__in=get_ids_for_slug(queryset.model, name, value))
 
 
 class ProjectFilter(filters.FilterSet):
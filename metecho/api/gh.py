@@ -2,31 +2,57 @@
 GitHub utilities
 """
 
+import base64
 import contextlib
+import hashlib
 import hmac
-import itertools
 import logging
 import os
 import pathlib
 import shutil
-import zipfile
-from glob import glob
+import tarfile
+from datetime import timedelta
+from fnmatch import fnmatchcase
 
-from cumulusci.utils import temporary_dir
+from cumulusci.utils import cd, temporary_dir
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
-from github3 import GitHub, login
-from github3.exceptions import NotFoundError, UnprocessableEntity
-
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from github3 import GitHub, apps, login
+from github3.exceptions import NotFoundError, UnprocessableEntity, error_for
+from github3.session import AppInstallationTokenAuth
+from sfdo_template_helpers.crypto import fernet_decrypt, fernet_encrypt
+
+from . import gh_cache, gh_ratelimit, gh_snapshots
 from .custom_cci_configs import MetechoUniversalConfig, ProjectConfig
+from .gh_graphql import get_blob_texts
 
 logger = logging.getLogger(__name__)
 
 
-ZIP_FILE_NAME = "archive.zip"
-
-
-class UnsafeZipfileError(Exception):
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+# The files that jobs which only read project configuration need. This
+# includes the directories under unpackaged/, whose names are the
+# possible commit targets:
+CONFIG_PATHS = (
+    "cumulusci.yml",
+    "sfdx-project.json",
+    "orgs/*.json",
+    "unpackaged/*/*",
+)
+APP_INSTALLATION_KEY = "gh-app-installation:{owner}/{name}"
+APP_TOKEN_KEY = "gh-app-token:{installation_id}"
+# Installation tokens last an hour; we stop handing them out this long
+# before they expire, and sessions swap theirs for a fresh one this long
+# before it expires, as jobs can run for longer than a token lasts:
+APP_TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+# The blob SHA of cumulusci.yml on a repo's default branch:
+CONFIG_SHA_KEY = "gh-config-sha:{repo_id}"
+
+
+class UnsafeArchiveError(Exception):
     pass
 
 
@@ -34,42 +60,132 @@ class NoGitHubTokenError(Exception):
     pass
 
 
+class RefreshingAppInstallationTokenAuth(AppInstallationTokenAuth):
+    """
+    Authenticates as a GitHub app installation, getting a new token from
+    get_app_installation_token when the current one is about to expire,
+    rather than raising AppInstallationTokenExpired.
+    """
+
+    def __init__(self, installation_id, token):
+        self.installation_id = installation_id
+        super().__init__(token["token"], token["expires_at"])
+
+    def __call__(self, request):
+        if timezone.now() + APP_TOKEN_REFRESH_MARGIN >= self.expires_at:
+            self.__init__(
+                self.installation_id, get_app_installation_token(self.installation_id)
+            )
+        return super().__call__(request)
+
+
 def gh_given_user(user):
     try:
-        token = (
-            user.socialaccount_set.get(provider="github").socialtoken_set.get().token
-        )
+        token = user.gh_token
     except (ObjectDoesNotExist, MultipleObjectsReturned):
         raise NoGitHubTokenError
-    return login(token=token)
+    return gh_cache.install_cache(login(token=token), f"user:{user.id}")
+
+
+def get_app_installation_id(repo_owner, repo_name):
+    """
+    Look up the ID of the GitHub app installation for a repo. This is
+    shared by all processes through the cache, and never expires on its
+    own, as installations rarely change.
+    """
+    key = APP_INSTALLATION_KEY.format(owner=repo_owner, name=repo_name)
+    installation_id = cache.get(key)
+    if installation_id is None:
+        gh = GitHub()
+        gh.login_as_app(settings.GITHUB_APP_KEY, settings.GITHUB_APP_ID, expire_in=120)
+        installation = gh.app_installation_for_repository(repo_owner, repo_name)
+        installation_id = installation.id
+        cache.set(key, installation_id, timeout=None)
+    return installation_id
+
+
+def get_app_installation_token(installation_id):
+    """
+    Get an access token for a GitHub app installation, as the dict that
+    GitHub returns, with "token" and "expires_at" keys.
+
+    Tokens are shared by all processes through the cache, encrypted, and
+    are replaced shortly before they expire.
+    """
+    key = APP_TOKEN_KEY.format(installation_id=installation_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return {
+            "token": fernet_decrypt(cached["token"]),
+            "expires_at": cached["expires_at"],
+        }
+
+    gh = GitHub()
+    headers = apps.create_jwt_headers(
+        settings.GITHUB_APP_KEY, settings.GITHUB_APP_ID, expire_in=30
+    )
+    url = gh._build_url("app", "installations", str(installation_id), "access_tokens")
+    with gh.session.no_auth():
+        token_json = gh._json(gh.session.post(url, headers=headers), 201)
+    token = {"token": token_json["token"], "expires_at": token_json["expires_at"]}
+
+    expires_at = parse_datetime(token["expires_at"])
+    timeout = (expires_at - timezone.now() - APP_TOKEN_REFRESH_MARGIN).total_seconds()
+    if timeout > 0:
+        cache.set(
+            key,
+            {
+                "token": fernet_encrypt(token["token"]),
+                "expires_at": token["expires_at"],
+            },
+            timeout=timeout,
+        )
+    return token
 
 
 def gh_as_app(repo_owner, repo_name):
-    app_id = settings.GITHUB_APP_ID
-    app_key = settings.GITHUB_APP_KEY
+    installation_id = get_app_installation_id(repo_owner, repo_name)
+    try:
+        token = get_app_installation_token(installation_id)
+    except NotFoundError:
+        # The app was most likely reinstalled, and so has a new
+        # installation ID:
+        cache.delete(APP_INSTALLATION_KEY.format(owner=repo_owner, name=repo_name))
+        installation_id = get_app_installation_id(repo_owner, repo_name)
+        token = get_app_installation_token(installation_id)
     gh = GitHub()
-    gh.login_as_app(app_key, app_id, expire_in=120)
-    installation = gh.app_installation_for_repository(repo_owner, repo_name)
-    gh.login_as_app_installation(app_key, app_id, installation.id)
-    return gh
+    gh.session.auth = RefreshingAppInstallationTokenAuth(installation_id, token)
+    return gh_cache.install_cache(gh, f"installation:{installation_id}")
+
+
+def get_app_installation_budget(repo_owner, repo_name):
+    """
+    Return the last known rate-limit budget of the app installation for a
+    repo, as described in gh_ratelimit.get_budget, without making any
+    requests.
+    """
+    key = APP_INSTALLATION_KEY.format(owner=repo_owner, name=repo_name)
+    installation_id = cache.get(key)
+    if installation_id is None:
+        return None
+    return gh_ratelimit.get_budget(f"installation:{installation_id}")
 
 
 def get_all_org_repos(user):
+    """
+    Yield the repos the user can push to, a page at a time, as GitHub
+    returns them.
+    """
     gh = gh_given_user(user)
-    repos = set(
-        [repo for repo in gh.repositories() if repo.permissions.get("push", False)]
-    )
-    return repos
+    for repo in gh.repositories():
+        if repo.permissions.get("push", False):
+            yield repo
 
 
 def is_safe_path(path):
     return not os.path.isabs(path) and ".." not in path.split(os.path.sep)
 
 
-def zip_file_is_safe(zip_file):
-    return all(is_safe_path(info.filename) for info in zip_file.infolist())
-
-
 def get_repo_info(user, repo_id=None, repo_owner=None, repo_name=None):
     if user is None and (repo_owner is None or repo_name is None):
         raise TypeError("If user=None, you must call with repo_owner and repo_name")
@@ -79,38 +195,241 @@ def get_repo_info(user, repo_id=None, repo_owner=None, repo_name=None):
     return gh.repository_with_id(repo_id)
 
 
-def get_zip_file(repo, commit_ish):
-    repo.archive("zipball", path=ZIP_FILE_NAME, ref=commit_ish)
-    return zipfile.ZipFile(ZIP_FILE_NAME)
+def get_archive_stream(repo, commit_ish):
+    """
+    Start downloading the tarball of the repo at commit_ish, without
+    reading the body yet.
+    """
+    url = repo._build_url("tarball", commit_ish, base_url=repo._api)
+    resp = repo._get(url, allow_redirects=True, stream=True)
+    if resp.status_code != 200:
+        raise error_for(resp)
+    resp.raw.decode_content = True
+    return resp
 
 
-def log_unsafe_zipfile_error(repo_url, commit_ish):
+def log_unsafe_archive_error(repo_url, commit_ish):
     """
-    It is very unlikely that we will get an unsafe zipfile, as we get it
+    It is very unlikely that we will get an unsafe archive, as we get it
     from GitHub, but must be considered.
     """
     url = f"{repo_url}#{commit_ish}"
-    logger.error(f"Malformed or malicious zip file from {url}.")
+    logger.error(f"Malformed or malicious archive from {url}.")
+
+
+def strip_archive_root(name):
+    # We know that the tarball contains a single root directory named
+    # something like "{owner}-{repo_name}-{sha}" by GitHub's convention,
+    # and we want its contents in the cwd:
+    _root, _sep, path = name.partition("/")
+    return path
+
+
+def extract_archive(fileobj, repo_url, commit_ish):
+    """
+    Extract a tarball into the cwd in a single streaming pass, checking
+    each member's path as we go and writing it straight to its final
+    place.
+
+    Links are written as copies of what they point to, once everything
+    else is extracted, as long as that's inside the checkout; other links
+    and special members are skipped, with a warning.
+    """
+    links = []
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            path = strip_archive_root(member.name)
+            if not path:
+                continue
+            if not is_safe_path(path):
+                log_unsafe_archive_error(repo_url, commit_ish)
+                raise UnsafeArchiveError
+            if member.issym() or member.islnk():
+                links.append((path, get_link_target(path, member)))
+            elif member.isdir():
+                os.makedirs(path, exist_ok=True)
+            elif member.isfile():
+                parent = os.path.dirname(path)
+                if parent:
+                    os.makedirs(parent, exist_ok=True)
+                with tar.extractfile(member) as src, open(path, "wb") as dest:
+                    shutil.copyfileobj(src, dest, ARCHIVE_CHUNK_SIZE)
+                if member.mode & 0o111:
+                    os.chmod(path, 0o755)
+            else:
+                log_skipped_archive_member(repo_url, commit_ish, path)
+    copy_link_targets(links, repo_url, commit_ish)
+
+
+def get_link_target(path, member):
+    if member.islnk():
+        # Hard links name their target by its path in the archive:
+        return strip_archive_root(member.linkname)
+    return os.path.normpath(os.path.join(os.path.dirname(path), member.linkname))
+
+
+def copy_link_targets(links, repo_url, commit_ish):
+    """
+    Write each link as a copy of its target, if that's in the checkout.
+    Links to links are copied once their target has been.
+    """
+    while links:
+        remaining = []
+        for path, target in links:
+            if not target or not is_safe_path(target):
+                log_skipped_archive_member(repo_url, commit_ish, path)
+            elif not os.path.exists(target):
+                remaining.append((path, target))
+            else:
+                parent = os.path.dirname(path)
+                if parent:
+                    os.makedirs(parent, exist_ok=True)
+                if os.path.isdir(target):
+                    shutil.copytree(target, path)
+                else:
+                    shutil.copy2(target, path)
+        if len(remaining) == len(links):
+            for path, _target in remaining:
+                log_skipped_archive_member(repo_url, commit_ish, path)
+            return
+        links = remaining
+
+
+def log_skipped_archive_member(repo_url, commit_ish, path):
+    url = f"{repo_url}#{commit_ish}"
+    logger.warning(f"Skipped {path} in archive from {url}.")
+
+
+def resolve_commit_sha(repo, commit_ish):
+    """
+    Resolve a branch name, tag or SHA to a full commit SHA, asking GitHub
+    for just the SHA rather than the whole commit.
+    """
+    url = repo._build_url("commits", commit_ish, base_url=repo._api)
+    resp = repo._get(url, headers={"Accept": "application/vnd.github.v3.sha"})
+    if resp.status_code != 200:
+        raise error_for(resp)
+    return resp.text.strip()
+
+
+def extract_repo(repo, commit_ish):
+    """
+    Download and extract the repo at commit_ish into the cwd.
+    """
+    resp = get_archive_stream(repo, commit_ish)
+    try:
+        extract_archive(resp.raw, repo.html_url, commit_ish)
+    finally:
+        resp.close()
+
+
+def path_matches(path, patterns):
+    """
+    Match a slash-separated path against glob patterns, one segment at a
+    time, so that "*" never matches across a "/".
+    """
+    parts = path.split("/")
+    for pattern in patterns:
+        pattern_parts = pattern.split("/")
+        if len(parts) == len(pattern_parts) and all(
+            fnmatchcase(part, pattern_part)
+            for part, pattern_part in zip(parts, pattern_parts)
+        ):
+            return True
+    return False
+
+
+def extract_repo_paths(repo, commit_ish, paths):
+    """
+    Fetch only the files matching the glob patterns in paths into the
+    cwd, using the Git trees API and one GraphQL query for the blobs
+    rather than downloading the whole archive. Directories matching a
+    pattern are created even though their contents are not fetched.
+
+    Without GraphQL each blob takes a request of its own, so above
+    GITHUB_SPARSE_MAX_BLOBS matches this checks out the whole repo
+    instead. Sparse checkouts are only ever read, so that checkout is
+    hardlinked from the snapshot store.
+    """
+    sha = resolve_commit_sha(repo, commit_ish)
+    tree = repo.tree(sha, recursive=True)
+    if tree.as_dict().get("truncated"):
+        # The repo is too big to list in one request, so we can't know
+        # we've found every match:
+        checkout_repo(repo, sha, read_only=True)
+        return
+    items = [item for item in tree.tree if path_matches(item.path, paths)]
+    blobs = [item for item in items if item.type == "blob"]
+    if (
+        not settings.GITHUB_USE_GRAPHQL
+        and len(blobs) > settings.GITHUB_SPARSE_MAX_BLOBS
+    ):
+        checkout_repo(repo, sha, read_only=True)
+        return
+    for item in items:
+        if not is_safe_path(item.path):
+            log_unsafe_archive_error(repo.html_url, commit_ish)
+            raise UnsafeArchiveError
+    texts = {}
+    if settings.GITHUB_USE_GRAPHQL and blobs:
+        texts = get_blob_texts(repo, sha, [item.path for item in blobs])
+    for item in items:
+        if item.type == "tree":
+            os.makedirs(item.path, exist_ok=True)
+            continue
+        if item.type != "blob":
+            continue
+        parent = os.path.dirname(item.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        if texts.get(item.path) is not None:
+            content = texts[item.path].encode("utf-8")
+        else:
+            # Binary or too big for GraphQL:
+            blob = repo.blob(item.sha)
+            if blob.encoding == "base64":
+                content = base64.b64decode(blob.content)
+            else:
+                content = blob.content.encode("utf-8")
+        pathlib.Path(item.path).write_bytes(content)
+
+
+def checkout_repo(repo, commit_ish, *, read_only=False):
+    """
+    Fill the cwd with the whole repo at commit_ish, from the snapshot
+    store if it's enabled.
+
+    Pass read_only=True if the caller will not modify any files in the
+    checkout; this lets us hardlink them from the snapshot store instead
+    of copying them.
+    """
+    if gh_snapshots.is_enabled():
+        sha = resolve_commit_sha(repo, commit_ish)
+        snapshot = gh_snapshots.get_or_create_snapshot(
+            repo.id, sha, _populate_snapshot(repo, sha)
+        )
+        gh_snapshots.materialize(snapshot, os.getcwd(), read_only=read_only)
+    else:
+        extract_repo(repo, commit_ish)
 
 
-def extract_zip_file(zip_file, owner, repo_name):
-    zip_file.extractall()
-    # We know that the zipball contains a root directory named something
-    # like this by GitHub's convention. If that ever breaks, this will
-    # break:
-    zipball_root = glob(f"{owner}-{repo_name}-*")[0]
-    # It's not unlikely that the zipball root contains a directory with
-    # the same name, so we pre-emptively rename it to probably avoid
-    # collisions:
-    shutil.move(zipball_root, "zipball_root")
-    for path in itertools.chain(glob("zipball_root/*"), glob("zipball_root/.*")):
-        shutil.move(path, ".")
-    shutil.rmtree("zipball_root")
-    os.remove(ZIP_FILE_NAME)
+def _populate_snapshot(repo, sha):
+    def populate(path):
+        with cd(path):
+            extract_repo(repo, sha)
+
+    return populate
 
 
 @contextlib.contextmanager
-def local_github_checkout(user, repo_id, commit_ish=None):
+def local_github_checkout(user, repo_id, commit_ish=None, *, paths=None):
+    """
+    Check out the repo at commit_ish into a temporary directory, and make
+    that the cwd.
+
+    Pass a sequence of glob patterns as paths to make a sparse checkout
+    containing only the matching files, such as CONFIG_PATHS.
+    """
     with temporary_dir() as repo_root:
         # pretend it's a git clone to satisfy cci
         os.mkdir(".git")
@@ -118,21 +437,19 @@ def local_github_checkout(user, repo_id, commit_ish=None):
         repo = get_repo_info(user, repo_id=repo_id)
         if commit_ish is None:
             commit_ish = repo.default_branch
-        zip_file = get_zip_file(repo, commit_ish)
 
-        if not zip_file_is_safe(zip_file):
-            log_unsafe_zipfile_error(repo.html_url, commit_ish)
-            raise UnsafeZipfileError
+        # Because subsequent operations require certain things to be
+        # present in the filesystem at cwd, things that are in the repo
+        # (we hope):
+        if paths is not None:
+            extract_repo_paths(repo, commit_ish, paths)
         else:
-            # Because subsequent operations require certain things to be
-            # present in the filesystem at cwd, things that are in the
-            # repo (we hope):
-            extract_zip_file(zip_file, repo.owner.login, repo.name)
+            checkout_repo(repo, commit_ish)
 
-            # validate that cumulusci.yml is the same as default_branch
-            validate_cumulusci_yml_unchanged(repo)
+        # validate that cumulusci.yml is the same as default_branch
+        validate_cumulusci_yml_unchanged(repo)
 
-            yield repo_root
+        yield repo_root
 
 
 def get_project_config(**kwargs):
@@ -159,21 +476,119 @@ def get_source_format(**kwargs):
     return project_config.project__source_format
 
 
+def git_blob_sha(data):
+    """Return the SHA that git would give a blob with these bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def get_cached_config_blob_sha(repo_id):
+    """
+    Return the cached blob SHA of cumulusci.yml on the default branch of
+    a repo, or None if it's not known, without making any requests.
+    """
+    return cache.get(CONFIG_SHA_KEY.format(repo_id=repo_id))
+
+
+def get_config_blob_sha(repo):
+    """
+    Return the blob SHA of cumulusci.yml on the default branch of repo, or
+    "" if there is none. It stays cached until a push to the default
+    branch invalidates it.
+    """
+    blob_sha = get_cached_config_blob_sha(repo.id)
+    if blob_sha is None:
+        tree = repo.tree(repo.default_branch)
+        blob_sha = next(
+            (entry.sha for entry in tree.tree if entry.path == "cumulusci.yml"), ""
+        )
+        cache.set(CONFIG_SHA_KEY.format(repo_id=repo.id), blob_sha, timeout=None)
+    return blob_sha
+
+
+def invalidate_config_blob_sha(repo_id):
+    cache.delete(CONFIG_SHA_KEY.format(repo_id=repo_id))
+
+
+def get_project_config_summary(repo):
+    """
+    Parse the project config on the default branch of repo into the parts
+    Metecho uses, as a JSON-serializable dict, along with the blob SHA of
+    the cumulusci.yml it came from.
+    """
+    commit = resolve_commit_sha(repo, repo.default_branch)
+    with temporary_dir() as repo_root:
+        # pretend it's a git clone to satisfy cci
+        os.mkdir(".git")
+        extract_repo_paths(repo, commit, CONFIG_PATHS)
+        try:
+            blob_sha = git_blob_sha(pathlib.Path("cumulusci.yml").read_bytes())
+        except IOError:
+            blob_sha = ""
+        config = get_project_config(
+            repo_root=repo_root,
+            repo_name=repo.name,
+            repo_url=repo.html_url,
+            repo_owner=repo.owner.login,
+            repo_branch=repo.default_branch,
+            repo_commit=commit,
+        )
+        return {
+            "blob_sha": blob_sha,
+            "prefix": config.project__git__prefix_feature,
+            "source_format": config.project__source_format,
+            "api_version": config.project__package__api_version,
+            "scratch_org_configs": [
+                {"key": key, **value}
+                for key, value in (config.orgs__scratch or {}).items()
+            ],
+        }
+
+
+def get_branch_names_with_prefix(repository, prefix):
+    """
+    Return the names of all branches in repository that start with
+    prefix, in as few requests as GitHub allows.
+    """
+    url = repository._build_url(
+        "git", "matching-refs", "heads", prefix, base_url=repository._api
+    )
+    params = {"per_page": 100}
+    names = set()
+    while url:
+        resp = repository._get(url, params=params)
+        if resp.status_code != 200:
+            raise error_for(resp)
+        names.update(ref["ref"][len("refs/heads/") :] for ref in resp.json())
+        url = resp.links.get("next", {}).get("url")
+        # The next URL carries the query parameters already:
+        params = None
+    return names
+
+
 def try_to_make_branch(repository, *, new_branch, base_branch):
-    branch_name = new_branch
-    counter = 0
+    """
+    Create a branch off base_branch, named new_branch if that's free, or
+    else new_branch with the first free "-N" suffix. Returns the name of
+    the new branch.
+    """
     max_length = 100  # From models.Epic.branch_name
+    # Long names are truncated to make room for the suffix, so look up
+    # every branch that could collide with any suffix we might pick:
+    existing = get_branch_names_with_prefix(repository, new_branch[: max_length - 8])
+    latest_sha = repository.branch(base_branch).latest_sha()
+    counter = 0
     while True:
         suffix = f"-{counter}" if counter else ""
         branch_name = f"{new_branch[:max_length-len(suffix)]}{suffix}"
+        counter += 1
+        if branch_name in existing:
+            continue
         try:
-            latest_sha = repository.branch(base_branch).latest_sha()
             repository.create_branch_ref(branch_name, latest_sha)
             return branch_name
         except UnprocessableEntity as err:
-            if err.msg == "Reference already exists":
-                counter += 1
-            else:
+            # Someone else created this branch since we looked:
+            if err.msg != "Reference already exists":
                 raise
 
 
@@ -228,16 +643,20 @@ def normalize_commit(commit, **kwargs):
 
 
 def validate_cumulusci_yml_unchanged(repo):
-    """Confirm cumulusci.yml is unchanged between default_branch and the cwd."""
-    try:
-        cci_config_default_branch = repo.file_contents(
-            "cumulusci.yml", ref=repo.default_branch
-        ).decoded.decode("utf-8")
-    except NotFoundError:
-        cci_config_default_branch = ""
+    """
+    Confirm cumulusci.yml is unchanged between default_branch and the cwd.
+
+    This compares blob SHAs rather than contents, so in the usual case it
+    costs no requests at all. On a mismatch, we look the default branch
+    SHA up again before giving up, in case we missed the push that
+    should have invalidated it.
+    """
     try:
-        cci_config_branch = pathlib.Path("cumulusci.yml").read_text()
+        local_blob_sha = git_blob_sha(pathlib.Path("cumulusci.yml").read_bytes())
     except IOError:
-        cci_config_branch = ""
-    if cci_config_default_branch != cci_config_branch:
+        local_blob_sha = ""
+    if local_blob_sha == get_config_blob_sha(repo):
+        return
+    invalidate_config_blob_sha(repo.id)
+    if local_blob_sha != get_config_blob_sha(repo):
         raise Exception("cumulusci.yml contains unreviewed changes.")
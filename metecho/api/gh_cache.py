@@ -0,0 +1,138 @@
+"""
+Conditional-request cache for GitHub REST reads.
+
+We mount an adapter on the github3 session that remembers the ETag and
+Last-Modified of each successful GET, sends them back as If-None-Match
+and If-Modified-Since on the next identical GET, and replays the stored
+body when GitHub answers 304 Not Modified. GitHub does not count 304
+responses against the rate limit.
+
+Entries are keyed by URL, Accept header and "scope", which identifies
+whose view of the data this is (a user, or an app installation). The
+scope is stable across token refreshes, unlike the token itself.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from .gh_ratelimit import RateLimitedAdapter
+
+HITS_KEY = "gh-cache:hits"
+MISSES_KEY = "gh-cache:misses"
+ENTRY_KEY = "gh-cache:entry:{digest}"
+# These describe the original transfer, not the body we store:
+DROPPED_HEADERS = ("Content-Encoding", "Content-Length", "Transfer-Encoding")
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # pragma: nocover
+        pass
+
+
+def get_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def get_cache_key(scope, request):
+    accept = request.headers.get("Accept", "")
+    digest = hashlib.sha256(f"{scope}\n{accept}\n{request.url}".encode("utf-8"))
+    return ENTRY_KEY.format(digest=digest.hexdigest())
+
+
+def replay(request, not_modified, entry):
+    """
+    Build a 200 response from a cached entry, keeping the fresh headers
+    (rate limit, etc.) from the 304 response.
+    """
+    response = Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    for header in DROPPED_HEADERS:
+        not_modified.headers.pop(header, None)
+    response.headers.update(not_modified.headers)
+    response._content = entry["content"]
+    response.encoding = entry["encoding"]
+    response.url = not_modified.url
+    response.request = request
+    response.elapsed = not_modified.elapsed
+    return response
+
+
+class ConditionalRequestAdapter(RateLimitedAdapter):
+    def send(self, request, stream=False, **kwargs):
+        # Streamed responses are archive downloads, which we neither
+        # want to hold in memory nor store in Redis:
+        if request.method != "GET" or stream:
+            return super().send(request, stream=stream, **kwargs)
+
+        key = get_cache_key(self.scope, request)
+        entry = cache.get(key)
+        if entry:
+            if entry["etag"]:
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if entry and response.status_code == 304:
+            _incr(HITS_KEY)
+            response = replay(request, response, entry)
+            response.connection = self
+            return response
+
+        _incr(MISSES_KEY)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        cacheable = (
+            response.status_code == 200
+            and (etag or last_modified)
+            and len(response.content) <= settings.GITHUB_CACHE_MAX_BYTES
+        )
+        if cacheable:
+            headers = {
+                name: value
+                for name, value in response.headers.items()
+                if name not in DROPPED_HEADERS
+            }
+            cache.set(
+                key,
+                {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "headers": headers,
+                    "content": response.content,
+                    "encoding": response.encoding,
+                },
+                timeout=settings.GITHUB_CACHE_TIMEOUT,
+            )
+        return response
+
+
+def install_cache(gh, scope):
+    """
+    Route the requests of a github3 GitHub instance through the cache and
+    the rate-limit bookkeeping. scope must identify whose permissions and
+    budget the session has.
+    """
+    if settings.GITHUB_CACHE_TIMEOUT:
+        adapter = ConditionalRequestAdapter(scope)
+    else:
+        adapter = RateLimitedAdapter(scope)
+    gh.session.mount("https://", adapter)
+    return gh
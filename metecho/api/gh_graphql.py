@@ -0,0 +1,201 @@
+"""
+Batched reads through the GitHub GraphQL API.
+
+The REST API needs several round trips to learn the state of a branch
+(its head, how far it is ahead of its base, and its latest pull
+request), one per page of collaborators, and one per file read. These
+helpers fetch the same data for many branches or files at once, in a
+single query per batch.
+
+All functions take a github3 object (a repository, usually) only for its
+authenticated session.
+"""
+
+from github3.exceptions import error_for
+
+# GitHub limits the cost of each query; this keeps a batch comfortably
+# under it:
+BRANCH_BATCH_SIZE = 50
+BLOB_BATCH_SIZE = 50
+
+BRANCH_FIELDS = """
+    target { oid }
+    associatedPullRequests(
+        first: 1,
+        baseRefName: $base,
+        orderBy: {field: CREATED_AT, direction: DESC}
+    ) {
+        nodes { number state }
+    }
+"""
+
+COLLABORATORS_QUERY = """
+query($owner: String!, $name: String!, $cursor: String) {
+    repository(owner: $owner, name: $name) {
+        collaborators(first: 100, after: $cursor) {
+            pageInfo { hasNextPage endCursor }
+            nodes { databaseId login avatarUrl }
+        }
+    }
+}
+"""
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def graphql_query(github_object, query, variables=None):
+    """
+    Run a GraphQL query with the session of a github3 object, and return
+    its data, raising GraphQLError if GitHub reported any errors.
+    """
+    url = github_object._build_url("graphql")
+    response = github_object._post(url, data={"query": query, "variables": variables})
+    if response.status_code != 200:
+        raise error_for(response)
+    payload = response.json()
+    if payload.get("errors"):
+        raise GraphQLError(
+            "; ".join(error.get("message", "") for error in payload["errors"])
+        )
+    return payload["data"]
+
+
+def _branch_states_query(count):
+    heads = "".join(f", $head{i}: String!" for i in range(count))
+    compares = "".join(
+        f"compare{i}: compare(headRef: $head{i}) {{ aheadBy behindBy }}\n"
+        for i in range(count)
+    )
+    refs = "".join(
+        f"head{i}: ref(qualifiedName: $head{i}) {{ {BRANCH_FIELDS} }}\n"
+        for i in range(count)
+    )
+    return (
+        f"query($owner: String!, $name: String!, $base: String!{heads}) {{\n"
+        "repository(owner: $owner, name: $name) {\n"
+        f"base: ref(qualifiedName: $base) {{ target {{ oid }}\n{compares}}}\n"
+        f"{refs}"
+        "}\n}"
+    )
+
+
+def _blob_texts_query(count):
+    expressions = "".join(f", $expression{i}: String!" for i in range(count))
+    blobs = "".join(
+        f"blob{i}: object(expression: $expression{i}) "
+        "{ ... on Blob { text isBinary isTruncated } }\n"
+        for i in range(count)
+    )
+    return (
+        f"query($owner: String!, $name: String!{expressions}) {{\n"
+        "repository(owner: $owner, name: $name) {\n"
+        f"{blobs}"
+        "}\n}"
+    )
+
+
+def get_blob_texts(repository, commit, paths):
+    """
+    Return the contents of the files at ``paths`` in ``commit``, as a
+    dict mapping each path to its text. Binary files, files too big for
+    GraphQL to return whole, and missing files map to None.
+    """
+    texts = {}
+    for start in range(0, len(paths), BLOB_BATCH_SIZE):
+        batch = paths[start : start + BLOB_BATCH_SIZE]
+        variables = {"owner": repository.owner.login, "name": repository.name}
+        variables.update(
+            {f"expression{i}": f"{commit}:{path}" for i, path in enumerate(batch)}
+        )
+        data = graphql_query(repository, _blob_texts_query(len(batch)), variables)
+        for i, path in enumerate(batch):
+            blob = data["repository"][f"blob{i}"]
+            if not blob or blob["isBinary"] or blob["isTruncated"]:
+                texts[path] = None
+            else:
+                texts[path] = blob["text"]
+    return texts
+
+
+def _pull_request_state(ref):
+    nodes = ref["associatedPullRequests"]["nodes"]
+    if not nodes:
+        return None
+    pr = nodes[0]
+    return {
+        "number": pr["number"],
+        "is_open": pr["state"] == "OPEN",
+        "is_merged": pr["state"] == "MERGED",
+    }
+
+
+def get_branch_states(repository, base, heads):
+    """
+    Return the SHA of the branch ``base`` and the state of each branch in
+    ``heads`` relative to it. The state is a dict mapping each head to a
+    dict with keys "sha", "ahead_by", "behind_by" and "pull_request" (the
+    latest PR from head into base, or None). Heads that don't exist map
+    to None, as do all heads if base doesn't exist.
+    """
+    heads = list(dict.fromkeys(heads))
+    base_sha = None
+    states = {}
+    for start in range(0, len(heads), BRANCH_BATCH_SIZE):
+        batch = heads[start : start + BRANCH_BATCH_SIZE]
+        variables = {
+            "owner": repository.owner.login,
+            "name": repository.name,
+            "base": base,
+        }
+        variables.update({f"head{i}": head for i, head in enumerate(batch)})
+        query = _branch_states_query(len(batch))
+        data = graphql_query(repository, query, variables)["repository"]
+        base_ref = data["base"]
+        if base_ref:
+            base_sha = base_ref["target"]["oid"]
+        for i, head in enumerate(batch):
+            ref = data[f"head{i}"]
+            compare = base_ref and base_ref[f"compare{i}"]
+            if not (ref and compare):
+                states[head] = None
+                continue
+            states[head] = {
+                "sha": ref["target"]["oid"],
+                "ahead_by": compare["aheadBy"],
+                "behind_by": compare["behindBy"],
+                "pull_request": _pull_request_state(ref),
+            }
+    return base_sha, states
+
+
+def get_collaborators(repository):
+    """
+    Return the collaborators of a repository as dicts with the keys
+    "id", "login" and "avatar_url", like ``Project.github_users``.
+    """
+    collaborators = []
+    cursor = None
+    while True:
+        data = graphql_query(
+            repository,
+            COLLABORATORS_QUERY,
+            {
+                "owner": repository.owner.login,
+                "name": repository.name,
+                "cursor": cursor,
+            },
+        )
+        page = data["repository"]["collaborators"]
+        collaborators.extend(
+            {
+                "id": str(node["databaseId"]),
+                "login": node["login"],
+                "avatar_url": node["avatarUrl"],
+            }
+            for node in page["nodes"]
+        )
+        if not page["pageInfo"]["hasNextPage"]:
+            return collaborators
+        cursor = page["pageInfo"]["endCursor"]
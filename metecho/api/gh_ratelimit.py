@@ -0,0 +1,144 @@
+"""
+Rate-limit bookkeeping and prioritization for GitHub requests.
+
+Every GitHub response reports the remaining request budget of the token
+that made it. We record that budget per scope (see gh_cache) in the
+shared cache, and check it before each request:
+
+- Interactive work, the default, may spend the whole budget. Once it is
+  spent, requests from rq jobs wait for the reset if it is close enough,
+  and requests from web views raise RateLimitExceeded, which DRF turns
+  into a 429 response, rather than tie up the web worker.
+- Bulk work, such as resyncs, leaves a reserve for interactive work. A
+  request that would dip into the reserve raises RateLimitDeferred, and
+  jobs wrapped in defer_on_rate_limit are then rescheduled for after the
+  reset instead of failing.
+"""
+
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django_rq import get_scheduler
+from requests.adapters import HTTPAdapter
+from rest_framework.exceptions import Throttled
+from rq import get_current_job
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+BUDGET_KEY = "gh-ratelimit:{scope}"
+
+_priority = contextvars.ContextVar("github_priority", default=INTERACTIVE)
+
+
+class RateLimitDeferred(Exception):
+    def __init__(self, scope, reset):
+        self.scope = scope
+        self.reset = reset
+        super().__init__(f"GitHub budget for {scope} is reserved until {reset}")
+
+    @property
+    def retry_at(self):
+        return datetime.fromtimestamp(self.reset, tz=timezone.utc)
+
+
+class RateLimitExceeded(Throttled):
+    def __init__(self, scope, reset):
+        self.scope = scope
+        self.reset = reset
+        super().__init__(wait=max(reset - time.time(), 0))
+
+
+@contextlib.contextmanager
+def github_priority(priority):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def get_priority():
+    return _priority.get()
+
+
+def get_budget(scope):
+    """
+    Return the last known budget of a scope, as a dict with the keys
+    "remaining", "limit" and "reset" (a Unix timestamp), or None.
+    """
+    return cache.get(BUDGET_KEY.format(scope=scope))
+
+
+def record(scope, response):
+    try:
+        budget = {
+            "remaining": int(response.headers["X-RateLimit-Remaining"]),
+            "limit": int(response.headers["X-RateLimit-Limit"]),
+            "reset": int(response.headers["X-RateLimit-Reset"]),
+        }
+    except (KeyError, ValueError):
+        return
+    timeout = max(budget["reset"] - time.time(), 1)
+    cache.set(BUDGET_KEY.format(scope=scope), budget, timeout=timeout)
+
+
+def check_budget(scope):
+    budget = get_budget(scope)
+    if budget is None:
+        return
+    wait = budget["reset"] - time.time()
+    if wait <= 0:
+        return
+    if get_priority() == BULK:
+        if budget["remaining"] <= settings.GITHUB_RATELIMIT_RESERVE:
+            raise RateLimitDeferred(scope, budget["reset"])
+    elif budget["remaining"] <= 0:
+        if get_current_job() is None:
+            raise RateLimitExceeded(scope, budget["reset"])
+        if wait <= settings.GITHUB_RATELIMIT_MAX_WAIT:
+            logger.info(f"GitHub budget for {scope} is spent, waiting {wait:.0f}s")
+            time.sleep(wait)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    def __init__(self, scope, *args, **kwargs):
+        self.scope = scope
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        check_budget(self.scope)
+        response = super().send(request, **kwargs)
+        record(self.scope, response)
+        return response
+
+
+def defer_on_rate_limit(func):
+    """
+    Run a job function as bulk work, and if it runs into the reserved
+    budget, reschedule it for when the budget resets.
+
+    The job must be safe to run again from the start.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with github_priority(BULK):
+            try:
+                return func(*args, **kwargs)
+            except RateLimitDeferred as e:
+                logger.info(f"Deferring {func.__name__} until {e.retry_at}: {e}")
+                # Back onto the queue it came from:
+                job = get_current_job()
+                get_scheduler(job.origin if job else "default").enqueue_at(
+                    e.retry_at, wrapper, *args, **kwargs
+                )
+
+    return wrapper
@@ -0,0 +1,181 @@
+"""
+Worker-local, content-addressed store of repository snapshots.
+
+A snapshot is the extracted contents of a repository at a single commit,
+stored at ``<GITHUB_SNAPSHOT_CACHE_DIR>/<repo_id>/<sha>``. Since a commit
+SHA fully determines its contents, a snapshot never needs revalidating;
+it only needs evicting when the store grows past its disk budget.
+
+Checkouts are materialized from a snapshot by hardlinking its files when
+the caller promises not to modify them, and by copying them otherwise.
+"""
+
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+HITS_KEY = "gh-snapshots:hits"
+MISSES_KEY = "gh-snapshots:misses"
+SIZE_SUFFIX = ".size"
+STAGING_PREFIX = ".staging-"
+# Snapshots used more recently than this are never evicted, so that we
+# don't pull a snapshot out from under a checkout that is materializing
+# it right now:
+EVICTION_GRACE_SECONDS = 10 * 60
+
+
+def is_enabled():
+    return bool(settings.GITHUB_SNAPSHOT_CACHE_DIR)
+
+
+def get_root():
+    return Path(settings.GITHUB_SNAPSHOT_CACHE_DIR)
+
+
+def get_snapshot_path(repo_id, sha):
+    return get_root() / str(repo_id) / sha
+
+
+def _size_path(snapshot):
+    return snapshot.with_name(snapshot.name + SIZE_SUFFIX)
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # pragma: nocover
+        # The key was evicted between the add and the incr; losing one
+        # count is fine.
+        pass
+
+
+def get_stats():
+    return {"hits": cache.get(HITS_KEY, 0), "misses": cache.get(MISSES_KEY, 0)}
+
+
+def _dir_size(path):
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:  # pragma: nocover
+                pass
+    return total
+
+
+def get_or_create_snapshot(repo_id, sha, populate):
+    """
+    Return the path of the snapshot of ``repo_id`` at ``sha``.
+
+    On a miss, ``populate`` is called with an empty staging directory to
+    fill in, which is then atomically renamed into place, so concurrent
+    workers on the same host never see a half-written snapshot.
+    """
+    snapshot = get_snapshot_path(repo_id, sha)
+    if snapshot.is_dir():
+        _incr(HITS_KEY)
+        # The mtime of the snapshot directory is its LRU timestamp:
+        os.utime(snapshot)
+        logger.info(f"Snapshot hit for {repo_id}@{sha}")
+        return snapshot
+
+    _incr(MISSES_KEY)
+    logger.info(f"Snapshot miss for {repo_id}@{sha}")
+    snapshot.parent.mkdir(parents=True, exist_ok=True)
+    staging = snapshot.parent / f"{STAGING_PREFIX}{sha}-{uuid.uuid4().hex}"
+    staging.mkdir()
+    try:
+        populate(staging)
+        size = _dir_size(staging)
+        try:
+            staging.rename(snapshot)
+        except OSError:
+            # Another worker on this host finished the same snapshot
+            # first; theirs is identical to ours, so use it.
+            pass
+        else:
+            _size_path(snapshot).write_text(str(size))
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging, ignore_errors=True)
+
+    evict(keep=snapshot)
+    return snapshot
+
+
+def evict(*, keep=None):
+    """
+    Remove least-recently-used snapshots until the store fits in
+    ``GITHUB_SNAPSHOT_CACHE_MAX_BYTES``.
+    """
+    root = get_root()
+    if not root.is_dir():
+        return
+    snapshots = []
+    for snapshot in root.glob("*/*"):
+        if not snapshot.is_dir() or snapshot.name.startswith(STAGING_PREFIX):
+            continue
+        try:
+            size = int(_size_path(snapshot).read_text())
+        except (OSError, ValueError):
+            size = _dir_size(snapshot)
+        snapshots.append((snapshot.stat().st_mtime, snapshot, size))
+
+    total = sum(size for _mtime, _snapshot, size in snapshots)
+    budget = settings.GITHUB_SNAPSHOT_CACHE_MAX_BYTES
+    cutoff = time.time() - EVICTION_GRACE_SECONDS
+    for mtime, snapshot, size in sorted(snapshots, key=lambda item: item[0]):
+        if total <= budget:
+            break
+        if snapshot == keep or mtime > cutoff:
+            continue
+        logger.info(f"Evicting snapshot {snapshot}")
+        shutil.rmtree(snapshot, ignore_errors=True)
+        try:
+            _size_path(snapshot).unlink()
+        except OSError:
+            pass
+        total -= size
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Most likely the snapshot store and the checkout are on
+        # different filesystems.
+        shutil.copy2(src, dst)
+    return dst
+
+
+def materialize(snapshot, dest, *, read_only=False):
+    """
+    Fill the existing directory ``dest`` with the files in ``snapshot``.
+
+    With ``read_only``, files are hardlinked rather than copied. The
+    caller must then not modify any file in place, as that would modify
+    the snapshot too.
+    """
+    copy_function = _link_or_copy if read_only else shutil.copy2
+    for entry in os.scandir(snapshot):
+        target = os.path.join(dest, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            shutil.copytree(
+                entry.path,
+                target,
+                symlinks=True,
+                copy_function=copy_function,
+                dirs_exist_ok=True,
+            )
+        else:
+            copy_function(entry.path, target)
@@ -16,6 +16,7 @@ class HookSerializerMixin:
 
 class HookRepositorySerializer(HookSerializerMixin, serializers.Serializer):
     id = serializers.IntegerField()
+    default_branch = serializers.CharField(required=False)
 
 
 class AuthorCommitSerializer(serializers.Serializer):
@@ -137,6 +138,10 @@ class PushHookSerializer(HookSerializerMixin, serializers.Serializer):
         prefix_len = len(branch_prefix)
         ref = ref[prefix_len:]
 
+        default_branch = self.validated_data["repository"].get("default_branch")
+        if ref in (project.branch_name, default_branch):
+            project.invalidate_config_summary()
+
         if self._is_force_push():
             project.queue_refresh_commits(ref=ref, originating_user_id=None)
         else:
@@ -2,31 +2,34 @@ import logging
 import string
 import traceback
 from datetime import timedelta
-from pathlib import Path
 
 import requests
 from asgiref.sync import async_to_sync
 from bs4 import BeautifulSoup
 from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.text import slugify
 from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
-from django_rq import get_scheduler, job
+from django_rq import get_scheduler
 from github3.exceptions import NotFoundError
 
 from .email_utils import get_user_facing_url
 from .gh import (
-    get_cumulus_prefix,
-    get_project_config,
+    CONFIG_PATHS,
     get_repo_info,
     local_github_checkout,
     normalize_commit,
     try_to_make_branch,
 )
-from .models import TASK_REVIEW_STATUS
-from .push import report_scratch_org_error
+from .gh_graphql import get_branch_states, get_collaborators
+from .gh_ratelimit import RateLimitDeferred, defer_on_rate_limit
+from .models import DEVHUB_ENABLED_LOCK_KEY, TASK_REVIEW_STATUS
+from .org_logs import FlowOutput
+from .push import buffered_notifications, report_scratch_org_error
+from .queueing import get_queue_name, routed_job
 from .sf_org_changes import (
     commit_changes_to_github,
     compare_revisions,
@@ -60,17 +63,7 @@ def epic_create_branch(
         elif settings.BRANCH_PREFIX:
             prefix = settings.BRANCH_PREFIX
         else:
-            with local_github_checkout(user, repo_id) as repo_root:
-                prefix = get_cumulus_prefix(
-                    repo_root=repo_root,
-                    repo_name=repository.name,
-                    repo_url=repository.html_url,
-                    repo_owner=repository.owner.login,
-                    repo_branch=repository.default_branch,
-                    repo_commit=repository.branch(
-                        repository.default_branch
-                    ).latest_sha(),
-                )
+            prefix = epic.project.get_config_summary()["prefix"]
         epic_branch_name = f"{prefix}{slugify(epic.name)}"
         epic_branch_name = try_to_make_branch(
             repository,
@@ -208,20 +201,15 @@ def _create_org_and_run_flow(
     }
     flow_name = scratch_org_config.setup_flow or cases[scratch_org.task.org_config_name]
 
-    try:
+    with FlowOutput(scratch_org) as output:
         run_flow(
             cci=cci,
             org_config=org_config,
             flow_name=flow_name,
             project_path=project_path,
             user=user,
+            output=output.write,
         )
-    finally:
-        log_path = Path(project_path, ".cumulusci/logs/cci.log")
-        if log_path.exists():
-            scratch_org.refresh_from_db()
-            scratch_org.cci_log = log_path.read_text()
-            scratch_org.save()
     scratch_org.refresh_from_db()
     # We don't need to explicitly save the following, because this
     # function is called in a context that will eventually call a
@@ -233,7 +221,7 @@ def _create_org_and_run_flow(
     )
     scratch_org.is_created = True
 
-    scheduler = get_scheduler("default")
+    scheduler = get_scheduler(get_queue_name("polling"))
     days = settings.DAYS_BEFORE_ORG_EXPIRY_TO_ALERT
     before_expiry = scratch_org.expires_at - timedelta(days=days)
     scratch_org.expiry_job_id = scheduler.enqueue_at(
@@ -279,8 +267,10 @@ def create_branches_on_github_then_create_scratch_org(
         scratch_org.finalize_provision(originating_user_id=originating_user_id)
 
 
-create_branches_on_github_then_create_scratch_org_job = job(
-    create_branches_on_github_then_create_scratch_org
+create_branches_on_github_then_create_scratch_org_job = routed_job(
+    create_branches_on_github_then_create_scratch_org,
+    job_class="provisioning",
+    shard_by="{scratch_org.task.epic.project_id}",
 )
 
 
@@ -316,9 +306,14 @@ def refresh_scratch_org(scratch_org, *, originating_user_id):
         scratch_org.finalize_refresh_org(originating_user_id=originating_user_id)
 
 
-refresh_scratch_org_job = job(refresh_scratch_org)
+refresh_scratch_org_job = routed_job(
+    refresh_scratch_org,
+    job_class="provisioning",
+    shard_by="{scratch_org.task.epic.project_id}",
+)
 
 
+@buffered_notifications()
 def get_unsaved_changes(scratch_org, *, originating_user_id):
     try:
         scratch_org.refresh_from_db()
@@ -330,7 +325,9 @@ def get_unsaved_changes(scratch_org, *, originating_user_id):
         user = scratch_org.owner
         repo_id = scratch_org.task.get_repo_id()
         commit_ish = scratch_org.task.branch_name
-        with local_github_checkout(user, repo_id, commit_ish) as repo_root:
+        with local_github_checkout(
+            user, repo_id, commit_ish, paths=CONFIG_PATHS
+        ) as repo_root:
             scratch_org.valid_target_directories, _ = get_valid_target_directories(
                 user,
                 scratch_org,
@@ -351,9 +348,14 @@ def get_unsaved_changes(scratch_org, *, originating_user_id):
         )
 
 
-get_unsaved_changes_job = job(get_unsaved_changes)
+get_unsaved_changes_job = routed_job(
+    get_unsaved_changes,
+    job_class="polling",
+    dedup_key="get_unsaved_changes:{scratch_org.id}",
+)
 
 
+@buffered_notifications()
 def commit_changes_from_org(
     *,
     scratch_org,
@@ -430,9 +432,12 @@ def commit_changes_from_org(
         scratch_org.finalize_commit_changes(originating_user_id=originating_user_id)
 
 
-commit_changes_from_org_job = job(commit_changes_from_org)
+commit_changes_from_org_job = routed_job(
+    commit_changes_from_org, job_class="interactive"
+)
 
 
+@buffered_notifications()
 def create_pr(
     instance,
     user,
@@ -478,7 +483,7 @@ def create_pr(
         )
 
 
-create_pr_job = job(create_pr)
+create_pr_job = routed_job(create_pr, job_class="interactive")
 
 
 def delete_scratch_org(scratch_org, *, originating_user_id):
@@ -512,14 +517,63 @@ def delete_scratch_org(scratch_org, *, originating_user_id):
         raise
 
 
-delete_scratch_org_job = job(delete_scratch_org)
+delete_scratch_org_job = routed_job(
+    delete_scratch_org,
+    job_class="provisioning",
+    shard_by="{scratch_org.task.epic.project_id}",
+)
+
 
+@buffered_notifications()
+def delete_scratch_orgs(scratch_org_ids):
+    """
+    Delete the Salesforce orgs of scratch orgs that were soft-deleted
+    together with their task or epic, notifying about each as
+    delete_scratch_org does. A failure is reported to the org's
+    subscribers and doesn't stop the rest.
+    """
+    from .models import ScratchOrg
+
+    for scratch_org in ScratchOrg.objects.filter(pk__in=scratch_org_ids):
+        try:
+            delete_org(scratch_org)
+        except Exception as e:
+            scratch_org.notify_scratch_org_error(
+                error=e,
+                type_="SCRATCH_ORG_DELETE_FAILED",
+                originating_user_id=None,
+            )
+            logger.error(traceback.format_exc())
+        else:
+            # Its soft delete has already been saved, so only announce it:
+            if scratch_org.last_modified_at:
+                scratch_org.finalize_delete(originating_user_id=None)
 
+
+delete_scratch_orgs_job = routed_job(delete_scratch_orgs, job_class="bulk")
+
+
+@defer_on_rate_limit
 def refresh_github_repositories_for_user(user):
     user.refresh_repositories()
 
 
-refresh_github_repositories_for_user_job = job(refresh_github_repositories_for_user)
+refresh_github_repositories_for_user_job = routed_job(
+    refresh_github_repositories_for_user,
+    job_class="bulk",
+    shard_by="{user.id}",
+    dedup_key="refresh_github_repositories_for_user:{user.id}",
+)
+
+
+def check_devhub_enabled(user):
+    try:
+        user.check_devhub_enabled()
+    finally:
+        cache.delete(DEVHUB_ENABLED_LOCK_KEY.format(user_id=user.id))
+
+
+check_devhub_enabled_job = routed_job(check_devhub_enabled, job_class="polling")
 
 
 def get_social_image(*, project):
@@ -539,11 +593,21 @@ def get_social_image(*, project):
         project.finalize_get_social_image()
 
 
-get_social_image_job = job(get_social_image)
+get_social_image_job = routed_job(
+    get_social_image,
+    job_class="bulk",
+    shard_by="{project.repo_owner}/{project.repo_name}",
+    dedup_key="get_social_image:{project.repo_owner}/{project.repo_name}",
+)
 
 
-# This avoids partially-applied saving:
+# Outermost, so that a deferred run has rolled back before it's
+# rescheduled:
+@defer_on_rate_limit
+# This avoids partially-applied saving, and drops the notifications of a
+# run that doesn't commit:
 @transaction.atomic
+@buffered_notifications()
 def refresh_commits(*, project, branch_name, originating_user_id):
     """
     This should only run when we're notified of a force-commit. It's the
@@ -562,38 +626,53 @@ def refresh_commits(*, project, branch_name, originating_user_id):
     commits = list(repo.commits(repo.branch(branch_name).latest_sha(), number=1000))
 
     tasks = Task.objects.filter(epic__project=project, branch_name=branch_name)
+    branch_states = {}
+    if settings.GITHUB_USE_GRAPHQL:
+        for base in {task.get_base() for task in tasks} - {""}:
+            _base_sha, states = get_branch_states(repo, base, [branch_name])
+            branch_states[base] = states[branch_name]
     for task in tasks:
         origin_sha_index = [commit.sha for commit in commits].index(task.origin_sha)
-        task.commits = [
-            normalize_commit(commit) for commit in commits[:origin_sha_index]
-        ]
-        task.update_has_unmerged_commits()
+        task.set_commits(
+            [normalize_commit(commit) for commit in commits[:origin_sha_index]]
+        )
+        task.update_has_unmerged_commits(state=branch_states.get(task.get_base()))
         task.update_review_valid()
         task.finalize_task_update(originating_user_id=originating_user_id)
 
 
-refresh_commits_job = job(refresh_commits)
+refresh_commits_job = routed_job(
+    refresh_commits,
+    job_class="bulk",
+    shard_by="{project.id}",
+    dedup_key="refresh_commits:{project.id}:{branch_name}",
+)
 
 
+@buffered_notifications()
 def populate_github_users(project, *, originating_user_id):
     try:
         repo = get_repo_info(
             None, repo_owner=project.repo_owner, repo_name=project.repo_name
         )
         project.refresh_from_db()
+        if settings.GITHUB_USE_GRAPHQL:
+            collaborators = get_collaborators(repo)
+        else:
+            collaborators = [
+                {
+                    "id": str(collaborator.id),
+                    "login": collaborator.login,
+                    "avatar_url": collaborator.avatar_url,
+                }
+                for collaborator in repo.collaborators()
+            ]
         project.github_users = list(
-            sorted(
-                [
-                    {
-                        "id": str(collaborator.id),
-                        "login": collaborator.login,
-                        "avatar_url": collaborator.avatar_url,
-                    }
-                    for collaborator in repo.collaborators()
-                ],
-                key=lambda x: x["login"].lower(),
-            )
+            sorted(collaborators, key=lambda x: x["login"].lower())
         )
+    except RateLimitDeferred:
+        # A resync will be rescheduled, so it's not done yet:
+        raise
     except Exception as e:
         project.finalize_populate_github_users(
             error=e, originating_user_id=originating_user_id
@@ -605,9 +684,23 @@ def populate_github_users(project, *, originating_user_id):
         project.finalize_populate_github_users(originating_user_id=originating_user_id)
 
 
-populate_github_users_job = job(populate_github_users)
+@defer_on_rate_limit
+def resync_github_users(project):
+    """
+    Populate a project's collaborators as bulk work, for resyncs that
+    nobody is waiting on, unlike populate_github_users_job.
+    """
+    populate_github_users(project, originating_user_id=None)
+
+
+populate_github_users_job = routed_job(
+    populate_github_users,
+    job_class="interactive",
+    dedup_key="populate_github_users:{project.repo_owner}/{project.repo_name}",
+)
 
 
+@buffered_notifications()
 def submit_review(*, user, task, data, originating_user_id):
     try:
         review_sha = ""
@@ -683,16 +776,35 @@ def submit_review(*, user, task, data, originating_user_id):
         )
 
 
-submit_review_job = job(submit_review)
+submit_review_job = routed_job(submit_review, job_class="interactive")
 
 
+@buffered_notifications()
 def create_gh_branch_for_new_epic(epic, *, user):
     try:
         epic.refresh_from_db()
         repo_id = epic.get_repo_id()
         repository = get_repo_info(user, repo_id=repo_id)
 
-        if epic.branch_name:
+        if epic.branch_name and settings.GITHUB_USE_GRAPHQL:
+            _base_sha, states = get_branch_states(
+                repository, repository.default_branch, [epic.branch_name]
+            )
+            state = states[epic.branch_name]
+            if state is None:
+                try_to_make_branch(
+                    repository,
+                    new_branch=epic.branch_name,
+                    base_branch=repository.default_branch,
+                )
+            else:
+                epic.has_unmerged_commits = state["ahead_by"] > 0
+                pr = state["pull_request"]
+                if pr:
+                    epic.pr_number = pr["number"]
+                    epic.pr_is_merged = pr["is_merged"]
+                    epic.pr_is_open = pr["is_open"]
+        elif epic.branch_name:
             try:
                 head = repository.branch(epic.branch_name).commit.sha
             except NotFoundError:
@@ -747,30 +859,17 @@ def create_gh_branch_for_new_epic(epic, *, user):
         epic.finalize_epic_update(originating_user_id=str(user.id))
 
 
-create_gh_branch_for_new_epic_job = job(create_gh_branch_for_new_epic)
+create_gh_branch_for_new_epic_job = routed_job(
+    create_gh_branch_for_new_epic, job_class="interactive"
+)
 
 
+@buffered_notifications()
 def available_task_org_config_names(epic, *, user):
     try:
         epic.refresh_from_db()
-        repo_id = epic.get_repo_id()
-        repo = get_repo_info(
-            None,
-            repo_owner=epic.project.repo_owner,
-            repo_name=epic.project.repo_name,
-        )
-        with local_github_checkout(user, repo_id) as repo_root:
-            config = get_project_config(
-                repo_root=repo_root,
-                repo_name=repo.name,
-                repo_url=repo.html_url,
-                repo_owner=repo.owner.login,
-                repo_branch=repo.default_branch,
-                repo_commit=repo.branch(repo.default_branch).latest_sha(),
-            )
-            epic.available_task_org_config_names = [
-                {"key": key, **value} for key, value in config.orgs__scratch.items()
-            ]
+        summary = epic.project.get_config_summary()
+        epic.available_task_org_config_names = summary["scratch_org_configs"]
     except Exception:
         epic.finalize_available_task_org_config_names(originating_user_id=str(user.id))
         tb = traceback.format_exc()
@@ -780,9 +879,12 @@ def available_task_org_config_names(epic, *, user):
         epic.finalize_available_task_org_config_names(originating_user_id=str(user.id))
 
 
-available_task_org_config_names_job = job(available_task_org_config_names)
+available_task_org_config_names_job = routed_job(
+    available_task_org_config_names, job_class="interactive"
+)
 
 
+@buffered_notifications()
 def user_reassign(scratch_org, *, new_user, originating_user_id):
     try:
         scratch_org.refresh_from_db()
@@ -801,4 +903,4 @@ def user_reassign(scratch_org, *, new_user, originating_user_id):
         scratch_org.finalize_reassign(originating_user_id=originating_user_id)
 
 
-user_reassign_job = job(user_reassign)
+user_reassign_job = routed_job(user_reassign, job_class="interactive")
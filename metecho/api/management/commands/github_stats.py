@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from ... import gh_cache, gh_snapshots
+from ...gh import get_app_installation_budget
+from ...models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Print hit rates of the GitHub request cache and snapshot store, and "
+        "the rate-limit budget of each project's app installation"
+    )
+
+    def handle(self, *args, **options):
+        stats = gh_cache.get_stats()
+        self.stdout.write(
+            f"Conditional requests: {stats['hits']} hits, "
+            f"{stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)"
+        )
+        stats = gh_snapshots.get_stats()
+        self.stdout.write(
+            f"Repository snapshots: {stats['hits']} hits, {stats['misses']} misses"
+        )
+        for project in Project.objects.order_by("repo_owner", "repo_name"):
+            repo = f"{project.repo_owner}/{project.repo_name}"
+            budget = get_app_installation_budget(project.repo_owner, project.repo_name)
+            if budget is None:
+                self.stdout.write(f"{repo}: budget unknown")
+                continue
+            reset = datetime.fromtimestamp(budget["reset"], tz=timezone.utc)
+            self.stdout.write(
+                f"{repo}: {budget['remaining']}/{budget['limit']} requests left, "
+                f"resets at {reset:%H:%M:%S} UTC"
+            )
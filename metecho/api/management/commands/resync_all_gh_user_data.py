@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 
-from ...jobs import populate_github_users
+from ...jobs import resync_github_users
 from ...models import Project
 
 
@@ -9,4 +9,4 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         for project in Project.objects.all():
-            populate_github_users(project, originating_user_id=None)
+            resync_github_users(project)
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Run an rq worker on the queues of the given job classes, or of all "
+        "of them and the default queue, draining them by weight"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "job_classes",
+            nargs="*",
+            help=f"Any of {', '.join(settings.RQ_JOB_CLASSES)}",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Quit once the queues are empty",
+        )
+
+    def handle(self, *args, job_classes, burst, **options):
+        unknown = set(job_classes) - set(settings.RQ_JOB_CLASSES)
+        if unknown:
+            raise CommandError(f"Unknown job classes: {', '.join(sorted(unknown))}")
+        queues = [
+            queue
+            for job_class in job_classes or settings.RQ_JOB_CLASSES
+            for queue in settings.RQ_JOB_CLASS_QUEUES[job_class]
+        ]
+        if not job_classes:
+            queues.append("default")
+        call_command("rqworker", *queues, burst=burst)
@@ -0,0 +1,31 @@
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+
+PATCH_ROOT = "metecho.api.management.commands.github_stats"
+
+
+@pytest.mark.django_db
+def test_github_stats(project_factory):
+    project_factory(repo_owner="test", repo_name="known")
+    project_factory(repo_owner="test", repo_name="unknown")
+    out = StringIO()
+    with patch("metecho.api.gh_cache.get_stats") as cache_stats, patch(
+        "metecho.api.gh_snapshots.get_stats"
+    ) as snapshot_stats, patch(
+        f"{PATCH_ROOT}.get_app_installation_budget"
+    ) as get_budget:
+        cache_stats.return_value = {"hits": 3, "misses": 1, "hit_rate": 0.75}
+        snapshot_stats.return_value = {"hits": 2, "misses": 5}
+        get_budget.side_effect = lambda owner, name: (
+            {"remaining": 42, "limit": 5000, "reset": 0} if name == "known" else None
+        )
+        call_command("github_stats", stdout=out)
+
+    output = out.getvalue()
+    assert "3 hits, 1 misses (75.0% hit rate)" in output
+    assert "2 hits, 5 misses" in output
+    assert "test/known: 42/5000 requests left, resets at 00:00:00 UTC" in output
+    assert "test/unknown: budget unknown" in output
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.management import CommandError, call_command
+
+PATCH_ROOT = "metecho.api.management.commands.rqworker_all_queues"
+
+
+@pytest.fixture(autouse=True)
+def job_classes(settings):
+    settings.RQ_JOB_CLASSES = {"interactive": {}, "bulk": {}}
+    settings.RQ_JOB_CLASS_QUEUES = {
+        "interactive": ["interactive"],
+        "bulk": ["bulk-0", "bulk-1"],
+    }
+
+
+def test_rqworker_all_queues():
+    with patch(f"{PATCH_ROOT}.call_command") as rqworker:
+        call_command("rqworker_all_queues")
+
+    rqworker.assert_called_once_with(
+        "rqworker", "interactive", "bulk-0", "bulk-1", "default", burst=False
+    )
+
+
+def test_rqworker_all_queues__job_classes():
+    with patch(f"{PATCH_ROOT}.call_command") as rqworker:
+        call_command("rqworker_all_queues", "bulk", "--burst")
+
+    rqworker.assert_called_once_with("rqworker", "bulk-0", "bulk-1", burst=True)
+
+
+def test_rqworker_all_queues__unknown_job_class():
+    with patch(f"{PATCH_ROOT}.call_command") as rqworker:
+        with pytest.raises(CommandError):
+            call_command("rqworker_all_queues", "urgent")
+
+    assert not rqworker.called
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2021-01-20 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0090_rename_repository_project"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="repositories_synced_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.5 on 2021-01-21 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0091_user_repositories_synced_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="config_summary",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,180 @@
+# Generated by Django 3.1.5 on 2021-01-25 16:02
+
+import django.db.models.deletion
+import sfdo_template_helpers.fields.string
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+AUTHOR_FIELDS = ("name", "email", "username", "avatar_url")
+
+
+def forwards(apps, schema_editor):
+    Task = apps.get_model("api", "Task")
+    Commit = apps.get_model("api", "Commit")
+    CommitAuthor = apps.get_model("api", "CommitAuthor")
+    authors = {}
+    for task in Task.objects.exclude(commits=[]).only("id", "commits").iterator():
+        rows = []
+        # The JSON list is newest first, in branch order:
+        for sequence, commit in enumerate(reversed(task.commits), start=1):
+            author = commit.get("author") or {}
+            key = tuple(author.get(field) or "" for field in AUTHOR_FIELDS)
+            if key not in authors:
+                authors[key], _ = CommitAuthor.objects.get_or_create(
+                    **dict(zip(AUTHOR_FIELDS, key))
+                )
+            timestamp = parse_datetime(commit.get("timestamp") or "")
+            if timestamp and timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp, timezone.utc)
+            rows.append(
+                Commit(
+                    task_id=task.id,
+                    sha=commit["id"],
+                    sequence=sequence,
+                    timestamp=timestamp,
+                    author=authors[key],
+                    message=commit.get("message") or "",
+                    url=commit.get("url") or "",
+                )
+            )
+        Commit.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def backwards(apps, schema_editor):
+    Task = apps.get_model("api", "Task")
+    Commit = apps.get_model("api", "Commit")
+    task_ids = Commit.objects.values("task_id")
+    for task in Task.objects.filter(id__in=task_ids).iterator():
+        task.commits = [
+            {
+                "id": commit.sha,
+                "timestamp": commit.timestamp.isoformat() if commit.timestamp else "",
+                "author": {
+                    field: getattr(commit.author, field) for field in AUTHOR_FIELDS
+                },
+                "message": commit.message,
+                "url": commit.url,
+            }
+            for commit in Commit.objects.filter(task=task)
+            .select_related("author")
+            .order_by("-sequence", "-id")
+        ]
+        task.save(update_fields=["commits"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0092_project_config_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CommitAuthor",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "email",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "username",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "avatar_url",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("name", "email", "username", "avatar_url")},
+            },
+        ),
+        migrations.CreateModel(
+            name="Commit",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha", sfdo_template_helpers.fields.string.StringField()),
+                ("sequence", models.PositiveIntegerField(default=0)),
+                ("timestamp", models.DateTimeField(blank=True, null=True)),
+                (
+                    "message",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "url",
+                    sfdo_template_helpers.fields.string.StringField(
+                        blank=True, default=""
+                    ),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="commits",
+                        to="api.commitauthor",
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="commits_set",
+                        to="api.task",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("-sequence", "-id"),
+                "unique_together": {("task", "sha")},
+            },
+        ),
+        migrations.AddIndex(
+            model_name="commit",
+            index=models.Index(
+                fields=["task", "-sequence"], name="api_commit_task_sequence_idx"
+            ),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(model_name="task", name="commits"),
+        migrations.AlterField(
+            model_name="commit",
+            name="task",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="commits",
+                to="api.task",
+            ),
+        ),
+    ]
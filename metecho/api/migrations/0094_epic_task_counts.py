@@ -0,0 +1,52 @@
+# Generated by Django 3.1.5 on 2021-01-27 10:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+COUNT_FIELDS = {
+    "Planned": "planned_task_count",
+    "In progress": "in_progress_task_count",
+    "Completed": "completed_task_count",
+}
+
+
+def forwards(apps, schema_editor):
+    Epic = apps.get_model("api", "Epic")
+    Task = apps.get_model("api", "Task")
+    counts = {}
+    for row in Task.objects.values("epic_id", "status").annotate(count=Count("id")):
+        field = COUNT_FIELDS.get(row["status"])
+        if field:
+            counts.setdefault(row["epic_id"], {})[field] = row["count"]
+    for epic_id, fields in counts.items():
+        Epic.objects.filter(pk=epic_id).update(**fields)
+
+
+def backwards(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0093_commit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="epic",
+            name="planned_task_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epic",
+            name="in_progress_task_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="epic",
+            name="completed_task_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.5 on 2021-01-28 09:41
+
+from django.db import migrations, models
+
+
+def forwards(apps, schema_editor):
+    ScratchOrg = apps.get_model("api", "ScratchOrg")
+    orgs = ScratchOrg.objects.only("id", "unsaved_changes", "ignored_changes")
+    for org in orgs.iterator():
+        ScratchOrg.objects.filter(pk=org.pk).update(
+            total_unsaved_changes=sum(
+                len(members) for members in org.unsaved_changes.values()
+            ),
+            total_ignored_changes=sum(
+                len(members) for members in org.ignored_changes.values()
+            ),
+        )
+
+
+def backwards(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0094_epic_task_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scratchorg",
+            name="total_unsaved_changes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="scratchorg",
+            name="total_ignored_changes",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
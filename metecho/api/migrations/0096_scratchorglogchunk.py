@@ -0,0 +1,87 @@
+# Generated by Django 3.1.5 on 2021-01-29 14:41
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The defaults of SCRATCH_ORG_LOG_CHUNK_BYTES and SCRATCH_ORG_LOG_MAX_BYTES
+# when this was written:
+CHUNK_BYTES = 256 * 1024
+MAX_BYTES = 5 * 1024 * 1024
+
+
+def forwards(apps, schema_editor):
+    ScratchOrg = apps.get_model("api", "ScratchOrg")
+    ScratchOrgLogChunk = apps.get_model("api", "ScratchOrgLogChunk")
+    scratch_orgs = ScratchOrg.objects.exclude(cci_log="").only("id", "cci_log")
+    for scratch_org in scratch_orgs.iterator():
+        log = scratch_org.cci_log.encode()[-MAX_BYTES:]
+        chunks = []
+        for index, offset in enumerate(range(0, len(log), CHUNK_BYTES)):
+            data = log[offset : offset + CHUNK_BYTES]
+            chunks.append(
+                ScratchOrgLogChunk(
+                    scratch_org_id=scratch_org.id,
+                    index=index,
+                    offset=offset,
+                    size=len(data),
+                    data=zlib.compress(data),
+                )
+            )
+        ScratchOrgLogChunk.objects.bulk_create(chunks)
+
+
+def backwards(apps, schema_editor):
+    ScratchOrg = apps.get_model("api", "ScratchOrg")
+    ScratchOrgLogChunk = apps.get_model("api", "ScratchOrgLogChunk")
+    scratch_org_ids = ScratchOrgLogChunk.objects.values("scratch_org_id")
+    for scratch_org in ScratchOrg.objects.filter(id__in=scratch_org_ids).iterator():
+        chunks = ScratchOrgLogChunk.objects.filter(scratch_org=scratch_org)
+        scratch_org.cci_log = b"".join(
+            zlib.decompress(data)
+            for data in chunks.order_by("index").values_list("data", flat=True)
+        ).decode(errors="replace")
+        scratch_org.save(update_fields=["cci_log"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0095_scratchorg_change_totals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScratchOrgLogChunk",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.PositiveIntegerField()),
+                ("offset", models.PositiveBigIntegerField()),
+                ("size", models.PositiveIntegerField()),
+                ("data", models.BinaryField()),
+                (
+                    "scratch_org",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="log_chunks",
+                        to="api.scratchorg",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("index",),
+                "unique_together": {("scratch_org", "index")},
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(model_name="scratchorg", name="cci_log"),
+    ]
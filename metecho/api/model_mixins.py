@@ -1,5 +1,6 @@
 import re
-from collections import namedtuple
+from collections import defaultdict, namedtuple
+from functools import partial
 
 from asgiref.sync import async_to_sync
 from django.db import models
@@ -82,11 +83,13 @@ class PushMixin:
     ):
         prepared_message = {"originating_user_id": originating_user_id}
         prepared_message.update(message or {})
-        self._push_message(
-            type_ or self.push_update_type,
-            prepared_message,
-            for_list=for_list,
-        )
+        type_ = type_ or self.push_update_type
+        send = partial(self._push_message, type_, prepared_message, for_list=for_list)
+        # Inside push.buffered_notifications, repeated updates of the same
+        # instance are sent once:
+        key = (self._meta.model_name, str(self.id), type_, for_list)
+        if not push.buffer_notification(key, send):
+            send()
 
     def notify_error(self, error, *, type_=None, originating_user_id, message=None):
         prepared_message = {
@@ -94,10 +97,13 @@ class PushMixin:
             "message": str(error),
         }
         prepared_message.update(message or {})
-        self._push_message(
-            type_ or self.push_error_type,
-            prepared_message,
+        send = partial(
+            self._push_message, type_ or self.push_error_type, prepared_message
         )
+        # Inside push.buffered_notifications, sent after the updates
+        # buffered before it:
+        if not push.buffer_notification(None, send):
+            send()
 
     def notify_scratch_org_error(
         self, *, error, type_, originating_user_id, message=None
@@ -107,13 +113,18 @@ class PushMixin:
         follows the pattern enough that I wanted to move it into this
         mixin.
         """
-        async_to_sync(push.report_scratch_org_error)(
-            self,
-            error=error,
-            type_=type_,
-            originating_user_id=originating_user_id,
-            message=message or {},
-        )
+
+        def send():
+            async_to_sync(push.report_scratch_org_error)(
+                self,
+                error=error,
+                type_=type_,
+                originating_user_id=originating_user_id,
+                message=message or {},
+            )
+
+        if not push.buffer_notification(None, send):
+            send()
 
 
 class CreatePrMixin:
@@ -190,17 +201,39 @@ class SoftDeleteQuerySet(models.QuerySet):
         return self.filter(deleted_at__isnull=False)
 
     def notify_soft_deleted(self, *, preserve_sf_org=False):
+        """
+        Instead of notifying about each instance, send one
+        SOFT_DELETE_MANY notification about each parent, listing the ids
+        of its deleted children, and tear down the Salesforce orgs of
+        deleted scratch orgs in a single job.
+        """
+        parent_field = self.model.soft_delete_parent_field
+        ids_by_parent = defaultdict(list)
+        for parent_id, id_ in self.values_list(f"{parent_field}_id", "id"):
+            ids_by_parent[str(parent_id)].append(str(id_))
+        if not ids_by_parent:
+            return
+
         if self.model.__name__ == "ScratchOrg" and not preserve_sf_org:
-            for scratch_org in self:
-                try:
-                    scratch_org.queue_delete(originating_user_id=None)
-                except Exception:  # pragma: nocover
-                    # If there's a problem deleting it, it's probably
-                    # already been deleted.
-                    pass
-        else:
-            for instance in self:
-                instance.notify_changed(type_="SOFT_DELETE", originating_user_id=None)
+            from .jobs import delete_scratch_orgs_job
+
+            delete_scratch_orgs_job.delay(
+                [id_ for ids in ids_by_parent.values() for id_ in ids]
+            )
+
+        object_type = camel_to_snake(self.model.__name__)
+        parent_model = self.model._meta.get_field(parent_field).related_model
+        for parent in parent_model.objects.filter(pk__in=ids_by_parent):
+            # Not buffered, as a later batch for the same parent would
+            # replace this one:
+            parent._push_message(
+                "SOFT_DELETE_MANY",
+                {
+                    "originating_user_id": None,
+                    "object_type": object_type,
+                    "ids": ids_by_parent[str(parent.id)],
+                },
+            )
 
     def delete(self, *, preserve_sf_org=False):
         soft_delete_child_class = getattr(self.model, "soft_delete_child_class", None)
@@ -220,7 +253,9 @@ class SoftDeleteQuerySet(models.QuerySet):
 
 class SoftDeleteMixin(models.Model):
     """
-    Assumes you're also mixing in PushMixin.
+    Assumes you're also mixing in PushMixin, and that the model has a
+    soft_delete_parent_field naming the foreign key that deleting it in
+    bulk notifies about.
     """
 
     class Meta:
@@ -1,22 +1,34 @@
 import html
 import logging
+import time
 from datetime import timedelta
 
 from allauth.account.signals import user_logged_in
-from allauth.socialaccount.models import SocialAccount
+from allauth.socialaccount.models import SocialAccount, SocialToken
 from asgiref.sync import async_to_sync
 from cryptography.fernet import InvalidToken
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import UserManager as BaseUserManager
 from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models, transaction
-from django.db.models.signals import post_save
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    prefetch_related_objects,
+)
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
@@ -28,7 +40,7 @@ from sfdo_template_helpers.fields import MarkdownField, StringField
 from sfdo_template_helpers.slugs import AbstractSlug, SlugMixin
 from simple_salesforce.exceptions import SalesforceError
 
-from . import gh, push
+from . import gh, gh_graphql, push
 from .constants import ORGANIZATION_DETAILS
 from .email_utils import get_user_facing_url
 from .model_mixins import (
@@ -37,19 +49,32 @@ from .model_mixins import (
     PopulateRepoIdMixin,
     PushMixin,
     SoftDeleteMixin,
+    SoftDeleteQuerySet,
     TimestampsMixin,
 )
 from .sf_run_flow import get_devhub_api, refresh_access_token
+from .slug_cache import invalidate_slugs
 from .validators import validate_unicode_branch
 
 logger = logging.getLogger(__name__)
 
+# GitHubRepository rows are synced this many at a time:
+REPOSITORY_SYNC_BATCH_SIZE = 100
+DEVHUB_ENABLED_KEY = "devhub-enabled:{user_id}:{sf_username}"
+DEVHUB_ENABLED_LOCK_KEY = "devhub-enabled-lock:{user_id}"
+
 ORG_TYPES = Choices("Production", "Scratch", "Sandbox", "Developer")
 SCRATCH_ORG_TYPES = Choices("Dev", "QA")
 EPIC_STATUSES = Choices("Planned", "In progress", "Review", "Merged")
 TASK_STATUSES = Choices(
     ("Planned", "Planned"), ("In progress", "In progress"), ("Completed", "Completed")
 )
+# Epics keep a count of their tasks in each status, in these fields:
+EPIC_TASK_COUNT_FIELDS = {
+    TASK_STATUSES.Planned: "planned_task_count",
+    TASK_STATUSES["In progress"]: "in_progress_task_count",
+    TASK_STATUSES.Completed: "completed_task_count",
+}
 TASK_REVIEW_STATUS = Choices(
     ("Approved", "Approved"), ("Changes requested", "Changes requested")
 )
@@ -64,8 +89,22 @@ class SiteProfile(TranslatableModel):
     )
 
 
+def social_accounts_prefetch():
+    return Prefetch(
+        "socialaccount_set",
+        queryset=SocialAccount.objects.order_by("pk").prefetch_related(
+            Prefetch("socialtoken_set", queryset=SocialToken.objects.order_by("pk"))
+        ),
+    )
+
+
 class UserQuerySet(models.QuerySet):
-    pass
+    def with_social_accounts(self):
+        """
+        Load the users' social accounts and tokens up front, rather than
+        with a few queries for each user.
+        """
+        return self.prefetch_related(social_accounts_prefetch())
 
 
 class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
@@ -76,6 +115,7 @@ class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
 class User(HashIdMixin, AbstractUser):
     objects = UserManager()
     currently_fetching_repos = models.BooleanField(default=False)
+    repositories_synced_at = models.DateTimeField(null=True, blank=True)
     devhub_username = StringField(blank=True, default="")
     allow_devhub_override = models.BooleanField(default=False)
     agreed_to_tos_at = models.DateTimeField(null=True, blank=True)
@@ -95,40 +135,143 @@ class User(HashIdMixin, AbstractUser):
             fail_silently=False,
         )
 
-    def queue_refresh_repositories(self):
-        """Queue a job to refresh repositories unless we're already doing so"""
+    def queue_refresh_repositories(self, *, force=False):
+        """
+        Queue a job to refresh repositories unless we're already doing
+        so, or did so recently enough.
+        """
         from .jobs import refresh_github_repositories_for_user_job
 
-        if not self.currently_fetching_repos:
-            self.currently_fetching_repos = True
-            self.save()
-            refresh_github_repositories_for_user_job.delay(self)
+        if self.currently_fetching_repos:
+            return
+        recently = timezone.now() - timedelta(
+            minutes=settings.GITHUB_REPOSITORY_SYNC_MINUTES
+        )
+        if (
+            not force
+            and self.repositories_synced_at
+            and self.repositories_synced_at > recently
+        ):
+            return
+        self.currently_fetching_repos = True
+        self.save()
+        refresh_github_repositories_for_user_job.delay(self)
 
     def refresh_repositories(self):
+        """
+        Bring the user's GitHubRepository rows in line with GitHub,
+        touching only rows that changed. Rows are written a page at a
+        time as the repos come in, so readers never see an empty list.
+        """
         try:
-            repos = gh.get_all_org_repos(self)
-            with transaction.atomic():
-                GitHubRepository.objects.filter(user=self).delete()
-                GitHubRepository.objects.bulk_create(
-                    [
-                        GitHubRepository(
-                            user=self, repo_id=repo.id, repo_url=repo.html_url
-                        )
-                        for repo in repos
-                    ]
-                )
+            existing = {
+                repo_id: (pk, repo_url)
+                for pk, repo_id, repo_url in GitHubRepository.objects.filter(
+                    user=self
+                ).values_list("pk", "repo_id", "repo_url")
+            }
+            seen = set()
+            batch = []
+            for repo in gh.get_all_org_repos(self):
+                if repo.id in seen:
+                    continue
+                seen.add(repo.id)
+                batch.append(repo)
+                if len(batch) >= REPOSITORY_SYNC_BATCH_SIZE:
+                    self._upsert_repositories(batch, existing)
+                    batch = []
+            self._upsert_repositories(batch, existing)
+            GitHubRepository.objects.filter(
+                pk__in=[
+                    pk for repo_id, (pk, _) in existing.items() if repo_id not in seen
+                ]
+            ).delete()
+            User.objects.filter(pk=self.pk).update(
+                repositories_synced_at=timezone.now()
+            )
         finally:
             self.refresh_from_db()
             self.currently_fetching_repos = False
             self.save()
             self.notify_repositories_updated()
 
+    def _upsert_repositories(self, repos, existing):
+        new = []
+        changed = []
+        for repo in repos:
+            if repo.id not in existing:
+                new.append(
+                    GitHubRepository(user=self, repo_id=repo.id, repo_url=repo.html_url)
+                )
+            elif existing[repo.id][1] != repo.html_url:
+                changed.append(
+                    GitHubRepository(
+                        pk=existing[repo.id][0],
+                        user=self,
+                        repo_id=repo.id,
+                        repo_url=repo.html_url,
+                    )
+                )
+        with transaction.atomic():
+            GitHubRepository.objects.bulk_create(new, ignore_conflicts=True)
+            GitHubRepository.objects.bulk_update(changed, ["repo_url"])
+
     def notify_repositories_updated(self):
         message = {"type": "USER_REPOS_REFRESH"}
         async_to_sync(push.push_message_about_instance)(self, message)
 
     def invalidate_salesforce_credentials(self):
+        cache.delete(self._devhub_enabled_key())
         self.socialaccount_set.filter(provider="salesforce").delete()
+        self.invalidate_social_accounts()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.invalidate_social_accounts()
+
+    def __getstate__(self):
+        # Keep loaded credentials, decrypted tokens included, out of
+        # pickled copies such as job arguments:
+        state = super().__getstate__().copy()
+        state.pop("_social_accounts", None)
+        state.pop("sf_token", None)
+        # Prefetched by User.objects.with_social_accounts(), tokens and all:
+        if "_prefetched_objects_cache" in state:
+            state["_prefetched_objects_cache"] = {
+                name: objects
+                for name, objects in state["_prefetched_objects_cache"].items()
+                if name != "socialaccount_set"
+            }
+        return state
+
+    def invalidate_social_accounts(self):
+        """
+        Forget the social accounts and tokens loaded for this user, so
+        they are loaded again on next use.
+        """
+        self.__dict__.pop("_social_accounts", None)
+        self.__dict__.pop("sf_token", None)
+        self.__dict__.pop("is_devhub_enabled", None)
+        getattr(self, "_prefetched_objects_cache", {}).pop("socialaccount_set", None)
+
+    @cached_property
+    def _social_accounts(self):
+        """
+        The user's first social account for each provider. These and
+        their tokens are loaded in one go, unless they were already
+        prefetched by UserQuerySet.with_social_accounts.
+        """
+        prefetch_related_objects([self], social_accounts_prefetch())
+        accounts = {}
+        for account in self.socialaccount_set.all():
+            accounts.setdefault(account.provider, account)
+        return accounts
+
+    def _get_social_token(self, provider):
+        account = self._social_accounts.get(provider)
+        if account is None:
+            return None
+        return next(iter(account.socialtoken_set.all()), None)
 
     def subscribable_by(self, user):
         return self == user
@@ -209,10 +352,11 @@ class User(HashIdMixin, AbstractUser):
         except (AttributeError, KeyError):
             return None
 
-    @property
+    @cached_property
     def sf_token(self):
+        # Decrypted once per instance; see invalidate_social_accounts.
         try:
-            token = self.salesforce_account.socialtoken_set.first()
+            token = self._get_social_token("salesforce")
             return (
                 fernet_decrypt(token.token) if token.token else None,
                 token.token_secret if token.token_secret else None,
@@ -222,15 +366,20 @@ class User(HashIdMixin, AbstractUser):
 
     @property
     def gh_token(self):
-        return self.socialaccount_set.get(provider="github").socialtoken_set.get().token
+        if self.github_account is None:
+            raise SocialAccount.DoesNotExist
+        token = self._get_social_token("github")
+        if token is None:
+            raise SocialToken.DoesNotExist
+        return token.token
 
     @property
     def github_account(self):
-        return self.socialaccount_set.filter(provider="github").first()
+        return self._social_accounts.get("github")
 
     @property
     def salesforce_account(self):
-        return self.socialaccount_set.filter(provider="salesforce").first()
+        return self._social_accounts.get("salesforce")
 
     @property
     def valid_token_for(self):
@@ -240,24 +389,70 @@ class User(HashIdMixin, AbstractUser):
             return self.org_id
         return None
 
-    @cached_property
-    def is_devhub_enabled(self):
-        # We can shortcut and avoid making an HTTP request in some cases:
+    def _devhub_enabled_key(self):
+        return DEVHUB_ENABLED_KEY.format(user_id=self.id, sf_username=self.sf_username)
+
+    def _devhub_enabled_shortcut(self):
+        """
+        Return whether the user can use a Dev Hub if we can tell without
+        asking Salesforce, or None if we can't.
+        """
         if self.devhub_username or self.uses_global_devhub:
             return True
         if not self.salesforce_account:
             return False
         if self.full_org_type in (ORG_TYPES.Scratch, ORG_TYPES.Sandbox):
             return False
+        return None
 
+    @cached_property
+    def is_devhub_enabled(self):
+        """
+        Answered from the shared cache where possible. A stale answer is
+        still used, while a job checks again in the background; only a
+        user with no answer cached at all waits on Salesforce.
+        """
+        shortcut = self._devhub_enabled_shortcut()
+        if shortcut is not None:
+            return shortcut
+        if not settings.DEVHUB_ENABLED_CACHE_TIMEOUT:
+            return self.check_devhub_enabled()
+        cached = cache.get(self._devhub_enabled_key())
+        if cached is None:
+            return self.check_devhub_enabled()
+        if (
+            cached["checked_at"]
+            < time.time() - settings.DEVHUB_ENABLED_REVALIDATE_AFTER
+        ):
+            self.queue_check_devhub_enabled()
+        return cached["enabled"]
+
+    def check_devhub_enabled(self):
         try:
             client = get_devhub_api(devhub_username=self.sf_username)
-            resp = client.restful("sobjects/ScratchOrgInfo")
-            if resp:
-                return True
-            return False
+            enabled = bool(client.restful("sobjects/ScratchOrgInfo"))
+            checked_at = time.time()
         except (SalesforceError, HTTPError):
-            return False
+            enabled = False
+            # Don't trust a failure for long; check again on next use:
+            checked_at = 0
+        if settings.DEVHUB_ENABLED_CACHE_TIMEOUT:
+            cache.set(
+                self._devhub_enabled_key(),
+                {"enabled": enabled, "checked_at": checked_at},
+                timeout=settings.DEVHUB_ENABLED_CACHE_TIMEOUT,
+            )
+        return enabled
+
+    def queue_check_devhub_enabled(self):
+        from .jobs import check_devhub_enabled_job
+
+        if self._devhub_enabled_shortcut() is not None:
+            return
+        # One check at a time per user; the job releases this:
+        lock_key = DEVHUB_ENABLED_LOCK_KEY.format(user_id=self.id)
+        if cache.add(lock_key, True, timeout=settings.DEVHUB_ENABLED_REVALIDATE_AFTER):
+            check_devhub_enabled_job.delay(self)
 
 
 class ProjectSlug(AbstractSlug):
@@ -296,6 +491,9 @@ class Project(
     #     "avatar_url": str,
     #   }
     github_users = models.JSONField(default=list, blank=True)
+    # The parts of the project config on the default branch that we use,
+    # as returned by gh.get_project_config_summary:
+    config_summary = models.JSONField(default=dict, blank=True)
 
     slug_class = ProjectSlug
     tracker = FieldTracker(fields=["name"])
@@ -356,6 +554,37 @@ class Project(
         else:
             self.notify_error(error, originating_user_id=originating_user_id)
 
+    def get_cached_config_summary(self):
+        """
+        Return the config summary if it's known to match the default
+        branch, or None, without making any requests.
+        """
+        blob_sha = gh.get_cached_config_blob_sha(self.repo_id)
+        if blob_sha is not None and blob_sha == self.config_summary.get("blob_sha"):
+            return self.config_summary
+        return None
+
+    def get_config_summary(self):
+        """
+        Return the config summary, reparsing the project config only if
+        cumulusci.yml on the default branch has changed.
+        """
+        summary = self.get_cached_config_summary()
+        if summary is not None:
+            return summary
+        repo = gh.get_repo_info(
+            None, repo_owner=self.repo_owner, repo_name=self.repo_name
+        )
+        if gh.get_config_blob_sha(repo) != self.config_summary.get("blob_sha"):
+            self.config_summary = gh.get_project_config_summary(repo)
+            Project.objects.filter(pk=self.pk).update(
+                config_summary=self.config_summary
+            )
+        return self.config_summary
+
+    def invalidate_config_summary(self):
+        gh.invalidate_config_blob_sha(self.repo_id)
+
     def queue_refresh_commits(self, *, ref, originating_user_id):
         from .jobs import refresh_commits_job
 
@@ -420,6 +649,12 @@ class Epic(
     available_task_org_config_names = models.JSONField(default=list, blank=True)
     currently_fetching_org_config_names = models.BooleanField(default=False)
 
+    # Maintained by Task.save, so that the status can be derived without
+    # scanning the tasks:
+    planned_task_count = models.IntegerField(default=0)
+    in_progress_task_count = models.IntegerField(default=0)
+    completed_task_count = models.IntegerField(default=0)
+
     project = models.ForeignKey(Project, on_delete=models.PROTECT, related_name="epics")
 
     # User data is shaped like this:
@@ -438,12 +673,23 @@ class Epic(
 
     def save(self, *args, **kwargs):
         self.update_status()
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # Don't overwrite the task counts with what may be stale
+            # values; Task.save updates them in the database directly:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in EPIC_TASK_COUNT_FIELDS.values()
+            ]
         return super().save(*args, **kwargs)
 
     def subscribable_by(self, user):  # pragma: nocover
         return True
 
     # begin SoftDeleteMixin configuration:
+    soft_delete_parent_field = "project"
+
     def soft_delete_child_class(self):
         return Task
 
@@ -484,15 +730,13 @@ class Epic(
         create_gh_branch_for_new_epic_job.delay(self, user=user)
 
     def should_update_in_progress(self):
-        task_statuses = self.tasks.values_list("status", flat=True)
-        return task_statuses and any(
-            status != TASK_STATUSES.Planned for status in task_statuses
-        )
+        return self.in_progress_task_count + self.completed_task_count > 0
 
     def should_update_review(self):
-        task_statuses = self.tasks.values_list("status", flat=True)
-        return task_statuses and all(
-            status == TASK_STATUSES.Completed for status in task_statuses
+        return (
+            self.completed_task_count > 0
+            and self.planned_task_count == 0
+            and self.in_progress_task_count == 0
         )
 
     def should_update_merged(self):
@@ -543,6 +787,14 @@ class Epic(
     def queue_available_task_org_config_names(self, user):
         from .jobs import available_task_org_config_names_job
 
+        summary = self.project.get_cached_config_summary()
+        if summary is not None:
+            self.available_task_org_config_names = summary["scratch_org_configs"]
+            self.finalize_available_task_org_config_names(
+                originating_user_id=str(user.id)
+            )
+            return
+
         self.currently_fetching_org_config_names = True
         self.save()
         self.notify_changed(originating_user_id=str(user.id))
@@ -565,6 +817,19 @@ class TaskSlug(AbstractSlug):
     parent = models.ForeignKey("Task", on_delete=models.CASCADE, related_name="slugs")
 
 
+class TaskQuerySet(SoftDeleteQuerySet):
+    def for_serialization(self):
+        """
+        Prefetch the recent commits and count the commits that
+        TaskSerializer includes, for all tasks at once.
+        """
+        return self.annotate(commits_count=Count("commits")).prefetch_related(
+            Prefetch(
+                "commits", queryset=Commit.objects.recent(), to_attr="recent_commits"
+            )
+        )
+
+
 class Task(
     CreatePrMixin,
     PushMixin,
@@ -582,7 +847,6 @@ class Task(
     )
     org_config_name = StringField()
 
-    commits = models.JSONField(default=list, blank=True)
     origin_sha = StringField(blank=True, default="")
     metecho_commits = models.JSONField(default=list, blank=True)
     has_unmerged_commits = models.BooleanField(default=False)
@@ -614,23 +878,49 @@ class Task(
     assigned_qa = models.JSONField(null=True, blank=True)
 
     slug_class = TaskSlug
-    tracker = FieldTracker(fields=["name"])
+    tracker = FieldTracker(fields=["name", "status", "epic"])
+
+    objects = TaskQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
     def save(self, *args, force_epic_save=False, **kwargs):
-        ret = super().save(*args, **kwargs)
+        if self._state.adding:
+            old_epic_id, old_status = None, None
+        else:
+            old_epic_id = self.tracker.previous("epic")
+            old_status = self.tracker.previous("status")
+        with transaction.atomic():
+            ret = super().save(*args, **kwargs)
+            self.update_epic_task_counts(old_epic_id=old_epic_id, old_status=old_status)
         # To update the epic's status:
         if force_epic_save or self.epic.should_update_status():
             self.epic.save()
             self.epic.notify_changed(originating_user_id=None)
         return ret
 
+    def update_epic_task_counts(self, *, old_epic_id, old_status):
+        """
+        Move this task from the count for ``old_status`` on the epic
+        ``old_epic_id`` (if any) to the count for its current status on
+        its current epic.
+        """
+        if old_epic_id == self.epic_id and old_status == self.status:
+            return
+        if old_epic_id is not None:
+            field = EPIC_TASK_COUNT_FIELDS[old_status]
+            Epic.objects.filter(pk=old_epic_id).update(**{field: F(field) - 1})
+        field = EPIC_TASK_COUNT_FIELDS[self.status]
+        Epic.objects.filter(pk=self.epic_id).update(**{field: F(field) + 1})
+        self.epic.refresh_from_db(fields=EPIC_TASK_COUNT_FIELDS.values())
+
     def subscribable_by(self, user):  # pragma: nocover
         return True
 
     # begin SoftDeleteMixin configuration:
+    soft_delete_parent_field = "epic"
+
     def soft_delete_child_class(self):
         return ScratchOrg
 
@@ -652,12 +942,12 @@ class Task(
 
     @property
     def get_all_users_in_commits(self):
-        ret = []
-        for commit in self.commits:
-            if commit["author"] not in ret:
-                ret.append(commit["author"])
-        ret.sort(key=lambda d: d["username"])
-        return ret
+        return list(
+            CommitAuthor.objects.filter(commits__task=self)
+            .distinct()
+            .order_by("username", "name", "email")
+            .values(*COMMIT_AUTHOR_FIELDS)
+        )
 
     def add_reviewer(self, user):
         if user not in self.reviewers:
@@ -702,28 +992,41 @@ class Task(
 
     # end CreatePrMixin configuration
 
+    @property
+    def latest_commit_sha(self):
+        commit = self.commits.only("sha").first()
+        return commit.sha if commit else ""
+
     def update_review_valid(self):
-        review_valid = bool(
-            self.review_sha
-            and self.commits
-            and self.review_sha == self.commits[0].get("id")
+        self.review_valid = bool(
+            self.review_sha and self.review_sha == self.latest_commit_sha
         )
-        self.review_valid = review_valid
 
-    def update_has_unmerged_commits(self):
+    def update_has_unmerged_commits(self, *, state=None):
+        """
+        If the caller already has this task's branch state, as returned
+        by gh_graphql.get_branch_states, it can pass it in as ``state``
+        to save looking it up again.
+        """
         base = self.get_base()
         head = self.get_head()
-        if head and base:
+        if not (head and base):
+            return
+        if state is None:
             repo = gh.get_repo_info(
                 None,
                 repo_owner=self.epic.project.repo_owner,
                 repo_name=self.epic.project.repo_name,
             )
-            base_sha = repo.branch(base).commit.sha
-            head_sha = repo.branch(head).commit.sha
-            self.has_unmerged_commits = (
-                repo.compare_commits(base_sha, head_sha).ahead_by > 0
-            )
+            if settings.GITHUB_USE_GRAPHQL:
+                _base_sha, states = gh_graphql.get_branch_states(repo, base, [head])
+                state = states[head]
+            else:
+                base_sha = repo.branch(base).commit.sha
+                head_sha = repo.branch(head).commit.sha
+                state = {"ahead_by": repo.compare_commits(base_sha, head_sha).ahead_by}
+        if state:
+            self.has_unmerged_commits = state["ahead_by"] > 0
 
     def finalize_task_update(self, *, originating_user_id):
         self.save()
@@ -765,15 +1068,30 @@ class Task(
             self.notify_changed(originating_user_id=originating_user_id)
 
     def add_commits(self, commits, sender):
-        self.commits = [
-            gh.normalize_commit(c, sender=sender) for c in commits
-        ] + self.commits
+        Commit.objects.add_normalized(
+            self, [gh.normalize_commit(c, sender=sender) for c in commits]
+        )
         self.update_has_unmerged_commits()
         self.update_review_valid()
         self.save()
         # This comes from the GitHub hook, and so has no originating user:
         self.notify_changed(originating_user_id=None)
 
+    def set_commits(self, commits):
+        """
+        Replace this task's commits with ``commits``, normalized and
+        newest first, keeping the rows of commits it already has but
+        renumbering them in the new branch order.
+        """
+        shas = [commit["id"] for commit in commits]
+        sequences = {sha: len(shas) - i for i, sha in enumerate(shas)}
+        self.commits.exclude(sha__in=shas).delete()
+        kept = list(self.commits.only("id", "sha", "sequence"))
+        for commit in kept:
+            commit.sequence = sequences[commit.sha]
+        Commit.objects.bulk_update(kept, ["sequence"])
+        Commit.objects.add_normalized(self, reversed(commits), sequences=sequences)
+
     def add_metecho_git_sha(self, sha):
         self.metecho_commits.append(sha)
 
@@ -829,6 +1147,110 @@ class Task(
         # unique_together = (("name", "epic"),)
 
 
+COMMIT_AUTHOR_FIELDS = ("name", "email", "username", "avatar_url")
+
+
+class CommitAuthor(models.Model):
+    name = StringField(blank=True, default="")
+    email = StringField(blank=True, default="")
+    username = StringField(blank=True, default="")
+    avatar_url = StringField(blank=True, default="")
+
+    def __str__(self):
+        return self.username or self.name
+
+    class Meta:
+        unique_together = (COMMIT_AUTHOR_FIELDS,)
+
+
+class CommitQuerySet(models.QuerySet):
+    def recent(self):
+        """
+        The TASK_RECENT_COMMITS latest commits of each task, with their
+        authors, for prefetching.
+        """
+        latest = Commit.objects.filter(task=OuterRef("task")).values("id")
+        return self.filter(
+            id__in=Subquery(latest[: settings.TASK_RECENT_COMMITS])
+        ).select_related("author")
+
+    def add_normalized(self, task, commits, *, sequences=None):
+        """
+        Insert commits, as returned by gh.normalize_commit, oldest first,
+        after the task's latest commit; or pass ``sequences`` to number
+        them by SHA. Commits the task already has are skipped.
+        """
+        if sequences is None:
+            latest = task.commits.aggregate(latest=Max("sequence"))["latest"] or 0
+        authors = {}
+        rows = []
+        for commit in commits:
+            key = tuple(commit["author"].get(f) or "" for f in COMMIT_AUTHOR_FIELDS)
+            if key not in authors:
+                authors[key], _ = CommitAuthor.objects.get_or_create(
+                    **dict(zip(COMMIT_AUTHOR_FIELDS, key))
+                )
+            timestamp = parse_datetime(commit["timestamp"] or "")
+            if timestamp and timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp, timezone.utc)
+            if sequences is None:
+                latest += 1
+                sequence = latest
+            else:
+                sequence = sequences[commit["id"]]
+            rows.append(
+                Commit(
+                    task=task,
+                    sha=commit["id"],
+                    sequence=sequence,
+                    timestamp=timestamp,
+                    author=authors[key],
+                    message=commit["message"],
+                    url=commit["url"],
+                )
+            )
+        self.bulk_create(rows, ignore_conflicts=True)
+
+
+class Commit(models.Model):
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="commits")
+    sha = StringField()
+    # Position in the branch history, counting up from the oldest commit:
+    sequence = models.PositiveIntegerField(default=0)
+    timestamp = models.DateTimeField(null=True, blank=True)
+    author = models.ForeignKey(
+        CommitAuthor, on_delete=models.PROTECT, related_name="commits"
+    )
+    message = StringField(blank=True, default="")
+    url = StringField(blank=True, default="")
+
+    objects = CommitQuerySet.as_manager()
+
+    def __str__(self):
+        return self.sha
+
+    class Meta:
+        # Newest first, in branch order rather than by timestamp, which
+        # rebases and clock skew can put out of order:
+        ordering = ("-sequence", "-id")
+        unique_together = (("task", "sha"),)
+        indexes = [
+            models.Index(
+                fields=["task", "-sequence"], name="api_commit_task_sequence_idx"
+            )
+        ]
+
+
+class ScratchOrgQuerySet(SoftDeleteQuerySet):
+    def for_serialization(self):
+        """
+        Leave out the large fields that ScratchOrgSerializer never uses.
+        They are still loaded on first access if something does need
+        them, and saving leaves them as they are.
+        """
+        return self.defer("latest_revision_numbers", "config")
+
+
 class ScratchOrg(
     SoftDeleteMixin, PushMixin, HashIdMixin, TimestampsMixin, models.Model
 ):
@@ -865,7 +1287,11 @@ class ScratchOrg(
     valid_target_directories = models.JSONField(
         default=dict, encoder=DjangoJSONEncoder, blank=True
     )
-    cci_log = models.TextField(blank=True)
+    # Kept in step with the changes above by save():
+    total_unsaved_changes = models.IntegerField(default=0)
+    total_ignored_changes = models.IntegerField(default=0)
+
+    objects = ScratchOrgQuerySet.as_manager()
 
     def _build_message_extras(self):
         return {
@@ -881,7 +1307,14 @@ class ScratchOrg(
 
     def save(self, *args, **kwargs):
         is_new = self.id is None
-        self.clean_config()
+        deferred = self.get_deferred_fields()
+        if "config" not in deferred:
+            self.clean_config()
+        for kind in ("unsaved", "ignored"):
+            if f"{kind}_changes" not in deferred:
+                changes = getattr(self, f"{kind}_changes")
+                total = sum(len(members) for members in changes.values())
+                setattr(self, f"total_{kind}_changes", total)
         ret = super().save(*args, **kwargs)
 
         if is_new:
@@ -911,6 +1344,11 @@ class ScratchOrg(
         org_config = self.get_refreshed_org_config()
         return org_config.start_url
 
+    # begin SoftDeleteMixin configuration:
+    soft_delete_parent_field = "task"
+
+    # end SoftDeleteMixin configuration
+
     # begin PushMixin configuration:
     push_update_type = "SCRATCH_ORG_UPDATE"
     push_error_type = "SCRATCH_ORG_ERROR"
@@ -963,6 +1401,12 @@ class ScratchOrg(
             scratch_org=self, originating_user_id=originating_user_id
         )
 
+    def notify_flow_progress(self, lines):
+        self._push_message(
+            "SCRATCH_ORG_FLOW_PROGRESS",
+            {"originating_user_id": None, "lines": lines},
+        )
+
     def finalize_provision(self, *, error=None, originating_user_id):
         if error is None:
             self.save()
@@ -1130,15 +1574,40 @@ class ScratchOrg(
             self.delete()
 
 
+class ScratchOrgLogChunk(models.Model):
+    """
+    One zlib-compressed piece of the CumulusCI log of a scratch org; see
+    org_logs.py.
+    """
+
+    scratch_org = models.ForeignKey(
+        ScratchOrg, on_delete=models.CASCADE, related_name="log_chunks"
+    )
+    index = models.PositiveIntegerField()
+    # Position and length of this chunk in the uncompressed log:
+    offset = models.PositiveBigIntegerField()
+    size = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ("index",)
+        unique_together = (("scratch_org", "index"),)
+
+
 @receiver(user_logged_in)
 def user_logged_in_handler(sender, *, user, **kwargs):
     user.queue_refresh_repositories()
+    if settings.DEVHUB_ENABLED_CACHE_TIMEOUT:
+        user.queue_check_devhub_enabled()
 
 
 def ensure_slug_handler(sender, *, created, instance, **kwargs):
     slug_field_name = getattr(instance, "slug_field_name", "name")
     if created:
         instance.ensure_slug()
+        # Invalidating any earlier would let other requests cache the
+        # slugs again before they can see the new one:
+        transaction.on_commit(lambda: invalidate_slugs(instance))
     elif instance.tracker.has_changed(slug_field_name):
         # Create new slug off new name:
         sluggable_name = getattr(instance, slug_field_name)
@@ -1147,8 +1616,15 @@ def ensure_slug_handler(sender, *, created, instance, **kwargs):
         instance.slug_class.objects.create(
             parent=instance.slug_parent, slug=slug, is_active=True
         )
+        transaction.on_commit(lambda: invalidate_slugs(instance))
+
+
+def task_deleted_handler(sender, *, instance, **kwargs):
+    field = EPIC_TASK_COUNT_FIELDS[instance.status]
+    Epic.objects.filter(pk=instance.epic_id).update(**{field: F(field) - 1})
 
 
 post_save.connect(ensure_slug_handler, sender=Project)
 post_save.connect(ensure_slug_handler, sender=Epic)
 post_save.connect(ensure_slug_handler, sender=Task)
+post_delete.connect(task_deleted_handler, sender=Task)
@@ -0,0 +1,173 @@
+"""
+Storage for the CumulusCI logs of scratch org flow runs.
+
+Logs are kept as a sequence of zlib-compressed chunks in
+ScratchOrgLogChunk, of at most SCRATCH_ORG_LOG_CHUNK_BYTES each before
+compression. A log is stored as the flow runs, a chunk at a time, and
+once it grows past SCRATCH_ORG_LOG_MAX_BYTES its oldest chunks are
+dropped. Both storing and reading a log hold one chunk in memory at a
+time.
+"""
+
+import re
+import time
+import zlib
+from collections import deque
+
+from django.conf import settings
+from django.db.models import F, Sum
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+class LogWriter:
+    """
+    Replaces the stored log of a scratch org with what's written to it.
+    Use it as a context manager, so that the last, partial chunk is stored
+    on the way out.
+    """
+
+    def __init__(self, scratch_org):
+        from .models import ScratchOrgLogChunk
+
+        self.scratch_org = scratch_org
+        self.chunks = ScratchOrgLogChunk.objects.filter(scratch_org=scratch_org)
+        self.chunks.delete()
+        self.buffer = bytearray()
+        self.index = 0
+        self.size = 0
+        # Sizes of the chunks stored so far, oldest first:
+        self.chunk_sizes = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, data):
+        chunk_size = settings.SCRATCH_ORG_LOG_CHUNK_BYTES
+        self.buffer += data
+        while len(self.buffer) >= chunk_size:
+            self._store(bytes(self.buffer[:chunk_size]))
+            del self.buffer[:chunk_size]
+
+    def close(self):
+        if self.buffer:
+            self._store(bytes(self.buffer))
+            self.buffer.clear()
+
+    def _store(self, data):
+        from .models import ScratchOrgLogChunk
+
+        ScratchOrgLogChunk.objects.create(
+            scratch_org=self.scratch_org,
+            index=self.index,
+            offset=self.size,
+            size=len(data),
+            data=zlib.compress(data),
+        )
+        self.index += 1
+        self.size += len(data)
+        self.chunk_sizes.append(len(data))
+        self._trim()
+
+    def _trim(self):
+        dropped = 0
+        while (
+            self.size - dropped > settings.SCRATCH_ORG_LOG_MAX_BYTES
+            and len(self.chunk_sizes) > 1
+        ):
+            dropped += self.chunk_sizes.popleft()
+        if dropped:
+            self.chunks.filter(index__lt=self.index - len(self.chunk_sizes)).delete()
+            # Keep offsets relative to the start of what's kept:
+            self.chunks.update(offset=F("offset") - dropped)
+            self.size -= dropped
+
+
+class FlowOutput(LogWriter):
+    """
+    A LogWriter for the output of a flow run, written to it a line at a
+    time, that also sends the latest lines in progress notifications
+    about the scratch org, at most every SCRATCH_ORG_PROGRESS_INTERVAL
+    seconds.
+    """
+
+    def __init__(self, scratch_org):
+        super().__init__(scratch_org)
+        self.lines = deque(maxlen=settings.SCRATCH_ORG_PROGRESS_LINES)
+        self.sent_at = None
+
+    def write(self, data):
+        super().write(data)
+        line = data.decode("utf-8", "replace").rstrip()
+        if line:
+            self.lines.append(line)
+        if self.lines and (
+            self.sent_at is None
+            or time.monotonic() - self.sent_at >= settings.SCRATCH_ORG_PROGRESS_INTERVAL
+        ):
+            self.send_progress()
+
+    def close(self):
+        super().close()
+        if self.lines:
+            self.send_progress()
+
+    def send_progress(self):
+        self.scratch_org.notify_flow_progress(list(self.lines))
+        self.lines.clear()
+        self.sent_at = time.monotonic()
+
+
+def get_log_size(scratch_org):
+    """
+    Return the uncompressed size of the stored log, in bytes.
+    """
+    return scratch_org.log_chunks.aggregate(size=Sum("size"))["size"] or 0
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range HTTP Range header against a log of ``size``
+    bytes, returning the inclusive (start, end) byte positions, or None
+    if there's no header or it isn't a byte range we understand (which
+    means serving the whole log). Raises UnsatisfiableRange if the range
+    is outside the log.
+    """
+    match = RANGE_RE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # A suffix range, the last N bytes:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise UnsatisfiableRange
+    return start, end
+
+
+def iter_log(scratch_org, start=0, end=None):
+    """
+    Yield the bytes of the stored log from ``start`` to ``end``
+    (inclusive), decompressing only the chunks that overlap them, one
+    at a time.
+    """
+    chunks = scratch_org.log_chunks.annotate(chunk_end=F("offset") + F("size"))
+    chunks = chunks.filter(chunk_end__gt=start)
+    if end is not None:
+        chunks = chunks.filter(offset__lte=end)
+    for offset, data in chunks.order_by("index").values_list("offset", "data"):
+        data = zlib.decompress(data)
+        first = max(start - offset, 0)
+        last = len(data) if end is None else min(end - offset + 1, len(data))
+        yield data[first:last]
@@ -8,12 +8,14 @@ Websocket notifications you can subscribe to:
     project.:id
         PROJECT_UPDATE
         PROJECT_UPDATE_ERROR
+        SOFT_DELETE_MANY
 
     epic.:id
         EPIC_UPDATE
         EPIC_CREATE_PR
         EPIC_CREATE_PR_FAILED
         SOFT_DELETE
+        SOFT_DELETE_MANY
 
     task.:id
         TASK_UPDATE
@@ -22,10 +24,12 @@ Websocket notifications you can subscribe to:
         TASK_SUBMIT_REVIEW
         TASK_SUBMIT_REVIEW_FAILED
         SOFT_DELETE
+        SOFT_DELETE_MANY
 
     scratchorg.:id
         SCRATCH_ORG_PROVISION
         SCRATCH_ORG_PROVISION_FAILED
+        SCRATCH_ORG_FLOW_PROGRESS
         SCRATCH_ORG_UPDATE
         SCRATCH_ORG_ERROR
         SCRATCH_ORG_FETCH_CHANGES_FAILED
@@ -42,14 +46,62 @@ Websocket notifications you can subscribe to:
     scratchorg.list
         SCRATCH_ORG_RECREATE
 """
+import contextlib
+import contextvars
 from copy import deepcopy
+from functools import partial
 
 from channels.layers import get_channel_layer
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 
 from ..consumer_utils import get_set_message_semaphore
 from .constants import CHANNELS_GROUP_NAME, LIST
 
+_buffer = contextvars.ContextVar("notification_buffer", default=None)
+
+
+@contextlib.contextmanager
+def buffered_notifications():
+    """
+    Collect the notifications buffered inside this block, and send them
+    once the current transaction commits. A notification with the same
+    key as an earlier one replaces it, keeping its place in line, so
+    each is sent once. Nested blocks share the outermost buffer.
+
+    Can also be used as a decorator.
+    """
+    if _buffer.get() is not None:
+        yield
+        return
+    buffer = {}
+    token = _buffer.set(buffer)
+    try:
+        yield
+    finally:
+        _buffer.reset(token)
+        if buffer:
+            transaction.on_commit(partial(_send_buffered, list(buffer.values())))
+
+
+def _send_buffered(sends):
+    for send in sends:
+        send()
+
+
+def buffer_notification(key, send):
+    """
+    Buffer a notification, a callable that sends it, under ``key``, or
+    after everything buffered so far if ``key`` is None, as for errors,
+    which are never replaced. Returns False if there's no buffer, in
+    which case the caller should send it right away.
+    """
+    buffer = _buffer.get()
+    if buffer is None:
+        return False
+    buffer[object() if key is None else key] = send
+    return True
+
 
 async def push_message_about_instance(instance, message, for_list=False):
     model_name = instance._meta.model_name
@@ -0,0 +1,82 @@
+"""
+Job routing and deduplicated enqueueing.
+
+Every job declares a class, one of settings.RQ_JOB_CLASSES (interactive,
+polling, provisioning or bulk), and is enqueued on that class's queue,
+with that class's timeout. Classes whose queues are sharded take a
+``shard_by`` format string, filled in from the job's arguments, like
+``"{project.id}"``; jobs with the same value always go to the same
+shard, so a project queueing lots of work only holds up its own shard.
+
+A job may also declare a deduplication key, another format string like
+``"get_unsaved_changes:{scratch_org.id}"``. Its ``.delay()`` takes that
+key with an atomic ``cache.add`` before enqueueing, and drops the call if
+the key is already taken, i.e. if the same work is already queued. The
+worker releases the key as the job starts (see metecho.rq_worker), as a
+running job may already have missed the changes that call was made for,
+and it expires after JOB_DEDUP_TIMEOUT seconds in case a worker dies
+before then.
+"""
+
+import inspect
+import logging
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django_rq import get_queue
+
+logger = logging.getLogger(__name__)
+
+DEDUP_KEY = "job-dedup:{key}"
+DEDUP_META_KEY = "dedup_key"
+
+
+def get_queue_name(job_class, shard_key=""):
+    names = settings.RQ_JOB_CLASS_QUEUES[job_class]
+    return names[zlib.crc32(str(shard_key).encode()) % len(names)]
+
+
+def routed_job(func, *, job_class, shard_by=None, dedup_key=None):
+    """
+    Like ``django_rq.job(func)``, but ``.delay()`` enqueues on the queue
+    for ``job_class``, and if there's a ``dedup_key``, drops calls while
+    an identical job is queued, returning None instead of the rq job.
+    """
+    if job_class not in settings.RQ_JOB_CLASSES:
+        raise ValueError(f"Unknown job class {job_class!r}")
+    signature = inspect.signature(func)
+
+    def delay(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs)
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+        queue = get_queue_name(
+            job_class, shard_by.format(**arguments) if shard_by else ""
+        )
+        if dedup_key is None:
+            return get_queue(queue).enqueue_call(func, args=args, kwargs=kwargs)
+
+        key = DEDUP_KEY.format(key=dedup_key.format(**arguments))
+        if not cache.add(key, True, timeout=settings.JOB_DEDUP_TIMEOUT):
+            logger.info(f"Not enqueueing {func.__name__}, {key} is pending")
+            return None
+        try:
+            return get_queue(queue).enqueue_call(
+                func, args=args, kwargs=kwargs, meta={DEDUP_META_KEY: key}
+            )
+        except Exception:
+            cache.delete(key)
+            raise
+
+    func.delay = delay
+    return func
+
+
+def release_dedup_key(job):
+    """
+    Let the work of a starting job be enqueued again.
+    """
+    key = job.meta.get(DEDUP_META_KEY)
+    if key:
+        cache.delete(key)
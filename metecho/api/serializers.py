@@ -1,6 +1,7 @@
 from typing import Optional
 
 from allauth.socialaccount.models import SocialAccount
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.template.loader import render_to_string
 from django.utils.translation import gettext_lazy as _
@@ -12,6 +13,8 @@ from .fields import MarkdownField
 from .models import (
     SCRATCH_ORG_TYPES,
     TASK_REVIEW_STATUS,
+    Commit,
+    CommitAuthor,
     Epic,
     Project,
     ScratchOrg,
@@ -250,6 +253,21 @@ class EpicSerializer(serializers.ModelSerializer):
         return None
 
 
+class TaskCommitAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CommitAuthor
+        fields = ("name", "email", "username", "avatar_url")
+
+
+class TaskCommitSerializer(serializers.ModelSerializer):
+    id = serializers.CharField(source="sha", read_only=True)
+    author = TaskCommitAuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Commit
+        fields = ("id", "timestamp", "author", "message", "url")
+
+
 class TaskSerializer(serializers.ModelSerializer):
     id = serializers.CharField(read_only=True)
     description_rendered = MarkdownField(source="description", read_only=True)
@@ -259,6 +277,8 @@ class TaskSerializer(serializers.ModelSerializer):
     branch_url = serializers.SerializerMethodField()
     branch_diff_url = serializers.SerializerMethodField()
     pr_url = serializers.SerializerMethodField()
+    commits = serializers.SerializerMethodField()
+    commits_count = serializers.SerializerMethodField()
 
     should_alert_dev = serializers.BooleanField(write_only=True, required=False)
     should_alert_qa = serializers.BooleanField(write_only=True, required=False)
@@ -278,6 +298,7 @@ class TaskSerializer(serializers.ModelSerializer):
             "branch_name",
             "branch_url",
             "commits",
+            "commits_count",
             "origin_sha",
             "branch_diff_url",
             "pr_url",
@@ -300,7 +321,6 @@ class TaskSerializer(serializers.ModelSerializer):
             "has_unmerged_commits": {"read_only": True},
             "currently_creating_pr": {"read_only": True},
             "branch_url": {"read_only": True},
-            "commits": {"read_only": True},
             "origin_sha": {"read_only": True},
             "branch_diff_url": {"read_only": True},
             "pr_url": {"read_only": True},
@@ -322,6 +342,21 @@ class TaskSerializer(serializers.ModelSerializer):
             ),
         )
 
+    def get_commits(self, obj):
+        # Only the most recent commits; the rest are paginated at
+        # /tasks/{id}/commits/. Task.objects.for_serialization() prefetches
+        # them:
+        commits = getattr(obj, "recent_commits", None)
+        if commits is None:
+            commits = obj.commits.select_related("author")[
+                : settings.TASK_RECENT_COMMITS
+            ]
+        return TaskCommitSerializer(commits, many=True).data
+
+    def get_commits_count(self, obj) -> int:
+        count = getattr(obj, "commits_count", None)
+        return obj.commits.count() if count is None else count
+
     def get_branch_url(self, obj) -> Optional[str]:
         project = obj.epic.project
         repo_owner = project.repo_owner
@@ -393,7 +428,7 @@ class TaskSerializer(serializers.ModelSerializer):
                     type_, org, validated_data[f"assigned_{type_}"]
                 )
                 valid_commit = org.latest_commit == (
-                    instance.commits[0] if instance.commits else instance.origin_sha
+                    instance.latest_commit_sha or instance.origin_sha
                 )
                 org_still_exists = is_org_good(org)
                 if (
@@ -545,17 +580,20 @@ class ScratchOrgSerializer(serializers.ModelSerializer):
             "has_been_visited": {"read_only": True},
         }
 
-    def _X_changes(self, obj, kind):
+    def _is_owner(self, obj):
         user = getattr(self.context.get("request"), "user", None)
-        if obj.owner == user:
+        return user is not None and obj.owner_id == user.id
+
+    def _X_changes(self, obj, kind):
+        if self._is_owner(obj):
             return getattr(obj, f"{kind}_changes")
         return {}
 
     def _has_X_changes(self, obj, kind) -> bool:
-        return bool(getattr(obj, f"{kind}_changes", {}))
+        return self._total_X_changes(obj, kind) > 0
 
     def _total_X_changes(self, obj, kind) -> int:
-        return sum(len(change) for change in getattr(obj, f"{kind}_changes").values())
+        return getattr(obj, f"total_{kind}_changes")
 
     def get_unsaved_changes(self, obj) -> dict:
         return self._X_changes(obj, "unsaved")
@@ -576,8 +614,7 @@ class ScratchOrgSerializer(serializers.ModelSerializer):
         return self._total_X_changes(obj, "ignored")
 
     def get_valid_target_directories(self, obj) -> dict:
-        user = getattr(self.context.get("request"), "user", None)
-        if obj.owner == user:
+        if self._is_owner(obj):
             return obj.valid_target_directories
         return {}
 
@@ -1,12 +1,17 @@
 import contextlib
+import importlib
 import json
 import logging
 import os
 import shutil
 import subprocess
+import time
+from collections import deque
 from datetime import datetime
 
-from cumulusci.core.config import OrgConfig, TaskConfig
+from cumulusci.core.config import OrgConfig, ServiceConfig, TaskConfig
+from cumulusci.core.flowrunner import FlowCallback, FlowCoordinator
+from cumulusci.core.keychain import BaseProjectKeychain
 from cumulusci.core.runtime import BaseCumulusCI
 from cumulusci.oauth.salesforce import SalesforceOAuth2, jwt_session
 from cumulusci.tasks.salesforce.org_settings import DeployOrgSettings
@@ -17,6 +22,8 @@ from requests.exceptions import HTTPError
 from rq import get_current_job
 from simple_salesforce import Salesforce as SimpleSalesforce
 
+from .queueing import get_queue_name
+
 logger = logging.getLogger(__name__)
 
 # Salesforce connected app
@@ -29,6 +36,11 @@ SFDX_SIGNUP_INSTANCE = settings.SFDX_SIGNUP_INSTANCE
 
 DURATION_DAYS = 30
 
+# cci reports a failure on a line like this, after the flow's output:
+CCI_ERROR_PREFIX = "Error: "
+# How many of the last lines of a failed flow run's output to log:
+FLOW_ERROR_CONTEXT_LINES = 50
+
 # Deploy org settings metadata -- this should get moved into CumulusCI
 SETTINGS_XML_t = """<?xml version="1.0" encoding="UTF-8"?>
 <{settingsName} xmlns="http://soap.sforce.com/2006/04/metadata">
@@ -312,18 +324,46 @@ def create_org(
     return (scratch_org_config, cci, org_config)
 
 
-def run_flow(*, cci, org_config, flow_name, project_path, user):
-    """Run a flow on a scratch org"""
-    # Run flow in a subprocess so we can control the environment
-    gh_token = user.gh_token
-    command = shutil.which("cci")
-    args = [command, "flow", "run", flow_name, "--org", "dev"]
+def run_flow(*, cci, org_config, flow_name, project_path, user, output=None):
+    """Run a flow on a scratch org, passing each line of its output, as
+    bytes, to ``output`` as soon as it's printed"""
+    if settings.RUN_FLOWS_IN_PROCESS:
+        run_flow_in_process(
+            cci=cci,
+            org_config=org_config,
+            flow_name=flow_name,
+            project_path=project_path,
+            user=user,
+            output=output,
+        )
+        return
+    # The cci subprocess runs with only this environment:
     env = {
         "CUMULUSCI_KEYCHAIN_CLASS": "cumulusci.core.keychain.EnvironmentProjectKeychain",
         # We need to set the "scratch" flag to true because some flows check for it,
         # but we need the org config to NOT be a ScratchOrgConfig which tries to use sfdx
         "CUMULUSCI_SCRATCH_ORG_CLASS": "cumulusci.core.config.OrgConfig",
         "CUMULUSCI_DISABLE_REFRESH": "1",
+        "GITHUB_TOKEN": user.gh_token,
+        # needed by sfdx
+        "HOME": project_path,
+        "PATH": os.environ["PATH"],
+    }
+    run_flow_in_subprocess(
+        org_config=org_config,
+        flow_name=flow_name,
+        project_path=project_path,
+        env=env,
+        output=output,
+    )
+
+
+def run_flow_in_subprocess(*, org_config, flow_name, project_path, env, output):
+    """Run a flow with the cci command"""
+    command = shutil.which("cci")
+    args = [command, "flow", "run", flow_name, "--org", "dev"]
+    env = {
+        **env,
         "CUMULUSCI_ORG_dev": json.dumps(
             {
                 "org_id": org_config.org_id,
@@ -332,29 +372,162 @@ def run_flow(*, cci, org_config, flow_name, project_path, user):
                 "scratch": True,
             }
         ),
-        "GITHUB_TOKEN": gh_token,
-        # needed by sfdx
-        "HOME": project_path,
-        "PATH": os.environ["PATH"],
+        # Otherwise cci's output only comes through a few KB at a time:
+        "PYTHONUNBUFFERED": "1",
     }
     p = subprocess.Popen(
         args,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        stdin=subprocess.PIPE,
+        stdin=subprocess.DEVNULL,
         close_fds=True,
         env=env,
         cwd=project_path,
     )
-    orig_stdout, _ = p.communicate()
+    error = None
+    tail = deque(maxlen=FLOW_ERROR_CONTEXT_LINES)
+    with p:
+        for line in p.stdout:
+            if output:
+                output(line)
+            text = line.decode("utf-8", "replace").rstrip()
+            if text:
+                tail.append(text)
+            if text.startswith(CCI_ERROR_PREFIX):
+                error = text[len(CCI_ERROR_PREFIX) :]
     if p.returncode:
-        p = subprocess.run(
-            [command, "error", "info"], capture_output=True, env={"HOME": project_path}
+        logger.warning("\n".join(tail))
+        raise Exception(error or (tail[-1] if tail else ""))
+
+
+class StepTimings(FlowCallback):
+    """Records how long each step of a flow takes"""
+
+    def __init__(self):
+        self.timings = []
+        self.started_at = None
+
+    def pre_task(self, step):
+        self.started_at = time.monotonic()
+
+    def post_task(self, step, result):
+        self.timings.append(
+            {
+                "step": str(step.step_num),
+                "task": step.task_name,
+                "seconds": round(time.monotonic() - self.started_at, 3),
+            }
         )
-        traceback = p.stdout.decode("utf-8")
-        logger.warning(traceback)
-        raise Exception(
-            _last_line(traceback) or _last_line(orig_stdout.decode("utf-8"))
+
+
+class OutputHandler(logging.Handler):
+    """Passes CumulusCI's log lines on to a flow run's ``output``"""
+
+    def __init__(self, output):
+        super().__init__(logging.INFO)
+        self.output = output
+
+    def emit(self, record):
+        self.output(f"{self.format(record)}\n".encode("utf-8"))
+
+
+# The only environment variables an in-process flow run changes. The
+# user's GitHub token goes to CumulusCI through the keychain, but
+# CumulusCI prefers these over the keychain, and Metecho's own GitHub
+# app credentials are among them, so they're hidden for the run. Every
+# other variable the app needs, like DATABASE_URL or REDIS_URL, is left
+# alone.
+FLOW_HIDDEN_ENV = ("GITHUB_APP_ID", "GITHUB_APP_KEY", "GITHUB_TOKEN")
+
+
+def set_environ(values):
+    """Set each of ``values`` in the environment, unsetting those that
+    are ``None``"""
+    for name, value in values.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@contextlib.contextmanager
+def flow_process_state(*, cwd, output):
+    """
+    Give this process ``cwd`` as its working directory and home (which
+    sfdx needs), as a cci subprocess would have, hide ``FLOW_HIDDEN_ENV``,
+    stop CumulusCI refreshing the org's OAuth token, and send CumulusCI's
+    logging to ``output``, restoring everything on the way out.
+
+    This changes process-wide state, so it's only safe in a process
+    that does nothing else at the same time, like an rq work horse.
+    """
+    environ = {name: None for name in FLOW_HIDDEN_ENV}
+    environ["HOME"] = cwd
+    old_environ = {name: os.environ.get(name) for name in environ}
+    old_cwd = os.getcwd()
+    # CumulusCI reads CUMULUSCI_DISABLE_REFRESH into this once, on import:
+    org_config_module = importlib.import_module("cumulusci.core.config.OrgConfig")
+    old_skip_refresh = org_config_module.SKIP_REFRESH
+    cci_logger = logging.getLogger("cumulusci")
+    old_level = cci_logger.level
+    handler = OutputHandler(output) if output else None
+    set_environ(environ)
+    os.chdir(cwd)
+    org_config_module.SKIP_REFRESH = "1"
+    if handler:
+        cci_logger.setLevel(logging.INFO)
+        cci_logger.addHandler(handler)
+    try:
+        yield
+    finally:
+        if handler:
+            cci_logger.removeHandler(handler)
+            cci_logger.setLevel(old_level)
+        org_config_module.SKIP_REFRESH = old_skip_refresh
+        os.chdir(old_cwd)
+        set_environ(old_environ)
+
+
+def get_flow_keychain(*, project_config, user):
+    """A keychain holding only the user's GitHub credentials"""
+    keychain = BaseProjectKeychain(project_config, None)
+    # Set directly, as set_service would check the token with GitHub:
+    keychain._set_service(
+        "github",
+        ServiceConfig(
+            {"username": user.username, "email": user.email, "token": user.gh_token}
+        ),
+    )
+    return keychain
+
+
+def run_flow_in_process(*, cci, org_config, flow_name, project_path, user, output):
+    """Run a flow with CumulusCI's Python API, against the org config we
+    already have, rather than passing it to a cci subprocess"""
+    callbacks = StepTimings()
+    try:
+        with flow_process_state(cwd=project_path, output=output):
+            keychain = get_flow_keychain(project_config=cci.project_config, user=user)
+            cci.project_config.keychain = keychain
+            org_config.keychain = keychain
+            coordinator = FlowCoordinator(
+                cci.project_config,
+                cci.project_config.get_flow(flow_name),
+                name=flow_name,
+                callbacks=callbacks,
+            )
+            coordinator.run(org_config)
+    except Exception as e:
+        if output:
+            output(f"{CCI_ERROR_PREFIX}{e}\n".encode("utf-8"))
+        raise
+    finally:
+        logger.info(
+            f"Ran flow {flow_name} in process",
+            extra={
+                "tag": "sf_run_flow.step_timings",
+                "context": {"flow": flow_name, "steps": callbacks.timings},
+            },
         )
 
 
@@ -379,10 +552,6 @@ def delete_org(scratch_org):
         devhub_api.ActiveScratchOrg.delete(active_scratch_org_id)
 
     if scratch_org.expiry_job_id:
-        scheduler = get_scheduler("default")
+        # Scheduled jobs are shared by all queues' schedulers:
+        scheduler = get_scheduler(get_queue_name("polling"))
         scheduler.cancel(scratch_org.expiry_job_id)
-
-
-def _last_line(s: str) -> str:
-    lines = [line for line in s.splitlines() if line.strip()]
-    return lines[-1] if lines else ""
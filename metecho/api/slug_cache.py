@@ -0,0 +1,45 @@
+"""
+Cache of which objects a slug currently resolves to, so that the slug
+filters don't have to join the slug tables on every page load.
+
+An entry maps a slug to the ids of the objects it is the active slug of
+(an empty list for slugs that aren't active anywhere, such as old ones).
+ensure_slug_handler drops the entries for all of an object's slugs
+whenever its slugs change.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+SLUG_CACHE_KEY = "slug-ids:{model}:{slug}"
+
+
+def get_slug_cache_key(model, slug):
+    return SLUG_CACHE_KEY.format(model=model._meta.label_lower, slug=slug)
+
+
+def get_ids_for_slug(model, name, slug):
+    """
+    Return the ids of the ``model`` objects whose active slug is
+    ``slug``, where ``name`` is the name of their slug relation.
+    """
+    key = get_slug_cache_key(model, slug)
+    ids = cache.get(key)
+    if ids is None:
+        ids = [
+            str(pk)
+            for pk in model._base_manager.filter(
+                **{f"{name}__slug": slug, f"{name}__is_active": True}
+            ).values_list("pk", flat=True)
+        ]
+        cache.set(key, ids, settings.SLUG_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_slugs(instance):
+    cache.delete_many(
+        [
+            get_slug_cache_key(type(instance), slug)
+            for slug in instance.slugs.values_list("slug", flat=True)
+        ]
+    )
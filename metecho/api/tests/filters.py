@@ -1,14 +1,85 @@
+from unittest.mock import patch
+
 import pytest
+from django.core.cache.backends.locmem import LocMemCache
 
 from ..filters import slug_is_active
 from ..models import Epic
 
 
 @pytest.mark.django_db
-def test_slug_is_active(epic_factory):
-    epic1 = epic_factory(name="Apple")
-    epic2 = epic_factory(name="Banana")
+def test_slug_is_active(epic_factory, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        epic1 = epic_factory(name="Apple")
+        epic2 = epic_factory(name="Banana")
     epic1.slugs.update(is_active=False)
     epics = Epic.objects.all()
     assert list(slug_is_active(epics, "slugs", "apple")) == []
     assert list(slug_is_active(epics, "slugs", "banana")) == [epic2]
+
+
+@pytest.mark.django_db
+class TestSlugCache:
+    @pytest.fixture(autouse=True)
+    def cache(self, settings):
+        settings.SLUG_CACHE_TIMEOUT = 600
+        cache = LocMemCache("slugs", {})
+        with patch("metecho.api.slug_cache.cache", cache):
+            yield
+        cache.clear()
+
+    def test_cached(
+        self,
+        epic_factory,
+        django_assert_num_queries,
+        django_capture_on_commit_callbacks,
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            epic = epic_factory(name="Apple")
+        epics = Epic.objects.all()
+        assert list(slug_is_active(epics, "slugs", "apple")) == [epic]
+
+        with django_assert_num_queries(1):
+            assert list(slug_is_active(epics, "slugs", "apple")) == [epic]
+
+    def test_invalidated_on_create(
+        self, epic_factory, django_capture_on_commit_callbacks
+    ):
+        epics = Epic.objects.all()
+        assert list(slug_is_active(epics, "slugs", "apple")) == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            epic = epic_factory(name="Apple")
+        assert list(slug_is_active(epics, "slugs", "apple")) == [epic]
+
+    def test_invalidated_on_rename(
+        self, epic_factory, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            epic = epic_factory(name="Apple")
+        epics = Epic.objects.all()
+        assert list(slug_is_active(epics, "slugs", "apple")) == [epic]
+        assert list(slug_is_active(epics, "slugs", "banana")) == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            epic.name = "Banana"
+            epic.save()
+            epic.slugs.filter(slug="apple").update(is_active=False)
+
+        assert list(slug_is_active(epics, "slugs", "banana")) == [epic]
+        assert list(slug_is_active(epics, "slugs", "apple")) == []
+
+    def test_invalidated_after_commit(
+        self, epic_factory, django_capture_on_commit_callbacks
+    ):
+        epics = Epic.objects.all()
+        assert list(slug_is_active(epics, "slugs", "apple")) == []
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            epic = epic_factory(name="Apple")
+        # Still cached until the transaction commits:
+        assert list(slug_is_active(epics, "slugs", "apple")) == []
+
+        for callback in callbacks:
+            callback()
+        assert list(slug_is_active(epics, "slugs", "apple")) == [epic]
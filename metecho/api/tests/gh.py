@@ -1,30 +1,65 @@
+import io
+import os
+import tarfile
 from contextlib import ExitStack
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
+from django.utils import timezone
 from github3.exceptions import NotFoundError, UnprocessableEntity
+from sfdo_template_helpers.crypto import fernet_encrypt
 
 from ..gh import (
+    CONFIG_PATHS,
     NoGitHubTokenError,
-    UnsafeZipfileError,
-    extract_zip_file,
+    RefreshingAppInstallationTokenAuth,
+    UnsafeArchiveError,
+    checkout_repo,
+    extract_archive,
+    extract_repo_paths,
     get_all_org_repos,
+    get_archive_stream,
+    get_branch_names_with_prefix,
+    get_config_blob_sha,
+    get_project_config_summary,
     get_repo_info,
     get_source_format,
-    get_zip_file,
     gh_as_app,
+    git_blob_sha,
     is_safe_path,
     local_github_checkout,
-    log_unsafe_zipfile_error,
+    log_unsafe_archive_error,
     normalize_commit,
+    path_matches,
+    resolve_commit_sha,
     try_to_make_branch,
     validate_cumulusci_yml_unchanged,
-    zip_file_is_safe,
 )
 
 PATCH_ROOT = "metecho.api.gh"
 
 
+def make_tarball(files, root="owner-repo_name-abc123", links=None):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        info = tarfile.TarInfo(root)
+        info.type = tarfile.DIRTYPE
+        tar.addfile(info)
+        for name, target in (links or {}).items():
+            info = tarfile.TarInfo(f"{root}/{name}")
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(f"{root}/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
 @pytest.mark.django_db
 class TestGetAllOrgRepos:
     def test_good_social_auth(self, user_factory):
@@ -35,17 +70,96 @@ class TestGetAllOrgRepos:
             gh = MagicMock()
             gh.repositories.return_value = [repo]
             login.return_value = gh
-            assert len(get_all_org_repos(user)) == 1
+            assert len(list(get_all_org_repos(user))) == 1
 
     def test_bad_social_auth(self, user_factory):
         user = user_factory(socialaccount_set=[])
         with pytest.raises(NoGitHubTokenError):
-            get_all_org_repos(user)
+            list(get_all_org_repos(user))
+
+
+class TestGhAsApp:
+    def test_uncached(self):
+        with ExitStack() as stack:
+            GitHub = stack.enter_context(patch(f"{PATCH_ROOT}.GitHub"))
+            stack.enter_context(patch(f"{PATCH_ROOT}.apps"))
+            cache = stack.enter_context(patch(f"{PATCH_ROOT}.cache"))
+            cache.get.return_value = None
+            GitHub.return_value._json.return_value = {
+                "token": "token",
+                "expires_at": "2099-01-01T00:00:00Z",
+            }
+
+            assert gh_as_app("TestOrg", "TestRepo") is not None
+            assert GitHub.return_value.session.auth.token == "token"
+            assert cache.set.call_count == 2
+
+    def test_cached(self):
+        with ExitStack() as stack:
+            GitHub = stack.enter_context(patch(f"{PATCH_ROOT}.GitHub"))
+            cache = stack.enter_context(patch(f"{PATCH_ROOT}.cache"))
+            cache.get.side_effect = [
+                123,
+                {
+                    "token": fernet_encrypt("token"),
+                    "expires_at": "2099-01-01T00:00:00Z",
+                },
+            ]
+
+            gh_as_app("TestOrg", "TestRepo")
+
+            gh = GitHub.return_value
+            assert not gh.login_as_app.called
+            assert not gh.session.post.called
+            assert gh.session.auth.token == "token"
+
+    def test_reinstalled(self):
+        with ExitStack() as stack:
+            GitHub = stack.enter_context(patch(f"{PATCH_ROOT}.GitHub"))
+            cache = stack.enter_context(patch(f"{PATCH_ROOT}.cache"))
+            get_app_installation_token = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_app_installation_token")
+            )
+            get_app_installation_token.side_effect = [
+                NotFoundError(MagicMock()),
+                {"token": "token", "expires_at": "2099-01-01T00:00:00Z"},
+            ]
+            cache.get.side_effect = [123, None]
+            GitHub.return_value.app_installation_for_repository.return_value.id = 456
+
+            gh_as_app("TestOrg", "TestRepo")
 
+            cache.delete.assert_called_with("gh-app-installation:TestOrg/TestRepo")
+            get_app_installation_token.assert_called_with(456)
 
-def test_gh_as_app():
-    with patch("metecho.api.gh.GitHub"):
-        assert gh_as_app("TestOrg", "TestRepo") is not None
+
+class TestRefreshingAppInstallationTokenAuth:
+    def test_fresh(self):
+        auth = RefreshingAppInstallationTokenAuth(
+            123, {"token": "token", "expires_at": "2099-01-01T00:00:00Z"}
+        )
+        request = MagicMock(headers={})
+        with patch(f"{PATCH_ROOT}.get_app_installation_token") as get_token:
+            auth(request)
+
+        assert not get_token.called
+        assert request.headers["Authorization"] == "token token"
+
+    def test_expiring(self):
+        expires_at = timezone.now() + timedelta(minutes=1)
+        auth = RefreshingAppInstallationTokenAuth(
+            123, {"token": "old-token", "expires_at": expires_at.isoformat()}
+        )
+        request = MagicMock(headers={})
+        with patch(f"{PATCH_ROOT}.get_app_installation_token") as get_token:
+            get_token.return_value = {
+                "token": "new-token",
+                "expires_at": "2099-01-01T00:00:00Z",
+            }
+            auth(request)
+
+        get_token.assert_called_once_with(123)
+        assert request.headers["Authorization"] == "token new-token"
 
 
 def test_is_safe_path():
@@ -54,17 +168,9 @@ def test_is_safe_path():
     assert is_safe_path("bar")
 
 
-def test_zip_file_is_safe():
-    info = MagicMock(filename="foo")
-    zip_file = MagicMock()
-    zip_file.infolist.return_value = [info]
-
-    assert zip_file_is_safe(zip_file)
-
-
-def test_log_unsafe_zipfile_error():
+def test_log_unsafe_archive_error():
     with patch(f"{PATCH_ROOT}.logger") as logger:
-        log_unsafe_zipfile_error("repo_url", "commit_ish")
+        log_unsafe_archive_error("repo_url", "commit_ish")
         assert logger.error.called
 
 
@@ -93,27 +199,186 @@ class TestGetRepoInfo:
             gh.repository.assert_called_with("owner", "name")
 
 
-def test_get_zip_file():
-    repo = MagicMock()
-    with patch(f"{PATCH_ROOT}.zipfile") as zipfile:
-        get_zip_file(repo, "commit_ish")
-        assert repo.archive.called
-        assert zipfile.ZipFile.called
+class TestGetArchiveStream:
+    def test_good(self):
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=200)
+        resp = get_archive_stream(repo, "commit_ish")
+        assert resp.raw.decode_content
+        assert repo._get.call_args.kwargs["stream"]
 
+    def test_bad(self):
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=404)
+        with pytest.raises(NotFoundError):
+            get_archive_stream(repo, "commit_ish")
 
-def test_extract_zip_file():
-    zip_file = MagicMock()
-    with ExitStack() as stack:
-        shutil = stack.enter_context(patch(f"{PATCH_ROOT}.shutil"))
-        os = stack.enter_context(patch(f"{PATCH_ROOT}.os"))
-        glob = stack.enter_context(patch(f"{PATCH_ROOT}.glob"))
 
-        glob.return_value = ["owner-repo_name-"]
-        extract_zip_file(zip_file, "owner", "repo_name")
-        assert zip_file.extractall.called
-        assert shutil.move.called
-        assert shutil.rmtree.called
-        assert os.remove.called
+class TestResolveCommitSha:
+    def test_good(self):
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=200, text="abc123\n")
+        assert resolve_commit_sha(repo, "main") == "abc123"
+
+    def test_bad(self):
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=404)
+        with pytest.raises(NotFoundError):
+            resolve_commit_sha(repo, "main")
+
+
+class TestExtractArchive:
+    def test_safe(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        tarball = make_tarball(
+            {"cumulusci.yml": "project: {}", "src/package.xml": "<Package/>"}
+        )
+
+        extract_archive(tarball, "repo_url", "commit_ish")
+
+        assert (tmp_path / "cumulusci.yml").read_text() == "project: {}"
+        assert (tmp_path / "src" / "package.xml").read_text() == "<Package/>"
+        assert not (tmp_path / "owner-repo_name-abc123").exists()
+
+    def test_links(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        tarball = make_tarball(
+            {"src/classes/Foo.cls": "class Foo {}"},
+            links={
+                "unpackaged/Foo.cls": "../src/classes/Foo.cls",
+                "unpackaged/link.cls": "Foo.cls",
+                "unpackaged/classes": "../src/classes",
+                "escaping": "../../etc/passwd",
+                "dangling": "missing",
+            },
+        )
+
+        with patch("metecho.api.gh.logger.warning") as warning:
+            extract_archive(tarball, "repo_url", "commit_ish")
+
+        unpackaged = tmp_path / "unpackaged"
+        assert (unpackaged / "Foo.cls").read_text() == "class Foo {}"
+        assert not (unpackaged / "Foo.cls").is_symlink()
+        assert (unpackaged / "link.cls").read_text() == "class Foo {}"
+        assert (unpackaged / "classes" / "Foo.cls").read_text() == "class Foo {}"
+        assert not (tmp_path / "escaping").exists()
+        assert not (tmp_path / "dangling").exists()
+        assert warning.call_count == 2
+
+    def test_unsafe(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        tarball = make_tarball({"../escaped": "nope"})
+
+        with pytest.raises(UnsafeArchiveError):
+            extract_archive(tarball, "repo_url", "commit_ish")
+        assert not (tmp_path.parent / "escaped").exists()
+
+
+def test_path_matches():
+    assert path_matches("cumulusci.yml", CONFIG_PATHS)
+    assert path_matches("orgs/dev.json", CONFIG_PATHS)
+    assert path_matches("unpackaged/pre/first", CONFIG_PATHS)
+    assert not path_matches("unpackaged/pre/first/package.xml", CONFIG_PATHS)
+    assert not path_matches("orgs/nested/dev.json", CONFIG_PATHS)
+    assert not path_matches("src/package.xml", CONFIG_PATHS)
+
+
+class TestExtractRepoPaths:
+    def test_sparse(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=200, text="abc123")
+        repo.tree.return_value.as_dict.return_value = {"truncated": False}
+        repo.tree.return_value.tree = [
+            MagicMock(path="cumulusci.yml", type="blob", sha="1"),
+            MagicMock(path="orgs", type="tree", sha="2"),
+            MagicMock(path="orgs/dev.json", type="blob", sha="3"),
+            MagicMock(path="src", type="tree", sha="4"),
+            MagicMock(path="src/package.xml", type="blob", sha="5"),
+            MagicMock(path="unpackaged/pre/first", type="tree", sha="6"),
+        ]
+        repo.blob.side_effect = [
+            MagicMock(encoding="base64", content="cHJvamVjdDoge30="),
+            MagicMock(encoding="utf-8", content="{}"),
+        ]
+
+        extract_repo_paths(repo, "main", CONFIG_PATHS)
+
+        repo.tree.assert_called_once_with("abc123", recursive=True)
+        assert (tmp_path / "cumulusci.yml").read_text() == "project: {}"
+        assert (tmp_path / "orgs" / "dev.json").read_text() == "{}"
+        assert (tmp_path / "unpackaged" / "pre" / "first").is_dir()
+        assert not (tmp_path / "src").exists()
+
+    def test_graphql(self, tmp_path, monkeypatch, settings):
+        settings.GITHUB_USE_GRAPHQL = True
+        monkeypatch.chdir(tmp_path)
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=200, text="abc123")
+        repo.tree.return_value.as_dict.return_value = {"truncated": False}
+        repo.tree.return_value.tree = [
+            MagicMock(path="cumulusci.yml", type="blob", sha="1"),
+            MagicMock(path="orgs/dev.json", type="blob", sha="3"),
+        ]
+        repo.blob.return_value = MagicMock(encoding="utf-8", content="{}")
+        with patch(f"{PATCH_ROOT}.get_blob_texts") as get_blob_texts:
+            get_blob_texts.return_value = {
+                "cumulusci.yml": "project: {}",
+                "orgs/dev.json": None,
+            }
+            extract_repo_paths(repo, "main", CONFIG_PATHS)
+
+            get_blob_texts.assert_called_once_with(
+                repo, "abc123", ["cumulusci.yml", "orgs/dev.json"]
+            )
+        assert (tmp_path / "cumulusci.yml").read_text() == "project: {}"
+        assert (tmp_path / "orgs" / "dev.json").read_text() == "{}"
+        repo.blob.assert_called_once_with("3")
+
+    def test_too_many_blobs(self, settings):
+        settings.GITHUB_USE_GRAPHQL = False
+        settings.GITHUB_SPARSE_MAX_BLOBS = 1
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=200, text="abc123")
+        repo.tree.return_value.as_dict.return_value = {"truncated": False}
+        repo.tree.return_value.tree = [
+            MagicMock(path="cumulusci.yml", type="blob", sha="1"),
+            MagicMock(path="orgs/dev.json", type="blob", sha="3"),
+        ]
+        with patch(f"{PATCH_ROOT}.checkout_repo") as checkout_repo:
+            extract_repo_paths(repo, "main", CONFIG_PATHS)
+
+            checkout_repo.assert_called_once_with(repo, "abc123", read_only=True)
+            assert not repo.blob.called
+
+    def test_truncated(self):
+        repo = MagicMock()
+        repo._get.return_value = MagicMock(status_code=200, text="abc123")
+        repo.tree.return_value.as_dict.return_value = {"truncated": True}
+        with patch(f"{PATCH_ROOT}.checkout_repo") as checkout_repo:
+            extract_repo_paths(repo, "main", CONFIG_PATHS)
+
+            checkout_repo.assert_called_once_with(repo, "abc123", read_only=True)
+            assert not repo.blob.called
+
+
+class TestCheckoutRepo:
+    def test_read_only(self, settings, tmp_path, monkeypatch):
+        settings.GITHUB_SNAPSHOT_CACHE_DIR = "/tmp/snapshots"
+        monkeypatch.chdir(tmp_path)
+        repo = MagicMock(id=123)
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch(f"{PATCH_ROOT}.resolve_commit_sha", return_value="abc123")
+            )
+            gh_snapshots = stack.enter_context(patch(f"{PATCH_ROOT}.gh_snapshots"))
+            checkout_repo(repo, "main", read_only=True)
+
+            gh_snapshots.materialize.assert_called_once_with(
+                gh_snapshots.get_or_create_snapshot.return_value,
+                str(tmp_path),
+                read_only=True,
+            )
 
 
 class TestLocalGitHubCheckout:
@@ -121,46 +386,129 @@ class TestLocalGitHubCheckout:
         user = MagicMock()
         repo = 123
         with ExitStack() as stack:
-            stack.enter_context(patch(f"{PATCH_ROOT}.zipfile"))
-            os = stack.enter_context(patch(f"{PATCH_ROOT}.os"))
             gh_given_user = stack.enter_context(patch(f"{PATCH_ROOT}.gh_given_user"))
-            shutil = stack.enter_context(patch(f"{PATCH_ROOT}.shutil"))
-            glob = stack.enter_context(patch(f"{PATCH_ROOT}.glob"))
             repository = MagicMock(default_branch="main")
-            repository.file_contents.side_effect = NotFoundError(MagicMock())
+            repository._get.return_value = MagicMock(
+                status_code=200, raw=make_tarball({"README.md": "readme"})
+            )
+            repository.tree.return_value.tree = []
+            gh = MagicMock()
+            gh.repository_with_id.return_value = repository
+            gh_given_user.return_value = gh
+
+            with local_github_checkout(user, repo) as repo_root:
+                assert os.path.isdir(os.path.join(repo_root, ".git"))
+                assert os.path.isfile(os.path.join(repo_root, "README.md"))
+
+    def test_snapshot(self, settings):
+        settings.GITHUB_SNAPSHOT_CACHE_DIR = "/tmp/snapshots"
+        user = MagicMock()
+        with ExitStack() as stack:
+            gh_given_user = stack.enter_context(patch(f"{PATCH_ROOT}.gh_given_user"))
+            resolve_commit_sha = stack.enter_context(
+                patch(f"{PATCH_ROOT}.resolve_commit_sha")
+            )
+            resolve_commit_sha.return_value = "abc123"
+            gh_snapshots = stack.enter_context(patch(f"{PATCH_ROOT}.gh_snapshots"))
+            extract_repo = stack.enter_context(patch(f"{PATCH_ROOT}.extract_repo"))
+            repository = MagicMock(default_branch="main", id=123)
+            repository.tree.return_value.tree = []
             gh = MagicMock()
             gh.repository_with_id.return_value = repository
             gh_given_user.return_value = gh
-            glob.return_value = ["owner-repo_name-"]
 
-            with local_github_checkout(user, repo):
-                assert shutil.rmtree.called
-                assert os.remove.called
+            with local_github_checkout(user, 123):
+                snapshot = gh_snapshots.get_or_create_snapshot.return_value
+                gh_snapshots.materialize.assert_called_once_with(
+                    snapshot, os.getcwd(), read_only=False
+                )
+                assert gh_snapshots.get_or_create_snapshot.call_args.args[:2] == (
+                    123,
+                    "abc123",
+                )
+                assert not extract_repo.called
 
     def test_unsafe(self):
         user = MagicMock()
         repo = 123
         with ExitStack() as stack:
-            stack.enter_context(patch(f"{PATCH_ROOT}.zipfile"))
             gh_given_user = stack.enter_context(patch(f"{PATCH_ROOT}.gh_given_user"))
-            stack.enter_context(patch(f"{PATCH_ROOT}.shutil"))
-            glob = stack.enter_context(patch(f"{PATCH_ROOT}.glob"))
-            zip_file_is_safe = stack.enter_context(
-                patch(f"{PATCH_ROOT}.zip_file_is_safe")
+            repository = MagicMock()
+            repository._get.return_value = MagicMock(
+                status_code=200, raw=make_tarball({"/etc/passwd": "nope"})
             )
-            zip_file_is_safe.return_value = False
             gh = MagicMock()
+            gh.repository_with_id.return_value = repository
             gh_given_user.return_value = gh
-            glob.return_value = [".."]
 
-            with pytest.raises(UnsafeZipfileError):
+            with pytest.raises(UnsafeArchiveError):
                 with local_github_checkout(user, repo, "commit-ish"):  # pragma: nocover
                     pass
 
 
+def make_matching_refs_response(*names, next_url=None):
+    return MagicMock(
+        status_code=200,
+        links={"next": {"url": next_url}} if next_url else {},
+        **{
+            "json.return_value": [{"ref": f"refs/heads/{name}"} for name in names],
+        },
+    )
+
+
+class TestGetBranchNamesWithPrefix:
+    def test_paginated(self):
+        repository = MagicMock()
+        repository._get.side_effect = [
+            make_matching_refs_response("feature/a", next_url="https://example.com/2"),
+            make_matching_refs_response("feature/a-1"),
+        ]
+
+        names = get_branch_names_with_prefix(repository, "feature/a")
+
+        assert names == {"feature/a", "feature/a-1"}
+        assert repository._get.call_args_list[1].args == ("https://example.com/2",)
+        assert repository._get.call_args_list[1].kwargs == {"params": None}
+
+    def test_error(self):
+        repository = MagicMock()
+        repository._get.return_value = MagicMock(status_code=404)
+
+        with pytest.raises(NotFoundError):
+            get_branch_names_with_prefix(repository, "feature/a")
+
+
 class TestTryCreateBranch:
+    def test_try_to_make_branch__free(self):
+        repository = MagicMock()
+        repository._get.return_value = make_matching_refs_response()
+        repository.branch.return_value.latest_sha.return_value = "1234abc"
+
+        result = try_to_make_branch(
+            repository, new_branch="new-branch", base_branch="base-branch"
+        )
+
+        assert result == "new-branch"
+        repository.create_branch_ref.assert_called_once_with("new-branch", "1234abc")
+
+    def test_try_to_make_branch__taken(self):
+        repository = MagicMock()
+        repository._get.return_value = make_matching_refs_response(
+            "new-branch", "new-branch-1", "new-branch-2", "new-branch-other"
+        )
+        repository.branch.return_value.latest_sha.return_value = "1234abc"
+
+        result = try_to_make_branch(
+            repository, new_branch="new-branch", base_branch="base-branch"
+        )
+
+        assert result == "new-branch-3"
+        assert repository.branch.call_count == 1
+        repository.create_branch_ref.assert_called_once_with("new-branch-3", "1234abc")
+
     def test_try_to_make_branch__duplicate_name(self, user_factory, task_factory):
         repository = MagicMock()
+        repository._get.return_value = make_matching_refs_response()
         resp = MagicMock(status_code=400)
         resp.json.return_value = {"message": "Reference already exists"}
         repository.create_branch_ref.side_effect = [UnprocessableEntity(resp), None]
@@ -175,9 +523,7 @@ class TestTryCreateBranch:
 
     def test_try_to_make_branch__long_duplicate_name(self, user_factory, task_factory):
         repository = MagicMock()
-        resp = MagicMock(status_code=400)
-        resp.json.return_value = {"message": "Reference already exists"}
-        repository.create_branch_ref.side_effect = [UnprocessableEntity(resp), None]
+        repository._get.return_value = make_matching_refs_response("a" * 100)
         branch = MagicMock()
         branch.latest_sha.return_value = "1234abc"
         repository.branch.return_value = branch
@@ -186,9 +532,11 @@ class TestTryCreateBranch:
         )
 
         assert result == "a" * 98 + "-1"
+        assert repository._build_url.call_args.args[3] == "a" * 92
 
     def test_try_to_make_branch__unknown_error(self, user_factory, task_factory):
         repository = MagicMock()
+        repository._get.return_value = make_matching_refs_response()
         resp = MagicMock(status_code=400, msg="Test message")
         repository.create_branch_ref.side_effect = [UnprocessableEntity(resp), None]
         branch = MagicMock()
@@ -206,12 +554,128 @@ def test_get_source_format():
         assert get_source_format() == "sentinel"
 
 
-def test_validate_cumulusci_yml_unchanged():
-    repo = MagicMock()
-    repo.file_contents.return_value.decoded.decode.return_value = "1"
+def test_git_blob_sha():
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"
+
+
+class TestGetConfigBlobSha:
+    def test_uncached(self):
+        repo = MagicMock(id=123, default_branch="main")
+        repo.tree.return_value.tree = [
+            MagicMock(path="README.md", sha="1"),
+            MagicMock(path="cumulusci.yml", sha="2"),
+        ]
+        with patch(f"{PATCH_ROOT}.cache") as cache:
+            cache.get.return_value = None
+            assert get_config_blob_sha(repo) == "2"
+
+        repo.tree.assert_called_once_with("main")
+        cache.set.assert_called_once_with("gh-config-sha:123", "2", timeout=None)
+
+    def test_missing(self):
+        repo = MagicMock(id=123, default_branch="main")
+        repo.tree.return_value.tree = [MagicMock(path="README.md", sha="1")]
+        with patch(f"{PATCH_ROOT}.cache") as cache:
+            cache.get.return_value = None
+            assert get_config_blob_sha(repo) == ""
+
+    def test_cached(self):
+        repo = MagicMock(id=123)
+        with patch(f"{PATCH_ROOT}.cache") as cache:
+            cache.get.return_value = "2"
+            assert get_config_blob_sha(repo) == "2"
+
+        assert not repo.tree.called
+
+
+def test_get_project_config_summary():
+    repo = MagicMock(default_branch="main")
+
+    def extract_repo_paths(repo, commit_ish, paths):
+        with open("cumulusci.yml", "wb") as f:
+            f.write(b"")
+
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch(f"{PATCH_ROOT}.resolve_commit_sha", return_value="abc123")
+        )
+        stack.enter_context(
+            patch(f"{PATCH_ROOT}.extract_repo_paths", side_effect=extract_repo_paths)
+        )
+        get_project_config = stack.enter_context(
+            patch(f"{PATCH_ROOT}.get_project_config")
+        )
+        get_project_config.return_value = MagicMock(
+            project__git__prefix_feature="feature/",
+            project__source_format="sfdx",
+            project__package__api_version="50.0",
+            orgs__scratch={"dev": {"config_file": "orgs/dev.json"}},
+        )
+
+        assert get_project_config_summary(repo) == {
+            "blob_sha": "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391",
+            "prefix": "feature/",
+            "source_format": "sfdx",
+            "api_version": "50.0",
+            "scratch_org_configs": [{"key": "dev", "config_file": "orgs/dev.json"}],
+        }
+        assert get_project_config.call_args.kwargs["repo_commit"] == "abc123"
+
+
+class TestValidateCumulusciYmlUnchanged:
+    def test_unchanged(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "cumulusci.yml").write_bytes(b"")
+        repo = MagicMock()
+        with ExitStack() as stack:
+            get_config_blob_sha = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_config_blob_sha")
+            )
+            get_config_blob_sha.return_value = git_blob_sha(b"")
+            invalidate = stack.enter_context(
+                patch(f"{PATCH_ROOT}.invalidate_config_blob_sha")
+            )
+
+            validate_cumulusci_yml_unchanged(repo)
+
+            assert get_config_blob_sha.call_count == 1
+            assert not invalidate.called
+            assert not repo.file_contents.called
+
+    def test_missing(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with patch(f"{PATCH_ROOT}.get_config_blob_sha", return_value=""):
+            validate_cumulusci_yml_unchanged(MagicMock())
+
+    def test_stale(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "cumulusci.yml").write_bytes(b"")
+        repo = MagicMock(id=123)
+        with ExitStack() as stack:
+            get_config_blob_sha = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_config_blob_sha")
+            )
+            get_config_blob_sha.side_effect = ["old", git_blob_sha(b"")]
+            invalidate = stack.enter_context(
+                patch(f"{PATCH_ROOT}.invalidate_config_blob_sha")
+            )
+
+            validate_cumulusci_yml_unchanged(repo)
+
+            invalidate.assert_called_once_with(123)
+
+    def test_changed(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "cumulusci.yml").write_bytes(b"project: {}")
+        with ExitStack() as stack:
+            get_config_blob_sha = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_config_blob_sha")
+            )
+            get_config_blob_sha.return_value = git_blob_sha(b"")
+            stack.enter_context(patch(f"{PATCH_ROOT}.invalidate_config_blob_sha"))
 
-    with pytest.raises(Exception):
-        validate_cumulusci_yml_unchanged(repo)
+            with pytest.raises(Exception, match="unreviewed changes"):
+                validate_cumulusci_yml_unchanged(MagicMock())
 
 
 class TestNormalizeCommit:
@@ -0,0 +1,151 @@
+from unittest.mock import MagicMock, patch
+
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+from ..gh_cache import (
+    ConditionalRequestAdapter,
+    get_cache_key,
+    get_stats,
+    install_cache,
+)
+from ..gh_ratelimit import RateLimitedAdapter
+
+PATCH_ROOT = "metecho.api.gh_cache"
+URL = "https://api.github.com/repos/test/repo"
+
+
+def make_request(method="GET", accept="application/vnd.github.v3.full+json"):
+    request = PreparedRequest()
+    request.prepare(method=method, url=URL, headers={"Accept": accept})
+    return request
+
+
+def make_response(status_code, content=b"", headers=None):
+    response = Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    response.url = URL
+    response.encoding = "utf-8"
+    return response
+
+
+class FakeCache(dict):
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+    def add(self, key, value, timeout=None):
+        self.setdefault(key, value)
+
+    def incr(self, key):
+        self[key] += 1
+
+
+def test_get_cache_key():
+    assert get_cache_key("user:1", make_request()) != get_cache_key(
+        "user:2", make_request()
+    )
+    assert get_cache_key("user:1", make_request()) != get_cache_key(
+        "user:1", make_request(accept="application/vnd.github.v3.raw")
+    )
+
+
+def test_get_stats():
+    with patch(f"{PATCH_ROOT}.cache", FakeCache()) as cache:
+        assert get_stats()["hit_rate"] == 0.0
+        cache.update({"gh-cache:hits": 3, "gh-cache:misses": 1})
+        assert get_stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+class TestConditionalRequestAdapter:
+    def test_replay(self, settings):
+        settings.GITHUB_CACHE_TIMEOUT = 60
+        settings.GITHUB_CACHE_MAX_BYTES = 1024
+        adapter = ConditionalRequestAdapter("user:1")
+        first = make_response(
+            200,
+            b'{"id": 123}',
+            {"ETag": '"abc"', "Content-Encoding": "gzip", "X-RateLimit-Remaining": "9"},
+        )
+        not_modified = make_response(304, headers={"X-RateLimit-Remaining": "8"})
+
+        with patch(f"{PATCH_ROOT}.cache", FakeCache()) as cache, patch.object(
+            HTTPAdapter, "send", side_effect=[first, not_modified]
+        ) as send:
+            adapter.send(make_request())
+            response = adapter.send(make_request())
+
+            assert get_stats()["hits"] == get_stats()["misses"] == 1
+
+        assert send.call_args.args[0].headers["If-None-Match"] == '"abc"'
+        assert response.status_code == 200
+        assert response.json() == {"id": 123}
+        assert response.headers["X-RateLimit-Remaining"] == "8"
+        assert "Content-Encoding" not in response.headers
+        assert len(cache) == 3
+
+    def test_changed(self, settings):
+        settings.GITHUB_CACHE_TIMEOUT = 60
+        settings.GITHUB_CACHE_MAX_BYTES = 1024
+        adapter = ConditionalRequestAdapter("user:1")
+        first = make_response(200, b"1", {"ETag": '"abc"'})
+        second = make_response(200, b"2", {"ETag": '"def"'})
+
+        with patch(f"{PATCH_ROOT}.cache", FakeCache()) as cache, patch.object(
+            HTTPAdapter, "send", side_effect=[first, second]
+        ):
+            adapter.send(make_request())
+            assert adapter.send(make_request()).content == b"2"
+
+        entry = cache[get_cache_key("user:1", make_request())]
+        assert entry["etag"] == '"def"'
+
+    def test_not_cacheable(self, settings):
+        settings.GITHUB_CACHE_TIMEOUT = 60
+        settings.GITHUB_CACHE_MAX_BYTES = 1
+        adapter = ConditionalRequestAdapter("user:1")
+        responses = [
+            make_response(200, b"too large", {"ETag": '"abc"'}),
+            make_response(200, b"1"),
+            make_response(404, b"1", {"ETag": '"abc"'}),
+            make_response(201, b"1", {"ETag": '"abc"'}),
+        ]
+
+        with patch(f"{PATCH_ROOT}.cache", FakeCache()) as cache, patch.object(
+            HTTPAdapter, "send", side_effect=responses
+        ):
+            adapter.send(make_request())
+            adapter.send(make_request())
+            adapter.send(make_request())
+            adapter.send(make_request(method="POST"))
+
+        assert not [key for key in cache if key.startswith("gh-cache:entry:")]
+
+    def test_stream(self):
+        adapter = ConditionalRequestAdapter("user:1")
+        with patch(f"{PATCH_ROOT}.cache") as cache, patch.object(
+            HTTPAdapter, "send"
+        ) as send:
+            adapter.send(make_request(), stream=True)
+
+        assert send.called
+        assert not cache.get.called
+
+
+def test_install_cache(settings):
+    gh = MagicMock()
+    settings.GITHUB_CACHE_TIMEOUT = 0
+    install_cache(gh, "user:1")
+    adapter = gh.session.mount.call_args.args[1]
+    assert type(adapter) is RateLimitedAdapter
+    assert adapter.scope == "user:1"
+
+    settings.GITHUB_CACHE_TIMEOUT = 60
+    assert install_cache(gh, "user:1") == gh
+    adapter = gh.session.mount.call_args.args[1]
+    assert type(adapter) is ConditionalRequestAdapter
+    assert adapter.scope == "user:1"
@@ -0,0 +1,160 @@
+from unittest.mock import MagicMock
+
+import pytest
+from github3.exceptions import NotFoundError
+
+from ..gh_graphql import (
+    GraphQLError,
+    get_blob_texts,
+    get_branch_states,
+    get_collaborators,
+    graphql_query,
+)
+
+
+def make_repository(*payloads, status_code=200):
+    responses = [
+        MagicMock(status_code=status_code, **{"json.return_value": payload})
+        for payload in payloads
+    ]
+    repository = MagicMock(
+        **{
+            "owner.login": "owner",
+            "_build_url.return_value": "https://api.github.com/graphql",
+            "_post.side_effect": responses,
+        }
+    )
+    repository.name = "repo"
+    return repository
+
+
+class TestGraphQLQuery:
+    def test_good(self):
+        repository = make_repository({"data": {"viewer": {"login": "test"}}})
+        assert graphql_query(repository, "query { viewer { login } }") == {
+            "viewer": {"login": "test"}
+        }
+        assert repository._post.call_args.kwargs["data"] == {
+            "query": "query { viewer { login } }",
+            "variables": None,
+        }
+
+    def test_errors(self):
+        repository = make_repository({"errors": [{"message": "Bad query"}]})
+        with pytest.raises(GraphQLError, match="Bad query"):
+            graphql_query(repository, "query { nope }")
+
+    def test_http_error(self):
+        repository = make_repository({}, status_code=404)
+        with pytest.raises(NotFoundError):
+            graphql_query(repository, "query { viewer { login } }")
+
+
+def test_get_branch_states():
+    repository = make_repository(
+        {
+            "data": {
+                "repository": {
+                    "base": {
+                        "target": {"oid": "base-sha"},
+                        "compare0": {"aheadBy": 2, "behindBy": 1},
+                        "compare1": None,
+                    },
+                    "head0": {
+                        "target": {"oid": "head-sha"},
+                        "associatedPullRequests": {
+                            "nodes": [{"number": 12, "state": "MERGED"}]
+                        },
+                    },
+                    "head1": None,
+                }
+            }
+        }
+    )
+
+    base_sha, states = get_branch_states(repository, "main", ["feature", "missing"])
+
+    assert base_sha == "base-sha"
+    assert states == {
+        "feature": {
+            "sha": "head-sha",
+            "ahead_by": 2,
+            "behind_by": 1,
+            "pull_request": {"number": 12, "is_open": False, "is_merged": True},
+        },
+        "missing": None,
+    }
+    variables = repository._post.call_args.kwargs["data"]["variables"]
+    assert variables == {
+        "owner": "owner",
+        "name": "repo",
+        "base": "main",
+        "head0": "feature",
+        "head1": "missing",
+    }
+
+
+def test_get_collaborators():
+    page = {
+        "data": {
+            "repository": {
+                "collaborators": {
+                    "pageInfo": {"hasNextPage": True, "endCursor": "abc"},
+                    "nodes": [
+                        {"databaseId": 123, "login": "one", "avatarUrl": "one.png"}
+                    ],
+                }
+            }
+        }
+    }
+    last_page = {
+        "data": {
+            "repository": {
+                "collaborators": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": "def"},
+                    "nodes": [
+                        {"databaseId": 456, "login": "two", "avatarUrl": "two.png"}
+                    ],
+                }
+            }
+        }
+    }
+    repository = make_repository(page, last_page)
+
+    assert get_collaborators(repository) == [
+        {"id": "123", "login": "one", "avatar_url": "one.png"},
+        {"id": "456", "login": "two", "avatar_url": "two.png"},
+    ]
+    variables = repository._post.call_args.kwargs["data"]["variables"]
+    assert variables["cursor"] == "abc"
+
+
+def test_get_blob_texts():
+    repository = make_repository(
+        {
+            "data": {
+                "repository": {
+                    "blob0": {
+                        "text": "project: {}",
+                        "isBinary": False,
+                        "isTruncated": False,
+                    },
+                    "blob1": {"text": None, "isBinary": True, "isTruncated": False},
+                    "blob2": None,
+                }
+            }
+        }
+    )
+
+    texts = get_blob_texts(
+        repository, "abc123", ["cumulusci.yml", "logo.png", "missing.json"]
+    )
+
+    assert texts == {
+        "cumulusci.yml": "project: {}",
+        "logo.png": None,
+        "missing.json": None,
+    }
+    variables = repository._post.call_args.kwargs["data"]["variables"]
+    assert variables["expression0"] == "abc123:cumulusci.yml"
+    assert variables["expression2"] == "abc123:missing.json"
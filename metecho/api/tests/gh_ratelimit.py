@@ -0,0 +1,167 @@
+import time
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import pytest
+from requests.adapters import HTTPAdapter
+
+from ..gh_ratelimit import (
+    BULK,
+    INTERACTIVE,
+    RateLimitDeferred,
+    RateLimitedAdapter,
+    RateLimitExceeded,
+    check_budget,
+    defer_on_rate_limit,
+    get_budget,
+    get_priority,
+    github_priority,
+    record,
+)
+
+PATCH_ROOT = "metecho.api.gh_ratelimit"
+
+
+class FakeCache(dict):
+    def get(self, key, default=None):
+        return super().get(key, default)
+
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+
+def make_budget(remaining, reset_in=600):
+    return {"remaining": remaining, "limit": 5000, "reset": int(time.time()) + reset_in}
+
+
+def test_github_priority():
+    assert get_priority() == INTERACTIVE
+    with github_priority(BULK):
+        assert get_priority() == BULK
+    assert get_priority() == INTERACTIVE
+
+
+def test_record():
+    response = MagicMock(
+        headers={
+            "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Reset": "2000000000",
+        }
+    )
+    with patch(f"{PATCH_ROOT}.cache", FakeCache()):
+        record("user:1", response)
+        record("user:2", MagicMock(headers={}))
+
+        assert get_budget("user:1") == {
+            "remaining": 4999,
+            "limit": 5000,
+            "reset": 2000000000,
+        }
+        assert get_budget("user:2") is None
+
+
+class TestCheckBudget:
+    def test_unknown(self):
+        with patch(f"{PATCH_ROOT}.cache", FakeCache()), github_priority(BULK):
+            check_budget("user:1")
+
+    def test_bulk(self, settings):
+        settings.GITHUB_RATELIMIT_RESERVE = 500
+        with patch(f"{PATCH_ROOT}.get_budget") as get_budget:
+            get_budget.return_value = make_budget(501)
+            with github_priority(BULK):
+                check_budget("user:1")
+
+            get_budget.return_value = make_budget(500)
+            check_budget("user:1")
+            with github_priority(BULK), pytest.raises(RateLimitDeferred):
+                check_budget("user:1")
+
+            get_budget.return_value = make_budget(0, reset_in=-1)
+            with github_priority(BULK):
+                check_budget("user:1")
+
+    def test_interactive(self, settings):
+        settings.GITHUB_RATELIMIT_MAX_WAIT = 60
+        with ExitStack() as stack:
+            get_budget = stack.enter_context(patch(f"{PATCH_ROOT}.get_budget"))
+            sleep = stack.enter_context(patch(f"{PATCH_ROOT}.time.sleep"))
+            stack.enter_context(patch(f"{PATCH_ROOT}.get_current_job"))
+            get_budget.return_value = make_budget(0, reset_in=3600)
+            check_budget("user:1")
+            assert not sleep.called
+
+            get_budget.return_value = make_budget(0, reset_in=30)
+            check_budget("user:1")
+            assert sleep.called
+
+    def test_interactive__web(self, settings):
+        settings.GITHUB_RATELIMIT_MAX_WAIT = 60
+        with ExitStack() as stack:
+            get_budget = stack.enter_context(patch(f"{PATCH_ROOT}.get_budget"))
+            sleep = stack.enter_context(patch(f"{PATCH_ROOT}.time.sleep"))
+            get_current_job = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_current_job")
+            )
+            get_current_job.return_value = None
+            get_budget.return_value = make_budget(0, reset_in=30)
+            with pytest.raises(RateLimitExceeded) as exc_info:
+                check_budget("user:1")
+
+            assert not sleep.called
+            assert exc_info.value.status_code == 429
+            assert 0 < exc_info.value.wait <= 30
+
+
+def test_rate_limited_adapter():
+    adapter = RateLimitedAdapter("installation:1")
+    request = MagicMock()
+    with patch(f"{PATCH_ROOT}.check_budget") as check_budget, patch(
+        f"{PATCH_ROOT}.record"
+    ) as record, patch.object(HTTPAdapter, "send") as send:
+        response = adapter.send(request, stream=True)
+
+    check_budget.assert_called_once_with("installation:1")
+    record.assert_called_once_with("installation:1", send.return_value)
+    assert send.call_args.kwargs == {"stream": True}
+    assert response == send.return_value
+
+
+class TestDeferOnRateLimit:
+    def test_runs_as_bulk(self):
+        @defer_on_rate_limit
+        def func(arg):
+            return arg, get_priority()
+
+        assert func("x") == ("x", BULK)
+
+    def test_deferred(self):
+        @defer_on_rate_limit
+        def func(arg, *, kwarg):
+            raise RateLimitDeferred("installation:1", 2000000000)
+
+        with patch(f"{PATCH_ROOT}.get_scheduler") as get_scheduler:
+            func("x", kwarg="y")
+
+        scheduler = get_scheduler.return_value
+        retry_at, job_func, *args = scheduler.enqueue_at.call_args.args
+        assert retry_at.timestamp() == 2000000000
+        assert job_func is func
+        assert args == ["x"]
+        assert scheduler.enqueue_at.call_args.kwargs == {"kwarg": "y"}
+
+    def test_deferred__back_onto_origin_queue(self):
+        @defer_on_rate_limit
+        def func():
+            raise RateLimitDeferred("installation:1", 2000000000)
+
+        with ExitStack() as stack:
+            get_current_job = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_current_job")
+            )
+            get_current_job.return_value.origin = "bulk-2"
+            get_scheduler = stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
+            func()
+
+        get_scheduler.assert_called_once_with("bulk-2")
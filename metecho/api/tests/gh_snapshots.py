@@ -0,0 +1,115 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from ..gh_snapshots import (
+    evict,
+    get_or_create_snapshot,
+    get_snapshot_path,
+    get_stats,
+    is_enabled,
+    materialize,
+)
+
+PATCH_ROOT = "metecho.api.gh_snapshots"
+
+
+def _populate(path):
+    (path / "cumulusci.yml").write_text("project: {}")
+    (path / "src").mkdir()
+    (path / "src" / "package.xml").write_text("<Package/>")
+
+
+def test_is_enabled(settings):
+    settings.GITHUB_SNAPSHOT_CACHE_DIR = ""
+    assert not is_enabled()
+    settings.GITHUB_SNAPSHOT_CACHE_DIR = "/tmp/snapshots"
+    assert is_enabled()
+
+
+class TestGetOrCreateSnapshot:
+    def test_miss_then_hit(self, settings, tmp_path):
+        settings.GITHUB_SNAPSHOT_CACHE_DIR = str(tmp_path)
+        calls = []
+
+        def populate(path):
+            calls.append(path)
+            _populate(path)
+
+        with patch(f"{PATCH_ROOT}._incr") as incr:
+            first = get_or_create_snapshot(123, "abc", populate)
+            second = get_or_create_snapshot(123, "abc", populate)
+
+        assert first == second == get_snapshot_path(123, "abc")
+        assert len(calls) == 1
+        assert (first / "src" / "package.xml").read_text() == "<Package/>"
+        assert [call.args[0] for call in incr.call_args_list] == [
+            "gh-snapshots:misses",
+            "gh-snapshots:hits",
+        ]
+
+    def test_populate_error(self, settings, tmp_path):
+        settings.GITHUB_SNAPSHOT_CACHE_DIR = str(tmp_path)
+
+        def populate(path):
+            raise ValueError()
+
+        with patch(f"{PATCH_ROOT}._incr"):
+            with pytest.raises(ValueError):
+                get_or_create_snapshot(123, "abc", populate)
+
+        assert not get_snapshot_path(123, "abc").exists()
+        assert os.listdir(tmp_path / "123") == []
+
+
+def test_evict(settings, tmp_path):
+    settings.GITHUB_SNAPSHOT_CACHE_DIR = str(tmp_path)
+    settings.GITHUB_SNAPSHOT_CACHE_MAX_BYTES = 30
+    with patch(f"{PATCH_ROOT}._incr"):
+        old = get_or_create_snapshot(123, "old", _populate)
+        new = get_or_create_snapshot(123, "new", _populate)
+    os.utime(old, (0, 0))
+
+    evict(keep=new)
+
+    assert not old.exists()
+    assert new.exists()
+
+
+def test_get_stats():
+    with patch(f"{PATCH_ROOT}.cache") as cache:
+        cache.get.return_value = 3
+        assert get_stats() == {"hits": 3, "misses": 3}
+
+
+class TestMaterialize:
+    def test_copy(self, settings, tmp_path):
+        snapshot = tmp_path / "snapshot"
+        snapshot.mkdir()
+        _populate(snapshot)
+        dest = tmp_path / "dest"
+        (dest / ".git").mkdir(parents=True)
+
+        materialize(snapshot, dest)
+
+        assert (dest / "src" / "package.xml").read_text() == "<Package/>"
+        assert (dest / ".git").is_dir()
+        assert (
+            os.stat(dest / "cumulusci.yml").st_ino
+            != os.stat(snapshot / "cumulusci.yml").st_ino
+        )
+
+    def test_read_only(self, settings, tmp_path):
+        snapshot = tmp_path / "snapshot"
+        snapshot.mkdir()
+        _populate(snapshot)
+        dest = tmp_path / "dest"
+        dest.mkdir()
+
+        materialize(snapshot, dest, read_only=True)
+
+        assert (
+            os.stat(dest / "cumulusci.yml").st_ino
+            == os.stat(snapshot / "cumulusci.yml").st_ino
+        )
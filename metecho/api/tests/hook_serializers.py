@@ -43,6 +43,29 @@ class TestPushHookSerializer:
             serializer.process_hook()
             assert logger.info.called
 
+    @pytest.mark.parametrize(
+        "ref, invalidated",
+        (
+            ("refs/heads/main", True),
+            ("refs/heads/default", True),
+            ("refs/heads/feature", False),
+        ),
+    )
+    def test_process_hook__config_invalidation(self, project_factory, ref, invalidated):
+        project_factory(repo_id=123, branch_name="main")
+        data = {
+            "forced": False,
+            "ref": ref,
+            "commits": [],
+            "repository": {"id": 123, "default_branch": "default"},
+            "sender": {},
+        }
+        serializer = PushHookSerializer(data=data)
+        assert serializer.is_valid(), serializer.errors
+        with patch("metecho.api.models.gh.invalidate_config_blob_sha") as invalidate:
+            serializer.process_hook()
+            assert invalidate.called == invalidated
+
 
 @pytest.mark.django_db
 class TestPrHookSerializer:
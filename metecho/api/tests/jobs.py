@@ -4,27 +4,32 @@ from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
+from django.db import connection
 from django.utils.timezone import now
 from github3.exceptions import NotFoundError
 from simple_salesforce.exceptions import SalesforceGeneralError
 
+from ..gh_ratelimit import BULK, INTERACTIVE, RateLimitDeferred, get_priority
 from ..jobs import (
     TaskReviewIntegrityError,
     _create_branches_on_github,
     _create_org_and_run_flow,
     alert_user_about_expiring_org,
     available_task_org_config_names,
+    check_devhub_enabled,
     commit_changes_from_org,
     create_branches_on_github_then_create_scratch_org,
     create_gh_branch_for_new_epic,
     create_pr,
     delete_scratch_org,
+    delete_scratch_orgs,
     get_social_image,
     get_unsaved_changes,
     populate_github_users,
     refresh_commits,
     refresh_github_repositories_for_user,
     refresh_scratch_org,
+    resync_github_users,
     submit_review,
     user_reassign,
 )
@@ -47,15 +52,19 @@ class TestCreateBranchesOnGitHub:
         epic = task.epic
 
         with ExitStack() as stack:
-            stack.enter_context(patch(f"{PATCH_ROOT}.local_github_checkout"))
-            project_config = stack.enter_context(patch("metecho.api.gh.ProjectConfig"))
-            project_config_instance = MagicMock(project__git__prefix_feature="feature/")
-            project_config.return_value = project_config_instance
+            get_config_summary = stack.enter_context(
+                patch("metecho.api.models.Project.get_config_summary")
+            )
+            get_config_summary.return_value = {"prefix": "feature/"}
             get_repo_info = stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
             repository = MagicMock()
             repository.branch.return_value = MagicMock(
                 **{"latest_sha.return_value": "123abc"}
             )
+            # No existing branches match:
+            repository._get.return_value = MagicMock(
+                status_code=200, links={}, **{"json.return_value": []}
+            )
             get_repo_info.return_value = repository
 
             _create_branches_on_github(
@@ -67,6 +76,7 @@ class TestCreateBranchesOnGitHub:
             )
 
             assert repository.create_branch_ref.called
+            assert epic.branch_name.startswith("feature/")
 
     def test_create_branches_on_github__missing(self, user_factory, epic_factory):
         user = user_factory()
@@ -91,8 +101,8 @@ class TestCreateBranchesOnGitHub:
         epic = task.epic
 
         with ExitStack() as stack:
-            local_github_checkout = stack.enter_context(
-                patch(f"{PATCH_ROOT}.local_github_checkout")
+            get_config_summary = stack.enter_context(
+                patch("metecho.api.models.Project.get_config_summary")
             )
             try_to_make_branch = stack.enter_context(
                 patch(f"{PATCH_ROOT}.try_to_make_branch")
@@ -114,7 +124,7 @@ class TestCreateBranchesOnGitHub:
             )
 
             assert try_to_make_branch.called
-            assert not local_github_checkout.called
+            assert not get_config_summary.called
 
     def test_create_branches_on_github__repo_branch_prefix(
         self, user_factory, task_factory
@@ -124,8 +134,8 @@ class TestCreateBranchesOnGitHub:
         epic = task.epic
 
         with ExitStack() as stack:
-            local_github_checkout = stack.enter_context(
-                patch(f"{PATCH_ROOT}.local_github_checkout")
+            get_config_summary = stack.enter_context(
+                patch("metecho.api.models.Project.get_config_summary")
             )
             try_to_make_branch = stack.enter_context(
                 patch(f"{PATCH_ROOT}.try_to_make_branch")
@@ -147,7 +157,7 @@ class TestCreateBranchesOnGitHub:
             )
 
             assert try_to_make_branch.called
-            assert not local_github_checkout.called
+            assert not get_config_summary.called
 
     def test_create_branches_on_github__already_there(
         self, user_factory, epic_factory, task_factory
@@ -235,8 +245,8 @@ def test_create_org_and_run_flow():
             False,
         )
         stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
-        Path = stack.enter_context(patch(f"{PATCH_ROOT}.Path"))
-        Path.return_value = MagicMock(**{"read_text.return_value": "test logs"})
+        FlowOutput = stack.enter_context(patch(f"{PATCH_ROOT}.FlowOutput"))
+        output = FlowOutput.return_value.__enter__.return_value
         scratch_org = MagicMock(org_type=SCRATCH_ORG_TYPES.Dev)
         _create_org_and_run_flow(
             scratch_org,
@@ -248,8 +258,8 @@ def test_create_org_and_run_flow():
         )
 
         assert create_org.called
-        assert run_flow.called
-        assert isinstance(scratch_org.cci_log, str)
+        FlowOutput.assert_called_once_with(scratch_org)
+        assert run_flow.call_args[1]["output"] == output.write
 
 
 def test_create_org_and_run_flow__fall_back_to_cases():
@@ -277,8 +287,7 @@ def test_create_org_and_run_flow__fall_back_to_cases():
             False,
         )
         stack.enter_context(patch(f"{PATCH_ROOT}.get_scheduler"))
-        Path = stack.enter_context(patch(f"{PATCH_ROOT}.Path"))
-        Path.return_value = MagicMock(**{"read_text.return_value": "test logs"})
+        stack.enter_context(patch(f"{PATCH_ROOT}.FlowOutput"))
         _create_org_and_run_flow(
             MagicMock(
                 **{"org_type": SCRATCH_ORG_TYPES.Dev, "task.org_config_name": "dev"}
@@ -388,6 +397,32 @@ def test_delete_scratch_org(scratch_org_factory):
         assert sf_delete_scratch_org.called
 
 
+@pytest.mark.django_db
+def test_delete_scratch_orgs(scratch_org_factory):
+    scratch_org1 = scratch_org_factory(last_modified_at=now())
+    scratch_org2 = scratch_org_factory(last_modified_at=now())
+    error = ValueError("Bad org")
+
+    def delete_org(scratch_org):
+        if scratch_org == scratch_org1:
+            raise error
+
+    with ExitStack() as stack:
+        stack.enter_context(patch(f"{PATCH_ROOT}.delete_org", side_effect=delete_org))
+        notify_scratch_org_error = stack.enter_context(
+            patch("metecho.api.models.ScratchOrg.notify_scratch_org_error")
+        )
+        finalize_delete = stack.enter_context(
+            patch("metecho.api.models.ScratchOrg.finalize_delete")
+        )
+        delete_scratch_orgs([str(scratch_org1.id), str(scratch_org2.id)])
+
+    notify_scratch_org_error.assert_called_once_with(
+        error=error, type_="SCRATCH_ORG_DELETE_FAILED", originating_user_id=None
+    )
+    finalize_delete.assert_called_once_with(originating_user_id=None)
+
+
 @pytest.mark.django_db
 def test_delete_scratch_org__exception(scratch_org_factory):
     scratch_org = scratch_org_factory()
@@ -418,6 +453,15 @@ def test_refresh_github_repositories_for_user(user_factory):
     assert user.refresh_repositories.called
 
 
+def test_check_devhub_enabled():
+    user = MagicMock(id="abc")
+    with patch(f"{PATCH_ROOT}.cache") as cache:
+        check_devhub_enabled(user)
+
+    assert user.check_devhub_enabled.called
+    cache.delete.assert_called_once_with("devhub-enabled-lock:abc")
+
+
 @pytest.mark.django_db
 def test_commit_changes_from_org(scratch_org_factory, user_factory):
     scratch_org = scratch_org_factory()
@@ -487,7 +531,9 @@ class TestErrorHandling:
             assert scratch_org.delete.called
             assert async_to_sync.called
 
-    def test_get_unsaved_changes(self, scratch_org_factory):
+    def test_get_unsaved_changes(
+        self, scratch_org_factory, django_capture_on_commit_callbacks
+    ):
         scratch_org = scratch_org_factory()
         with ExitStack() as stack:
             async_to_sync = stack.enter_context(
@@ -498,12 +544,16 @@ class TestErrorHandling:
             )
             get_latest_revision_numbers.side_effect = Exception
 
-            with pytest.raises(Exception):
+            with pytest.raises(Exception), django_capture_on_commit_callbacks(
+                execute=True
+            ):
                 get_unsaved_changes(scratch_org, originating_user_id=None)
 
             assert async_to_sync.called
 
-    def test_commit_changes_from_org(self, scratch_org_factory, user_factory):
+    def test_commit_changes_from_org(
+        self, scratch_org_factory, user_factory, django_capture_on_commit_callbacks
+    ):
         user = user_factory()
         scratch_org = scratch_org_factory()
         with ExitStack() as stack:
@@ -515,7 +565,9 @@ class TestErrorHandling:
             )
             commit_changes_to_github.side_effect = Exception
 
-            with pytest.raises(Exception):
+            with pytest.raises(Exception), django_capture_on_commit_callbacks(
+                execute=True
+            ):
                 commit_changes_from_org(
                     scratch_org=scratch_org,
                     user=user,
@@ -571,8 +623,27 @@ class TestErrorHandling:
             refresh_commits(
                 project=project, branch_name="task", originating_user_id=None
             )
-            task.refresh_from_db()
-            assert len(task.commits) == 1
+            assert list(task.commits.values_list("sha", flat=True)) == ["abcd1234"]
+
+    def test_refresh_commits__deferred(self, project_factory):
+        project = project_factory(repo_id=123)
+        atomic_depth = len(connection.atomic_blocks)
+        depths = []
+        with ExitStack() as stack:
+            get_repo_info = stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
+            get_repo_info.side_effect = RateLimitDeferred("installation:1", 2000000000)
+            get_scheduler = stack.enter_context(
+                patch("metecho.api.gh_ratelimit.get_scheduler")
+            )
+            get_scheduler.return_value.enqueue_at.side_effect = (
+                lambda *args, **kwargs: depths.append(len(connection.atomic_blocks))
+            )
+
+            refresh_commits(
+                project=project, branch_name="task", originating_user_id=None
+            )
+
+            assert depths == [atomic_depth]
 
 
 @pytest.mark.django_db
@@ -605,7 +676,9 @@ def test_create_pr(user_factory, task_factory):
 
 
 @pytest.mark.django_db
-def test_create_pr__error(user_factory, task_factory):
+def test_create_pr__error(
+    user_factory, task_factory, django_capture_on_commit_callbacks
+):
     user = user_factory()
     task = task_factory()
     with ExitStack() as stack:
@@ -617,7 +690,7 @@ def test_create_pr__error(user_factory, task_factory):
             patch("metecho.api.model_mixins.async_to_sync")
         )
 
-        with pytest.raises(Exception):
+        with pytest.raises(Exception), django_capture_on_commit_callbacks(execute=True):
             create_pr(
                 task,
                 user,
@@ -665,7 +738,32 @@ class TestPopulateGitHubUsers:
             project.refresh_from_db()
             assert len(project.github_users) == 2
 
-    def test__error(self, user_factory, project_factory, git_hub_repository_factory):
+    def test_populate_github_users__graphql(
+        self, settings, user_factory, project_factory
+    ):
+        settings.GITHUB_USE_GRAPHQL = True
+        project = project_factory(repo_id=123)
+        with ExitStack() as stack:
+            stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
+            get_collaborators = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_collaborators")
+            )
+            get_collaborators.return_value = [
+                {"id": "456", "login": "Zed", "avatar_url": ""},
+                {"id": "123", "login": "amy", "avatar_url": ""},
+            ]
+
+            populate_github_users(project, originating_user_id=None)
+            project.refresh_from_db()
+            assert [user["login"] for user in project.github_users] == ["amy", "Zed"]
+
+    def test__error(
+        self,
+        user_factory,
+        project_factory,
+        git_hub_repository_factory,
+        django_capture_on_commit_callbacks,
+    ):
         user = user_factory()
         project = project_factory(repo_id=123)
         git_hub_repository_factory(repo_id=123, user=user)
@@ -677,12 +775,54 @@ class TestPopulateGitHubUsers:
             )
             logger = stack.enter_context(patch(f"{PATCH_ROOT}.logger"))
 
-            with pytest.raises(Exception):
+            with pytest.raises(Exception), django_capture_on_commit_callbacks(
+                execute=True
+            ):
                 populate_github_users(project, originating_user_id=None)
 
             assert logger.error.called
             assert async_to_sync.called
 
+    def test_interactive(self, project_factory):
+        project = project_factory(repo_id=123)
+        priorities = []
+        with patch(f"{PATCH_ROOT}.get_repo_info") as get_repo_info:
+            get_repo_info.side_effect = lambda *args, **kwargs: (
+                priorities.append(get_priority()) or MagicMock()
+            )
+
+            populate_github_users(project, originating_user_id=None)
+
+        assert priorities == [INTERACTIVE]
+
+    def test_resync__deferred(
+        self, project_factory, django_capture_on_commit_callbacks
+    ):
+        project = project_factory(repo_id=123)
+        priorities = []
+
+        def get_repo_info(*args, **kwargs):
+            priorities.append(get_priority())
+            raise RateLimitDeferred("installation:1", 2000000000)
+
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_repo_info", side_effect=get_repo_info)
+            )
+            get_scheduler = stack.enter_context(
+                patch("metecho.api.gh_ratelimit.get_scheduler")
+            )
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+
+            with django_capture_on_commit_callbacks(execute=True):
+                resync_github_users(project)
+
+        assert priorities == [BULK]
+        assert get_scheduler.return_value.enqueue_at.called
+        assert not async_to_sync.called
+
 
 @pytest.mark.django_db
 class TestSubmitReview:
@@ -838,6 +978,53 @@ class TestCreateGhBranchForNewEpic:
             create_gh_branch_for_new_epic(epic, user=user)
             assert epic.pr_number is None
 
+    def test_graphql(self, settings, user_factory, epic_factory):
+        settings.GITHUB_USE_GRAPHQL = True
+        user = user_factory()
+        with ExitStack() as stack:
+            stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
+            get_branch_states = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_branch_states")
+            )
+            get_branch_states.return_value = (
+                "abc123",
+                {
+                    "pepin": {
+                        "sha": "def456",
+                        "ahead_by": 2,
+                        "behind_by": 0,
+                        "pull_request": {
+                            "number": 12,
+                            "is_open": True,
+                            "is_merged": False,
+                        },
+                    }
+                },
+            )
+
+            epic = epic_factory(branch_name="pepin")
+            create_gh_branch_for_new_epic(epic, user=user)
+            assert epic.has_unmerged_commits
+            assert epic.pr_number == 12
+            assert epic.pr_is_open
+
+    def test_graphql__missing_branch(self, settings, user_factory, epic_factory):
+        settings.GITHUB_USE_GRAPHQL = True
+        user = user_factory()
+        with ExitStack() as stack:
+            stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
+            get_branch_states = stack.enter_context(
+                patch(f"{PATCH_ROOT}.get_branch_states")
+            )
+            get_branch_states.return_value = ("abc123", {"pepin": None})
+            try_to_make_branch = stack.enter_context(
+                patch(f"{PATCH_ROOT}.try_to_make_branch")
+            )
+
+            epic = epic_factory(branch_name="pepin")
+            create_gh_branch_for_new_epic(epic, user=user)
+            assert try_to_make_branch.called
+
     def test_no_branch_name(self, user_factory, epic_factory):
         user = user_factory()
         with ExitStack() as stack:
@@ -873,38 +1060,29 @@ class TestAvailableTaskOrgConfigNames:
         epic = epic_factory()
         user = user_factory()
         epic.finalize_available_task_org_config_names = MagicMock()
-        with ExitStack() as stack:
-            stack.enter_context(patch(f"{PATCH_ROOT}.local_github_checkout"))
-            get_repo_info = stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
-            get_repo_info.return_value = MagicMock(
-                **{
-                    "name": "repo",
-                    "html_url": "https://example.com",
-                    "owner.login": "login",
-                    "branch.return_value": MagicMock(
-                        **{"latest_sha.return_value": "123abc"}
-                    ),
-                }
-            )
-            stack.enter_context(patch(f"{PATCH_ROOT}.get_project_config"))
-            BaseCumulusCI = stack.enter_context(
-                patch("metecho.api.sf_org_changes.BaseCumulusCI")
-            )
-            BaseCumulusCI.return_value = MagicMock(
-                **{"project_config.orgs__scratch": {}}
-            )
+        with patch(
+            "metecho.api.models.Project.get_config_summary"
+        ) as get_config_summary:
+            get_config_summary.return_value = {
+                "scratch_org_configs": [{"key": "dev", "config_file": "dev.json"}]
+            }
 
             available_task_org_config_names(epic, user=user)
 
             assert epic.finalize_available_task_org_config_names.called
+            assert epic.available_task_org_config_names == [
+                {"key": "dev", "config_file": "dev.json"}
+            ]
 
     def test_available_task_org_config_names__error(self, epic_factory, user_factory):
         epic = epic_factory()
         user = user_factory()
         epic.finalize_available_task_org_config_names = MagicMock()
         with ExitStack() as stack:
-            get_repo_info = stack.enter_context(patch(f"{PATCH_ROOT}.get_repo_info"))
-            get_repo_info.side_effect = ValueError
+            get_config_summary = stack.enter_context(
+                patch("metecho.api.models.Project.get_config_summary")
+            )
+            get_config_summary.side_effect = ValueError
 
             with pytest.raises(ValueError):
                 available_task_org_config_names(epic, user=user)
@@ -936,7 +1114,9 @@ def test_get_social_image(project_factory):
 
 @pytest.mark.django_db
 class TestUserReassign:
-    def test_happy(self, scratch_org_factory, user_factory):
+    def test_happy(
+        self, scratch_org_factory, user_factory, django_capture_on_commit_callbacks
+    ):
         scratch_org = scratch_org_factory()
         user = user_factory()
 
@@ -947,11 +1127,16 @@ class TestUserReassign:
             stack.enter_context(
                 patch("metecho.api.models.ScratchOrg.get_refreshed_org_config")
             )
-            user_reassign(scratch_org, new_user=user, originating_user_id=str(user.id))
+            with django_capture_on_commit_callbacks(execute=True):
+                user_reassign(
+                    scratch_org, new_user=user, originating_user_id=str(user.id)
+                )
 
             assert async_to_sync.called
 
-    def test_sad(self, scratch_org_factory, user_factory):
+    def test_sad(
+        self, scratch_org_factory, user_factory, django_capture_on_commit_callbacks
+    ):
         scratch_org = scratch_org_factory()
         user = user_factory()
 
@@ -963,6 +1148,9 @@ class TestUserReassign:
                 patch("metecho.api.models.ScratchOrg.get_refreshed_org_config")
             )
             get_refreshed_org_config.side_effect = ValueError()
-            user_reassign(scratch_org, new_user=user, originating_user_id=str(user.id))
+            with django_capture_on_commit_callbacks(execute=True):
+                user_reassign(
+                    scratch_org, new_user=user, originating_user_id=str(user.id)
+                )
 
             assert async_to_sync.called
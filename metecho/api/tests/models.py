@@ -1,20 +1,28 @@
+import pickle
+import time
 from contextlib import ExitStack
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
+from django.db import transaction
 from django.utils.timezone import now
+from requests.exceptions import HTTPError
 from simple_salesforce.exceptions import SalesforceError
 
 from ..models import (
     EPIC_STATUSES,
     SCRATCH_ORG_TYPES,
     TASK_STATUSES,
+    CommitAuthor,
     Epic,
     Project,
+    ScratchOrg,
     Task,
+    User,
     user_logged_in_handler,
 )
+from ..push import buffered_notifications
 
 
 @pytest.mark.django_db
@@ -85,6 +93,56 @@ class TestProject:
 
             assert async_to_sync.called
 
+    def test_get_cached_config_summary(self, project_factory):
+        project = project_factory(config_summary={"blob_sha": "abc", "prefix": "f/"})
+        with patch("metecho.api.gh.get_cached_config_blob_sha") as get_cached:
+            get_cached.return_value = None
+            assert project.get_cached_config_summary() is None
+            get_cached.return_value = "def"
+            assert project.get_cached_config_summary() is None
+            get_cached.return_value = "abc"
+            assert project.get_cached_config_summary()["prefix"] == "f/"
+
+    def test_get_config_summary__unchanged(self, project_factory):
+        project = project_factory(config_summary={"blob_sha": "abc", "prefix": "f/"})
+        with ExitStack() as stack:
+            stack.enter_context(patch("metecho.api.gh.get_repo_info"))
+            stack.enter_context(
+                patch("metecho.api.gh.get_cached_config_blob_sha", return_value=None)
+            )
+            stack.enter_context(
+                patch("metecho.api.gh.get_config_blob_sha", return_value="abc")
+            )
+            get_project_config_summary = stack.enter_context(
+                patch("metecho.api.gh.get_project_config_summary")
+            )
+
+            assert project.get_config_summary()["prefix"] == "f/"
+            assert not get_project_config_summary.called
+
+    def test_get_config_summary__changed(self, project_factory):
+        project = project_factory(config_summary={"blob_sha": "abc", "prefix": "f/"})
+        with ExitStack() as stack:
+            stack.enter_context(patch("metecho.api.gh.get_repo_info"))
+            stack.enter_context(
+                patch("metecho.api.gh.get_cached_config_blob_sha", return_value=None)
+            )
+            stack.enter_context(
+                patch("metecho.api.gh.get_config_blob_sha", return_value="def")
+            )
+            get_project_config_summary = stack.enter_context(
+                patch("metecho.api.gh.get_project_config_summary")
+            )
+            get_project_config_summary.return_value = {
+                "blob_sha": "def",
+                "prefix": "feature/",
+            }
+
+            assert project.get_config_summary()["prefix"] == "feature/"
+
+        project.refresh_from_db()
+        assert project.config_summary["blob_sha"] == "def"
+
 
 @pytest.mark.django_db
 class TestEpic:
@@ -132,6 +190,49 @@ class TestEpic:
         task_factory(epic=epic, status=TASK_STATUSES.Completed)
         assert not epic.should_update_status()
 
+    def test_task_counts(self, epic_factory, task_factory):
+        with patch("metecho.api.model_mixins.async_to_sync"):
+            epic = epic_factory()
+            other_epic = epic_factory()
+            task1 = task_factory(epic=epic)
+            task2 = task_factory(epic=epic)
+            assert epic.planned_task_count == 2
+            assert epic.status == EPIC_STATUSES.Planned
+
+            task1.status = TASK_STATUSES["In progress"]
+            task1.save()
+            epic.refresh_from_db()
+            assert epic.planned_task_count == 1
+            assert epic.in_progress_task_count == 1
+            assert epic.status == EPIC_STATUSES["In progress"]
+
+            task2.epic = other_epic
+            task2.save()
+            task1.status = TASK_STATUSES.Completed
+            task1.save()
+            epic.refresh_from_db()
+            other_epic.refresh_from_db()
+            assert epic.planned_task_count == 0
+            assert epic.completed_task_count == 1
+            assert epic.status == EPIC_STATUSES.Review
+            assert other_epic.planned_task_count == 1
+
+            task2.hard_delete()
+            other_epic.refresh_from_db()
+            assert other_epic.planned_task_count == 0
+
+    def test_save__keeps_task_counts(self, epic_factory, task_factory):
+        epic = epic_factory()
+        stale = Epic.objects.get(pk=epic.pk)
+        task_factory(epic=epic)
+
+        stale.name = "Renamed"
+        stale.save()
+        epic.refresh_from_db()
+
+        assert epic.name == "Renamed"
+        assert epic.planned_task_count == 1
+
     def test_queue_create_pr(self, epic_factory, user_factory):
         with ExitStack() as stack:
             create_pr_job = stack.enter_context(patch("metecho.api.jobs.create_pr_job"))
@@ -189,6 +290,31 @@ class TestEpic:
 
             assert available_task_org_config_names_job.delay.called
 
+    def test_queue_available_task_org_config_names__cached(
+        self, user_factory, epic_factory
+    ):
+        user = user_factory()
+        epic = epic_factory()
+        epic.notify_changed = MagicMock()
+        with ExitStack() as stack:
+            available_task_org_config_names_job = stack.enter_context(
+                patch("metecho.api.jobs.available_task_org_config_names_job")
+            )
+            get_cached_config_summary = stack.enter_context(
+                patch("metecho.api.models.Project.get_cached_config_summary")
+            )
+            get_cached_config_summary.return_value = {
+                "scratch_org_configs": [{"key": "dev"}]
+            }
+            epic.queue_available_task_org_config_names(user)
+
+            assert not available_task_org_config_names_job.delay.called
+            assert epic.notify_changed.called
+
+        epic.refresh_from_db()
+        assert epic.available_task_org_config_names == [{"key": "dev"}]
+        assert not epic.currently_fetching_org_config_names
+
     def test_finalize_available_task_org_config_names(self, epic_factory):
         epic = epic_factory()
         epic.notify_changed = MagicMock()
@@ -284,14 +410,15 @@ class TestTask:
 
             assert submit_review_job.delay.called
 
-    def test_finalize_submit_review(self, task_factory):
+    def test_finalize_submit_review(self, task_factory, commit_factory):
         now = datetime(2020, 12, 31, 12, 0)
         with ExitStack() as stack:
             async_to_sync = stack.enter_context(
                 patch("metecho.api.model_mixins.async_to_sync")
             )
 
-            task = task_factory(commits=[{"id": "123"}])
+            task = task_factory()
+            commit_factory(task=task, sha="123")
             task.finalize_submit_review(now, sha="123", originating_user_id=None)
 
             assert async_to_sync.called
@@ -299,7 +426,7 @@ class TestTask:
             assert task.review_valid
 
     def test_finalize_submit_review__delete_org(
-        self, task_factory, scratch_org_factory
+        self, task_factory, commit_factory, scratch_org_factory
     ):
         now = datetime(2020, 12, 31, 12, 0)
         with ExitStack() as stack:
@@ -307,7 +434,8 @@ class TestTask:
                 patch("metecho.api.model_mixins.async_to_sync")
             )
 
-            task = task_factory(commits=[{"id": "123"}])
+            task = task_factory()
+            commit_factory(task=task, sha="123")
             scratch_org = scratch_org_factory(task=task, org_type=SCRATCH_ORG_TYPES.QA)
             scratch_org.queue_delete = MagicMock()
             task.finalize_submit_review(
@@ -356,38 +484,61 @@ class TestTask:
         Task.objects.all().delete()
         assert task.scratchorg_set.active().count() == 0
 
-    def test_get_all_users_in_commits(self, task_factory):
-        task = task_factory(
-            commits=[
-                {
-                    "id": "123",
-                    "author": {
-                        "name": "Name 1",
-                        "email": "name1@example.com",
-                        "username": "name1",
-                        "avatar_url": "https://example.com/",
-                    },
-                },
-                {
-                    "id": "456",
-                    "author": {
-                        "name": "Name 2",
-                        "email": "name2@example.com",
-                        "username": "name2",
-                        "avatar_url": "https://example.com/",
-                    },
-                },
-                {
-                    "id": "789",
-                    "author": {
-                        "name": "Name 1",
-                        "email": "name1@example.com",
-                        "username": "name1",
-                        "avatar_url": "https://example.com/",
-                    },
-                },
-            ],
+    def test_soft_delete_cascade__bulk(
+        self, epic_factory, task_factory, scratch_org_factory
+    ):
+        epic = epic_factory()
+        task1 = task_factory(epic=epic)
+        task2 = task_factory(epic=epic)
+        org1 = scratch_org_factory(task=task1)
+        org2 = scratch_org_factory(task=task2)
+
+        with ExitStack() as stack:
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            delete_scratch_orgs_job = stack.enter_context(
+                patch("metecho.api.jobs.delete_scratch_orgs_job")
+            )
+            epic.delete()
+
+        delete_scratch_orgs_job.delay.assert_called_once()
+        assert set(delete_scratch_orgs_job.delay.call_args[0][0]) == {
+            str(org1.id),
+            str(org2.id),
+        }
+        messages = [
+            (call[0][0], call[0][1]["payload"])
+            for call in async_to_sync.return_value.call_args_list
+            if call[0][1]["type"] == "SOFT_DELETE_MANY"
+        ]
+        assert len(messages) == 3
+        by_parent = {str(parent.id): payload for parent, payload in messages}
+        assert by_parent[str(epic.id)]["object_type"] == "task"
+        assert set(by_parent[str(epic.id)]["ids"]) == {str(task1.id), str(task2.id)}
+        assert by_parent[str(task1.id)]["object_type"] == "scratch_org"
+        assert by_parent[str(task1.id)]["ids"] == [str(org1.id)]
+
+    def test_get_all_users_in_commits(
+        self, task_factory, commit_factory, commit_author_factory
+    ):
+        task = task_factory()
+        author1 = commit_author_factory(
+            name="Name 1",
+            email="name1@example.com",
+            username="name1",
+            avatar_url="https://example.com/",
+        )
+        author2 = commit_author_factory(
+            name="Name 2",
+            email="name2@example.com",
+            username="name2",
+            avatar_url="https://example.com/",
         )
+        commit_factory(task=task, sha="123", author=author1)
+        commit_factory(task=task, sha="456", author=author2)
+        commit_factory(task=task, sha="789", author=author1)
+        commit_factory(author=author1)
 
         expected = [
             {
@@ -406,6 +557,148 @@ class TestTask:
 
         assert task.get_all_users_in_commits == expected
 
+    def test_notify_changed__buffered(
+        self, task_factory, django_capture_on_commit_callbacks
+    ):
+        task = task_factory()
+        with ExitStack() as stack:
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            with django_capture_on_commit_callbacks(execute=True):
+                with buffered_notifications():
+                    task.notify_changed(originating_user_id=None)
+                    task.notify_changed(originating_user_id="abc")
+                assert not async_to_sync.called
+
+        assert async_to_sync.call_count == 1
+        assert async_to_sync.return_value.call_args[0][1]["payload"] == {
+            "originating_user_id": "abc"
+        }
+
+    def test_notify_changed__buffered_rolled_back(
+        self, task_factory, django_capture_on_commit_callbacks
+    ):
+        task = task_factory()
+        with ExitStack() as stack:
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            with django_capture_on_commit_callbacks(execute=True) as callbacks:
+                with pytest.raises(ValueError), transaction.atomic():
+                    with buffered_notifications():
+                        task.notify_changed(originating_user_id=None)
+                    raise ValueError
+
+        assert callbacks == []
+        assert not async_to_sync.called
+
+    def test_notify_error__buffered(
+        self, task_factory, django_capture_on_commit_callbacks
+    ):
+        task = task_factory()
+        with ExitStack() as stack:
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            with django_capture_on_commit_callbacks(execute=True):
+                with buffered_notifications():
+                    task.notify_changed(originating_user_id=None)
+                    task.notify_error(ValueError("Bad"), originating_user_id=None)
+                    task.notify_changed(originating_user_id="abc")
+                assert not async_to_sync.called
+
+        # The error follows the update it came after, even once that
+        # update is replaced:
+        assert [
+            call[0][1]["type"] for call in async_to_sync.return_value.call_args_list
+        ] == [task.push_update_type, task.push_error_type]
+
+    def test_add_commits(self, task_factory):
+        task = task_factory()
+        author = {
+            "name": "Test",
+            "email": "test@example.com",
+            "username": "test123",
+            "avatar_url": "",
+        }
+        commits = [
+            {
+                "id": sha,
+                "timestamp": "2019-11-20T21:32:53+00:00",
+                "author": author,
+                "message": "Message",
+                "url": "https://github.com/test/user/foo",
+            }
+            for sha in ("111", "222")
+        ]
+        with ExitStack() as stack:
+            stack.enter_context(patch("metecho.api.model_mixins.async_to_sync"))
+            gh = stack.enter_context(patch("metecho.api.models.gh"))
+            gh.normalize_commit.side_effect = lambda commit, sender: commit
+            task.add_commits(commits, sender={})
+            # A redelivered hook doesn't duplicate commits:
+            task.add_commits(commits[1:], sender={})
+
+        assert list(task.commits.values_list("sha", flat=True)) == ["222", "111"]
+        assert CommitAuthor.objects.filter(username="test123").count() == 1
+        assert task.latest_commit_sha == "222"
+
+    def test_add_commits__branch_order(self, task_factory, commit_factory):
+        task = task_factory()
+        commit_factory(task=task, sha="111")
+        author = {"name": "Test", "email": "", "username": "", "avatar_url": ""}
+        # Older timestamps than the commit already on the branch, as
+        # after a rebase:
+        commits = [
+            {
+                "id": sha,
+                "timestamp": "2019-11-20T21:32:53+00:00",
+                "author": author,
+                "message": "",
+                "url": "",
+            }
+            for sha in ("222", "333")
+        ]
+        with ExitStack() as stack:
+            stack.enter_context(patch("metecho.api.model_mixins.async_to_sync"))
+            gh = stack.enter_context(patch("metecho.api.models.gh"))
+            gh.normalize_commit.side_effect = lambda commit, sender: commit
+            task.add_commits(commits, sender={})
+
+        assert list(task.commits.values_list("sha", flat=True)) == [
+            "333",
+            "222",
+            "111",
+        ]
+
+    def test_set_commits(self, task_factory, commit_factory):
+        task = task_factory()
+        kept = commit_factory(task=task, sha="111")
+        commit_factory(task=task, sha="222")
+        commit_factory(task=task, sha="444")
+        author = {"name": "Test", "email": "", "username": "", "avatar_url": ""}
+        task.set_commits(
+            [
+                {
+                    "id": sha,
+                    "timestamp": "",
+                    "author": author,
+                    "message": "",
+                    "url": "",
+                }
+                for sha in ("111", "333", "444")
+            ]
+        )
+
+        # Kept rows are renumbered in the new branch order:
+        assert list(task.commits.values_list("sha", flat=True)) == [
+            "111",
+            "333",
+            "444",
+        ]
+        assert task.commits.get(sha="111").id == kept.id
+
     def test_add_reviewer(self, task_factory):
         task = task_factory()
         task.add_reviewer({"login": "login", "avatar_url": "https://example.com"})
@@ -415,6 +708,38 @@ class TestTask:
             {"login": "login", "avatar_url": "https://example.com"}
         ]
 
+    def test_update_has_unmerged_commits(self, task_factory):
+        task = task_factory(branch_name="task", epic__branch_name="epic")
+        with patch("metecho.api.gh.get_repo_info") as get_repo_info:
+            get_repo_info.return_value = MagicMock(
+                **{"compare_commits.return_value": MagicMock(ahead_by=1)}
+            )
+            task.update_has_unmerged_commits()
+
+        assert task.has_unmerged_commits
+
+    def test_update_has_unmerged_commits__graphql(self, settings, task_factory):
+        settings.GITHUB_USE_GRAPHQL = True
+        task = task_factory(branch_name="task", epic__branch_name="epic")
+        with ExitStack() as stack:
+            stack.enter_context(patch("metecho.api.gh.get_repo_info"))
+            get_branch_states = stack.enter_context(
+                patch("metecho.api.gh_graphql.get_branch_states")
+            )
+            get_branch_states.return_value = ("abc", {"task": {"ahead_by": 0}})
+            task.update_has_unmerged_commits()
+
+        assert get_branch_states.call_args.args[1:] == ("epic", ["task"])
+        assert not task.has_unmerged_commits
+
+    def test_update_has_unmerged_commits__state(self, task_factory):
+        task = task_factory(branch_name="task", epic__branch_name="epic")
+        with patch("metecho.api.gh.get_repo_info") as get_repo_info:
+            task.update_has_unmerged_commits(state={"ahead_by": 3})
+
+        assert not get_repo_info.called
+        assert task.has_unmerged_commits
+
 
 @pytest.mark.django_db
 class TestUser:
@@ -433,6 +758,64 @@ class TestUser:
 
             assert async_to_sync.called
 
+    def test_refresh_repositories__diff(self, user_factory, git_hub_repository_factory):
+        user = user_factory()
+        unchanged = git_hub_repository_factory(
+            user=user, repo_id=1, repo_url="https://example.com/1"
+        )
+        renamed = git_hub_repository_factory(
+            user=user, repo_id=2, repo_url="https://example.com/old"
+        )
+        git_hub_repository_factory(user=user, repo_id=3)
+        with ExitStack() as stack:
+            gh = stack.enter_context(patch("metecho.api.models.gh"))
+            stack.enter_context(patch("metecho.api.models.async_to_sync"))
+            stack.enter_context(
+                patch("metecho.api.models.REPOSITORY_SYNC_BATCH_SIZE", 1)
+            )
+            gh.get_all_org_repos.return_value = iter(
+                [
+                    MagicMock(id=1, html_url="https://example.com/1"),
+                    MagicMock(id=2, html_url="https://example.com/2"),
+                    MagicMock(id=4, html_url="https://example.com/4"),
+                ]
+            )
+            user.refresh_repositories()
+
+        repos = dict(user.repositories.values_list("repo_id", "pk"))
+        assert set(repos) == {1, 2, 4}
+        assert repos[1] == unchanged.pk
+        assert repos[2] == renamed.pk
+        assert user.repositories.get(repo_id=2).repo_url == "https://example.com/2"
+        assert user.repositories_synced_at is not None
+        assert not user.currently_fetching_repos
+
+    def test_queue_refresh_repositories(self, settings, user_factory):
+        settings.GITHUB_REPOSITORY_SYNC_MINUTES = 60
+        user = user_factory(repositories_synced_at=now() - timedelta(minutes=5))
+        with patch(
+            "metecho.api.jobs.refresh_github_repositories_for_user_job"
+        ) as refresh_job:
+            user.queue_refresh_repositories()
+            assert not refresh_job.delay.called
+
+            user.queue_refresh_repositories(force=True)
+            assert refresh_job.delay.called
+            assert user.currently_fetching_repos
+
+            refresh_job.reset_mock()
+            user.queue_refresh_repositories(force=True)
+            assert not refresh_job.delay.called
+
+    def test_queue_refresh_repositories__stale(self, settings, user_factory):
+        settings.GITHUB_REPOSITORY_SYNC_MINUTES = 60
+        user = user_factory(repositories_synced_at=now() - timedelta(hours=2))
+        with patch(
+            "metecho.api.jobs.refresh_github_repositories_for_user_job"
+        ) as refresh_job:
+            user.queue_refresh_repositories()
+            assert refresh_job.delay.called
+
     def test_refresh_repositories__error(self, user_factory):
         user = user_factory()
         with ExitStack() as stack:
@@ -453,6 +836,7 @@ class TestUser:
         assert user.org_id is not None
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.org_id is None
 
     def test_org_name(self, user_factory, social_account_factory):
@@ -461,6 +845,7 @@ class TestUser:
         assert user.org_name == "Sample Org"
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.org_name is None
 
     def test_org_name__global_devhub(
@@ -477,6 +862,7 @@ class TestUser:
         assert user.org_type == "Developer Edition"
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.org_type is None
 
     def test_org_type__global_devhub(
@@ -496,6 +882,7 @@ class TestUser:
         )
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.salesforce_account is None
 
     def test_salesforce_account(self, user_factory, social_account_factory):
@@ -508,11 +895,13 @@ class TestUser:
         )
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.salesforce_account is None
 
     def test_avatar_url(self, user_factory, social_account_factory):
         user = user_factory()
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert not user.avatar_url
 
         social_account_factory(
@@ -520,6 +909,7 @@ class TestUser:
             provider="github",
             extra_data={"avatar_url": "https://example.com/avatar/"},
         )
+        user.refresh_from_db()
         assert user.avatar_url == "https://example.com/avatar/"
 
     def test_sf_username(self, user_factory, social_account_factory):
@@ -549,6 +939,7 @@ class TestUser:
         assert user.instance_url == "https://example.com"
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.instance_url is None
 
     def test_sf_token(self, user_factory, social_account_factory):
@@ -557,6 +948,7 @@ class TestUser:
         assert user.sf_token == ("0123456789abcdef", "secret.0123456789abcdef")
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.sf_token == (None, None)
 
     def test_sf_token__invalid(
@@ -570,6 +962,7 @@ class TestUser:
         assert user.sf_token == (None, None)
 
         user.socialaccount_set.all().delete()
+        user.refresh_from_db()
         assert user.sf_token == (None, None)
 
     def test_valid_token_for(self, user_factory, social_account_factory):
@@ -580,8 +973,56 @@ class TestUser:
         user.socialaccount_set.filter(
             provider="salesforce"
         ).first().socialtoken_set.all().delete()
+        user.refresh_from_db()
         assert user.valid_token_for is None
 
+    def test_sf_token__memoized(self, user_factory, social_account_factory):
+        user = user_factory()
+        social_account_factory(user=user, provider="salesforce")
+        with patch("metecho.api.models.fernet_decrypt") as fernet_decrypt:
+            fernet_decrypt.return_value = "decrypted"
+            assert user.sf_token[0] == "decrypted"
+            assert user.sf_token[0] == "decrypted"
+            assert fernet_decrypt.call_count == 1
+
+            user.invalidate_salesforce_credentials()
+            assert user.sf_token == (None, None)
+            assert "sf_token" not in pickle.loads(pickle.dumps(user)).__dict__
+
+    def test_pickle__no_tokens(self, user_factory, social_account_factory):
+        social_account_factory(user=user_factory(), provider="salesforce")
+        user = User.objects.with_social_accounts().get()
+        assert user.gh_token
+        assert all(user.sf_token)
+
+        state = pickle.loads(pickle.dumps(user)).__dict__
+        assert "socialaccount_set" not in state.get("_prefetched_objects_cache", {})
+        assert "_social_accounts" not in state
+        assert "sf_token" not in state
+        # Neither the stored nor the decrypted tokens are reachable:
+        secrets = {user.gh_token, *user.sf_token}
+        for token in user.socialaccount_set.values_list(
+            "socialtoken__token", "socialtoken__token_secret"
+        ):
+            secrets.update(token)
+        pickled = pickle.dumps(state)
+        for secret in filter(None, secrets):
+            assert secret.encode() not in pickled
+
+    def test_with_social_accounts(
+        self, django_assert_num_queries, user_factory, social_account_factory
+    ):
+        for _ in range(3):
+            social_account_factory(user=user_factory(), provider="salesforce")
+
+        with django_assert_num_queries(3):
+            users = list(User.objects.with_social_accounts())
+            for user in users:
+                assert user.github_account is not None
+                assert user.salesforce_account is not None
+                assert user.gh_token
+                assert all(user.sf_token)
+
     def test_valid_token_for__use_global_devhub(
         self, settings, user_factory, social_account_factory
     ):
@@ -764,6 +1205,79 @@ class TestUser:
             assert not user.is_devhub_enabled
 
 
+@pytest.mark.django_db
+class TestDevhubEnabledCache:
+    @pytest.fixture
+    def user(self, settings, user_factory, social_account_factory):
+        settings.DEVHUB_ENABLED_CACHE_TIMEOUT = 600
+        settings.DEVHUB_ENABLED_REVALIDATE_AFTER = 60
+        user = user_factory()
+        social_account_factory(user=user, provider="salesforce")
+        return user
+
+    def test_cold(self, user):
+        with ExitStack() as stack:
+            cache = stack.enter_context(patch("metecho.api.models.cache"))
+            cache.get.return_value = None
+            get_devhub_api = stack.enter_context(
+                patch("metecho.api.models.get_devhub_api")
+            )
+            get_devhub_api.return_value.restful.return_value = {"foo": "bar"}
+
+            assert user.is_devhub_enabled
+            assert cache.set.call_args[0][1]["enabled"]
+
+    def test_fresh(self, user):
+        with ExitStack() as stack:
+            cache = stack.enter_context(patch("metecho.api.models.cache"))
+            cache.get.return_value = {"enabled": True, "checked_at": time.time()}
+            get_devhub_api = stack.enter_context(
+                patch("metecho.api.models.get_devhub_api")
+            )
+            job = stack.enter_context(
+                patch("metecho.api.jobs.check_devhub_enabled_job")
+            )
+
+            assert user.is_devhub_enabled
+            assert not get_devhub_api.called
+            assert not job.delay.called
+
+    def test_stale(self, user):
+        with ExitStack() as stack:
+            cache = stack.enter_context(patch("metecho.api.models.cache"))
+            cache.get.return_value = {"enabled": True, "checked_at": 0}
+            cache.add.return_value = True
+            get_devhub_api = stack.enter_context(
+                patch("metecho.api.models.get_devhub_api")
+            )
+            job = stack.enter_context(
+                patch("metecho.api.jobs.check_devhub_enabled_job")
+            )
+
+            assert user.is_devhub_enabled
+            assert not get_devhub_api.called
+            job.delay.assert_called_once_with(user)
+
+    def test_error__not_trusted(self, user):
+        with ExitStack() as stack:
+            cache = stack.enter_context(patch("metecho.api.models.cache"))
+            get_devhub_api = stack.enter_context(
+                patch("metecho.api.models.get_devhub_api")
+            )
+            get_devhub_api.side_effect = HTTPError
+
+            assert not user.check_devhub_enabled()
+            assert cache.set.call_args[0][1] == {"enabled": False, "checked_at": 0}
+
+    def test_invalidate_salesforce_credentials(self, user):
+        with patch("metecho.api.models.cache") as cache:
+            key = user._devhub_enabled_key()
+            user.invalidate_salesforce_credentials()
+
+            cache.delete.assert_called_once_with(key)
+            assert user.salesforce_account is None
+
+
 @pytest.mark.django_db
 class TestScratchOrg:
     def test_notify_changed(self, scratch_org_factory):
@@ -782,6 +1296,65 @@ class TestScratchOrg:
 
             assert async_to_sync.called
 
+    def test_notify_flow_progress(self, scratch_org_factory):
+        with ExitStack() as stack:
+            stack.enter_context(
+                patch(
+                    "metecho.api.jobs."
+                    "create_branches_on_github_then_create_scratch_org_job"
+                )
+            )
+            async_to_sync = stack.enter_context(
+                patch("metecho.api.model_mixins.async_to_sync")
+            )
+            scratch_org = scratch_org_factory()
+            scratch_org.notify_flow_progress(["Running task: deploy"])
+
+            async_to_sync.return_value.assert_called_once_with(
+                scratch_org,
+                {
+                    "type": "SCRATCH_ORG_FLOW_PROGRESS",
+                    "payload": {
+                        "originating_user_id": None,
+                        "lines": ["Running task: deploy"],
+                    },
+                },
+                for_list=False,
+            )
+
+    def test_change_totals(self, scratch_org_factory):
+        with patch(
+            "metecho.api.jobs.create_branches_on_github_then_create_scratch_org_job"
+        ):
+            scratch_org = scratch_org_factory(
+                unsaved_changes={"ApexClass": ["Foo", "Bar"], "CustomObject": ["Baz"]},
+                ignored_changes={"ApexClass": ["Qux"]},
+            )
+
+        assert scratch_org.total_unsaved_changes == 3
+        assert scratch_org.total_ignored_changes == 1
+
+    def test_for_serialization(self, scratch_org_factory):
+        with patch(
+            "metecho.api.jobs.create_branches_on_github_then_create_scratch_org_job"
+        ):
+            scratch_org = scratch_org_factory(
+                config={"org_id": "00D"},
+                latest_revision_numbers={"ApexClass": {"Foo": 1}},
+                unsaved_changes={"ApexClass": ["Foo"]},
+            )
+
+        light = ScratchOrg.objects.for_serialization().get(pk=scratch_org.pk)
+        assert {"config", "latest_revision_numbers"} <= (light.get_deferred_fields())
+        light.has_been_visited = True
+        light.save()
+
+        scratch_org.refresh_from_db()
+        assert scratch_org.has_been_visited
+        assert scratch_org.config == {"org_id": "00D"}
+        assert scratch_org.latest_revision_numbers == {"ApexClass": {"Foo": 1}}
+        assert scratch_org.total_unsaved_changes == 1
+
     def test_queue_delete(self, scratch_org_factory):
         with ExitStack() as stack:
             delete_scratch_org_job = stack.enter_context(
@@ -0,0 +1,105 @@
+from unittest.mock import call, patch
+
+import pytest
+from django.test import override_settings
+
+from ..org_logs import (
+    FlowOutput,
+    LogWriter,
+    UnsatisfiableRange,
+    get_log_size,
+    iter_log,
+    parse_range,
+)
+
+LOG = b"".join(f"line {i}\n".encode() for i in range(100))
+
+
+def write_lines(log, data):
+    for line in data.splitlines(keepends=True):
+        log.write(line)
+
+
+@pytest.mark.django_db
+@override_settings(SCRATCH_ORG_LOG_MAX_BYTES=400, SCRATCH_ORG_LOG_CHUNK_BYTES=64)
+class TestLogWriter:
+    def test_keeps_tail(self, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+
+        with LogWriter(scratch_org) as log:
+            write_lines(log, LOG)
+
+        size = get_log_size(scratch_org)
+        assert 400 - 64 < size <= 400
+        assert scratch_org.log_chunks.first().offset == 0
+        assert b"".join(iter_log(scratch_org)) == LOG[-size:]
+
+    def test_stores_as_it_goes(self, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+
+        with LogWriter(scratch_org) as log:
+            log.write(LOG[:100])
+            assert b"".join(iter_log(scratch_org)) == LOG[:64]
+
+        assert b"".join(iter_log(scratch_org)) == LOG[:100]
+
+    def test_replaces_previous_log(self, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+        with LogWriter(scratch_org) as log:
+            write_lines(log, LOG)
+
+        with LogWriter(scratch_org) as log:
+            log.write(b"short\n")
+
+        assert scratch_org.log_chunks.count() == 1
+        assert b"".join(iter_log(scratch_org)) == b"short\n"
+
+    def test_iter_range(self, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+        with LogWriter(scratch_org) as log:
+            log.write(LOG[-400:])
+
+        tail = LOG[-400:]
+        assert b"".join(iter_log(scratch_org, 60, 130)) == tail[60:131]
+        assert b"".join(iter_log(scratch_org, 64, 127)) == tail[64:128]
+        assert b"".join(iter_log(scratch_org, 390)) == tail[390:]
+
+
+@pytest.mark.django_db
+@override_settings(SCRATCH_ORG_PROGRESS_INTERVAL=60, SCRATCH_ORG_PROGRESS_LINES=2)
+class TestFlowOutput:
+    def test_throttles_progress(self, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+        with patch.object(scratch_org, "notify_flow_progress") as notify:
+            with FlowOutput(scratch_org) as output:
+                write_lines(output, b"first\n\nsecond\nthird\nfourth\n")
+
+        assert notify.call_args_list == [
+            call(["first"]),
+            call(["third", "fourth"]),
+        ]
+        assert b"".join(iter_log(scratch_org)) == (b"first\n\nsecond\nthird\nfourth\n")
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    (
+        (None, None),
+        ("", None),
+        ("bytes=-", None),
+        ("items=0-10", None),
+        ("bytes=0-9", (0, 9)),
+        ("bytes=90-", (90, 99)),
+        ("bytes=90-200", (90, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=-200", (0, 99)),
+    ),
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ("bytes=100-", "bytes=10-5", "bytes=-0"))
+def test_parse_range__unsatisfiable(header):
+    with pytest.raises(UnsatisfiableRange):
+        parse_range(header, 100)
@@ -3,7 +3,12 @@ from unittest.mock import MagicMock, patch
 import pytest
 from channels.db import database_sync_to_async
 
-from ..push import report_error, report_scratch_org_error
+from ..push import (
+    buffer_notification,
+    buffered_notifications,
+    report_error,
+    report_scratch_org_error,
+)
 
 
 class AsyncMock(MagicMock):
@@ -62,3 +67,23 @@ async def test_report_scratch_org_error__dict():
             originating_user_id=None,
         )
         assert push_message_about_instance.called
+
+
+@pytest.mark.django_db
+def test_buffered_notifications(django_capture_on_commit_callbacks):
+    calls = []
+    sends = {
+        name: MagicMock(side_effect=lambda name=name: calls.append(name))
+        for name in ("a1", "b", "a2", "error", "c")
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        with buffered_notifications():
+            assert buffer_notification("a", sends["a1"])
+            assert buffer_notification("b", sends["b"])
+            with buffered_notifications():
+                assert buffer_notification("a", sends["a2"])
+                assert buffer_notification(None, sends["error"])
+        assert calls == []
+
+    assert calls == ["a2", "b", "error"]
+    assert not buffer_notification("c", sends["c"])
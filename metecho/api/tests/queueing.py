@@ -0,0 +1,119 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from ..queueing import get_queue_name, release_dedup_key, routed_job
+
+PATCH_ROOT = "metecho.api.queueing"
+
+
+def refresh(thing, *, force=False):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def job_classes(settings):
+    settings.RQ_JOB_CLASSES = {"interactive": {}, "bulk": {}}
+    settings.RQ_JOB_CLASS_QUEUES = {
+        "interactive": ["interactive"],
+        "bulk": ["bulk-0", "bulk-1", "bulk-2"],
+    }
+
+
+@pytest.fixture
+def get_queue():
+    with patch(f"{PATCH_ROOT}.get_queue") as get_queue:
+        yield get_queue
+
+
+@pytest.fixture
+def queue(get_queue):
+    return get_queue.return_value
+
+
+def test_get_queue_name():
+    assert get_queue_name("interactive") == "interactive"
+    assert get_queue_name("interactive", "1") == "interactive"
+    assert get_queue_name("bulk", "1") == get_queue_name("bulk", 1)
+    assert {get_queue_name("bulk", shard) for shard in range(30)} == {
+        "bulk-0",
+        "bulk-1",
+        "bulk-2",
+    }
+
+
+class TestRoutedJob:
+    def test_unknown_job_class(self):
+        with pytest.raises(ValueError):
+            routed_job(refresh, job_class="urgent")
+
+    def test_routes(self, get_queue, queue):
+        job = routed_job(refresh, job_class="interactive")
+        thing = MagicMock(id=1)
+
+        job.delay(thing, force=True)
+
+        get_queue.assert_called_once_with("interactive")
+        queue.enqueue_call.assert_called_once_with(
+            refresh, args=(thing,), kwargs={"force": True}
+        )
+
+    def test_shards(self, get_queue, queue):
+        job = routed_job(refresh, job_class="bulk", shard_by="{thing.id}")
+
+        for _ in range(2):
+            job.delay(MagicMock(id=7))
+            job.delay(thing=MagicMock(id=7))
+
+        assert {call[0] for call in get_queue.call_args_list} == {
+            (get_queue_name("bulk", 7),)
+        }
+
+
+class TestDedupKey:
+    @pytest.fixture(autouse=True)
+    def cache(self, settings):
+        settings.JOB_DEDUP_TIMEOUT = 60
+        cache = LocMemCache("dedup", {})
+        with patch(f"{PATCH_ROOT}.cache", cache):
+            yield cache
+        cache.clear()
+
+    def test_drops_duplicates(self, queue):
+        job = routed_job(refresh, job_class="bulk", dedup_key="refresh:{thing.id}")
+
+        assert job.delay(MagicMock(id=1)) is not None
+        assert job.delay(MagicMock(id=1), force=True) is None
+        assert job.delay(MagicMock(id=2)) is not None
+
+        assert queue.enqueue_call.call_count == 2
+        assert queue.enqueue_call.call_args[1]["meta"] == {
+            "dedup_key": "job-dedup:refresh:2"
+        }
+
+    def test_release(self, queue):
+        job = routed_job(refresh, job_class="bulk", dedup_key="refresh:{thing.id}")
+        job.delay(MagicMock(id=1))
+
+        release_dedup_key(MagicMock(meta=queue.enqueue_call.call_args[1]["meta"]))
+
+        assert job.delay(MagicMock(id=1)) is not None
+        assert queue.enqueue_call.call_count == 2
+
+    def test_enqueue_fails(self, queue):
+        job = routed_job(refresh, job_class="bulk", dedup_key="refresh:{thing.id}")
+        queue.enqueue_call.side_effect = ConnectionError
+
+        with pytest.raises(ConnectionError):
+            job.delay(MagicMock(id=1))
+        queue.enqueue_call.side_effect = None
+
+        assert job.delay(MagicMock(id=1)) is not None
+
+    def test_release__not_deduplicated(self, cache):
+        cache.set("job-dedup:refresh:1", True)
+
+        release_dedup_key(MagicMock(meta={}))
+
+        assert cache.get("job-dedup:refresh:1")
@@ -4,10 +4,15 @@ to change substantially, and as it stands, it's full of implicit
 external calls, so this would be mock-heavy anyway.
 """
 
+import importlib
+import logging
+import os
 from contextlib import ExitStack
 from unittest.mock import MagicMock, patch
 
 import pytest
+from cumulusci.core.config import BaseProjectConfig, OrgConfig, UniversalConfig
+from cumulusci.core.tasks import BaseTask
 from requests.exceptions import HTTPError
 
 from ..sf_run_flow import (
@@ -24,10 +29,13 @@ from ..sf_run_flow import (
     mutate_scratch_org,
     refresh_access_token,
     run_flow,
+    run_flow_in_process,
 )
 
 PATCH_ROOT = "metecho.api.sf_run_flow"
 
+OrgConfigModule = importlib.import_module("cumulusci.core.config.OrgConfig")
+
 
 @pytest.mark.django_db
 def test_is_org_good(scratch_org_factory):
@@ -220,8 +228,10 @@ class TestRunFlow:
         with ExitStack() as stack:
             stack.enter_context(patch(f"{PATCH_ROOT}.os"))
             subprocess = stack.enter_context(patch(f"{PATCH_ROOT}.subprocess"))
-            Popen = MagicMock()
-            Popen.communicate.return_value = (MagicMock(), MagicMock())
+            Popen = MagicMock(
+                stdout=[b"Running flow\n", b"Error: Bad things\n", b"Run cci error\n"],
+                returncode=1,
+            )
             subprocess.Popen.return_value = Popen
             stack.enter_context(patch(f"{PATCH_ROOT}.BaseCumulusCI"))
             stack.enter_context(patch(f"{PATCH_ROOT}.get_devhub_api"))
@@ -245,7 +255,7 @@ class TestRunFlow:
                 org_name="dev",
                 originating_user_id=None,
             )
-            with pytest.raises(Exception):
+            with pytest.raises(Exception, match="^Bad things$"):
                 run_flow(
                     cci=MagicMock(),
                     org_config=org_config,
@@ -254,6 +264,202 @@ class TestRunFlow:
                     user=user,
                 )
 
+    def test_run_flow__streams_output(self, user_factory):
+        output = []
+        with ExitStack() as stack:
+            stack.enter_context(patch(f"{PATCH_ROOT}.os"))
+            subprocess = stack.enter_context(patch(f"{PATCH_ROOT}.subprocess"))
+            subprocess.Popen.return_value = MagicMock(
+                stdout=[b"Running flow\n", b"Done\n"], returncode=0
+            )
+
+            run_flow(
+                cci=MagicMock(),
+                org_config=MagicMock(),
+                flow_name="dev_org",
+                project_path="/tmp",
+                user=user_factory(),
+                output=output.append,
+            )
+
+        assert output == [b"Running flow\n", b"Done\n"]
+
+    def test_run_flow__in_process(self, settings, user_factory):
+        settings.RUN_FLOWS_IN_PROCESS = True
+        user = user_factory()
+        with ExitStack() as stack:
+            run_flow_in_process = stack.enter_context(
+                patch(f"{PATCH_ROOT}.run_flow_in_process")
+            )
+            subprocess = stack.enter_context(patch(f"{PATCH_ROOT}.subprocess"))
+
+            run_flow(
+                cci=MagicMock(),
+                org_config=MagicMock(),
+                flow_name="dev_org",
+                project_path="/tmp",
+                user=user,
+            )
+
+        assert not subprocess.Popen.called
+        assert run_flow_in_process.call_args[1]["user"] == user
+
+
+class RecordEnvironment(BaseTask):
+    """Records what a task sees of the process it runs in"""
+
+    recorded = None
+
+    def _run_task(self):
+        github = self.project_config.keychain.get_service("github")
+        RecordEnvironment.recorded = {
+            "cwd": os.getcwd(),
+            "environ": dict(os.environ),
+            "token": github.token,
+        }
+        self.logger.info("Recorded environment")
+
+
+class TestRunFlowInProcess:
+    def run(self, tmp_path, coordinator_run):
+        output = []
+        with ExitStack() as stack:
+            FlowCoordinator = stack.enter_context(
+                patch(f"{PATCH_ROOT}.FlowCoordinator")
+            )
+            FlowCoordinator.return_value.run.side_effect = coordinator_run
+
+            run_flow_in_process(
+                cci=MagicMock(),
+                org_config=MagicMock(),
+                flow_name="dev_org",
+                project_path=str(tmp_path),
+                user=MagicMock(gh_token="token"),
+                output=output.append,
+            )
+        return output
+
+    def test_real_flow(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("DATABASE_URL", "postgres://localhost/metecho")
+        monkeypatch.setenv("GITHUB_APP_ID", "123")
+        monkeypatch.setenv("GITHUB_APP_KEY", "app-key")
+        environ = dict(os.environ)
+        cwd = os.getcwd()
+        universal_config = UniversalConfig()
+        project_config = BaseProjectConfig(
+            universal_config,
+            {
+                "services": universal_config.services,
+                "tasks": {
+                    "record_environment": {
+                        "class_path": f"{__name__}.RecordEnvironment"
+                    }
+                },
+                "flows": {"trivial": {"steps": {1: {"task": "record_environment"}}}},
+            },
+        )
+        org_config = OrgConfig(
+            {
+                "instance_url": "https://example.my.salesforce.com",
+                "access_token": "access-token",
+            },
+            "dev",
+        )
+        output = []
+        with ExitStack() as stack:
+            _refresh_token = stack.enter_context(
+                patch.object(OrgConfig, "_refresh_token")
+            )
+            # These would reach Salesforce with the access token, as cci
+            # does with refresh disabled:
+            stack.enter_context(patch.object(OrgConfig, "_load_userinfo"))
+            stack.enter_context(patch.object(OrgConfig, "_load_orginfo"))
+            info = stack.enter_context(patch(f"{PATCH_ROOT}.logger.info"))
+
+            run_flow_in_process(
+                cci=MagicMock(project_config=project_config),
+                org_config=org_config,
+                flow_name="trivial",
+                project_path=str(tmp_path),
+                user=MagicMock(
+                    username="user", email="user@example.com", gh_token="token"
+                ),
+                output=output.append,
+            )
+
+        assert not _refresh_token.called
+        assert b"Recorded environment\n" in output
+        (step,) = info.call_args[1]["extra"]["context"]["steps"]
+        assert step["task"] == "record_environment"
+        # The task ran in the project, with the user's token, and only the
+        # app's GitHub credentials hidden from its environment:
+        task_environ = {**environ, "HOME": str(tmp_path)}
+        del task_environ["GITHUB_APP_ID"], task_environ["GITHUB_APP_KEY"]
+        task_environ.pop("GITHUB_TOKEN", None)
+        assert RecordEnvironment.recorded == {
+            "cwd": str(tmp_path),
+            "environ": task_environ,
+            "token": "token",
+        }
+        assert dict(os.environ) == environ
+        assert os.getcwd() == cwd
+
+    def test_isolated(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("DATABASE_URL", "postgres://localhost/metecho")
+        monkeypatch.setenv("GITHUB_APP_ID", "123")
+        environ = dict(os.environ)
+        cwd = os.getcwd()
+        skip_refresh = OrgConfigModule.SKIP_REFRESH
+
+        def coordinator_run(org_config):
+            assert os.environ["DATABASE_URL"] == "postgres://localhost/metecho"
+            assert os.environ["HOME"] == str(tmp_path)
+            assert "GITHUB_APP_ID" not in os.environ
+            assert os.getcwd() == str(tmp_path)
+            assert OrgConfigModule.SKIP_REFRESH
+            logging.getLogger("cumulusci.core.flowrunner").info("Running task")
+
+        output = self.run(tmp_path, coordinator_run)
+
+        assert output == [b"Running task\n"]
+        assert dict(os.environ) == environ
+        assert os.getcwd() == cwd
+        assert OrgConfigModule.SKIP_REFRESH == skip_refresh
+
+    def test_error(self, tmp_path):
+        def coordinator_run(org_config):
+            raise Exception("Bad things")
+
+        with pytest.raises(Exception, match="^Bad things$"):
+            self.run(tmp_path, coordinator_run)
+
+    def test_step_timings(self, tmp_path):
+        def coordinator_run(org_config):
+            callbacks = FlowCoordinator.call_args[1]["callbacks"]
+            step = MagicMock(step_num="1", task_name="deploy")
+            callbacks.pre_task(step)
+            callbacks.post_task(step, MagicMock())
+
+        with ExitStack() as stack:
+            FlowCoordinator = stack.enter_context(
+                patch(f"{PATCH_ROOT}.FlowCoordinator")
+            )
+            FlowCoordinator.return_value.run.side_effect = coordinator_run
+            info = stack.enter_context(patch(f"{PATCH_ROOT}.logger.info"))
+
+            run_flow_in_process(
+                cci=MagicMock(),
+                org_config=MagicMock(),
+                flow_name="dev_org",
+                project_path=str(tmp_path),
+                user=MagicMock(gh_token="token"),
+                output=None,
+            )
+
+        (step,) = info.call_args[1]["extra"]["context"]["steps"]
+        assert step["step"] == "1"
+        assert step["task"] == "deploy"
+
 
 @pytest.mark.django_db
 def test_delete_org(scratch_org_factory):
@@ -4,10 +4,13 @@ from contextlib import ExitStack
 from unittest.mock import MagicMock, patch
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from github3.exceptions import ResponseError
 
 from ..models import SCRATCH_ORG_TYPES
+from ..org_logs import store_log
 
 Branch = namedtuple("Branch", ["name"])
 
@@ -193,7 +196,18 @@ class TestHookView:
                     "compare_commits.return_value": MagicMock(ahead_by=0),
                 }
             )
-            gh.normalize_commit.return_value = "1234abcd"
+            gh.normalize_commit.return_value = {
+                "id": "123",
+                "timestamp": "2019-11-20 21:32:53.668260+00:00",
+                "author": {
+                    "name": "Test",
+                    "email": "test@example.com",
+                    "username": "test123",
+                    "avatar_url": "https://avatar_url/",
+                },
+                "message": "Message",
+                "url": "https://github.com/test/user/foo",
+            }
 
             project = project_factory(repo_id=123)
             git_hub_repository_factory(repo_id=123)
@@ -237,8 +251,7 @@ class TestHookView:
             )
             assert response.status_code == 202, response.content
             assert not refresh_commits_job.delay.called
-            task.refresh_from_db()
-            assert len(task.commits) == 1
+            assert task.commits.count() == 1
 
     def test_400__no_handler(
         self,
@@ -598,6 +611,34 @@ class TestScratchOrgView:
             assert response.status_code == 403
             assert not refresh_scratch_org_job.delay.called
 
+    def test_log(self, client, scratch_org_factory, tmp_path):
+        scratch_org = scratch_org_factory(owner=client.user)
+        path = tmp_path / "cci.log"
+        path.write_bytes(b"0123456789")
+        store_log(scratch_org, path)
+        url = reverse("scratch-org-log", kwargs={"pk": str(scratch_org.id)})
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response["Accept-Ranges"] == "bytes"
+        assert b"".join(response.streaming_content) == b"0123456789"
+
+        response = client.get(url, HTTP_RANGE="bytes=2-4")
+        assert response.status_code == 206
+        assert response["Content-Range"] == "bytes 2-4/10"
+        assert b"".join(response.streaming_content) == b"234"
+
+        response = client.get(url, HTTP_RANGE="bytes=20-")
+        assert response.status_code == 416
+        assert response["Content-Range"] == "bytes */10"
+
+    def test_log__bad(self, client, scratch_org_factory):
+        scratch_org = scratch_org_factory()
+        url = reverse("scratch-org-log", kwargs={"pk": str(scratch_org.id)})
+        response = client.get(url)
+
+        assert response.status_code == 403
+
 
 @pytest.mark.django_db
 class TestTaskView:
@@ -734,6 +775,58 @@ class TestTaskView:
 
         assert response.status_code == 400
 
+    def test_commits(self, client, task_factory, commit_factory):
+        task = task_factory()
+        for i in range(3):
+            commit_factory(task=task, sha=f"sha{i}")
+
+        response = client.get(reverse("task-commits", kwargs={"pk": str(task.id)}))
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 3
+        assert [commit["id"] for commit in data["results"]] == ["sha2", "sha1", "sha0"]
+
+    def test_retrieve__recent_commits(
+        self, settings, client, task_factory, commit_factory
+    ):
+        settings.TASK_RECENT_COMMITS = 2
+        task = task_factory()
+        for i in range(3):
+            commit_factory(task=task, sha=f"sha{i}")
+
+        response = client.get(reverse("task-detail", kwargs={"pk": str(task.id)}))
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [commit["id"] for commit in data["commits"]] == ["sha2", "sha1"]
+        assert data["commits_count"] == 3
+
+    def test_list__recent_commits(self, settings, client, task_factory, commit_factory):
+        settings.TASK_RECENT_COMMITS = 2
+        tasks = [task_factory() for _ in range(3)]
+        for task in tasks:
+            for i in range(3):
+                commit_factory(task=task, sha=f"{task.id}-{i}")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse("task-list"))
+
+        assert response.status_code == 200
+        # The commits are prefetched for all tasks at once:
+        commit_queries = [
+            query
+            for query in queries.captured_queries
+            if 'FROM "api_commit"' in query["sql"]
+        ]
+        assert len(commit_queries) == 1
+        for data in response.json():
+            assert [commit["id"] for commit in data["commits"]] == [
+                f"{data['id']}-2",
+                f"{data['id']}-1",
+            ]
+            assert data["commits_count"] == 3
+
 
 @pytest.mark.django_db
 class TestEpicView:
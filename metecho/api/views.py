@@ -1,7 +1,7 @@
 from allauth.socialaccount.models import SocialAccount
 from django.contrib.auth import get_user_model
 from django.db.models import Case, IntegerField, When
-from django.http import HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
@@ -23,7 +23,9 @@ from .hook_serializers import (
     PushHookSerializer,
 )
 from .models import EPIC_STATUSES, SCRATCH_ORG_TYPES, Epic, Project, ScratchOrg, Task
+from .org_logs import UnsatisfiableRange, get_log_size, iter_log, parse_range
 from .paginators import CustomPaginator
+from .push import buffered_notifications
 from .serializers import (
     CanReassignSerializer,
     CommitSerializer,
@@ -34,6 +36,7 @@ from .serializers import (
     ProjectSerializer,
     ReviewSerializer,
     ScratchOrgSerializer,
+    TaskCommitSerializer,
     TaskSerializer,
 )
 
@@ -62,7 +65,7 @@ class CreatePrMixin:
         instance.queue_create_pr(
             request.user,
             **serializer.validated_data,
-            originating_user_id=str(request.user.id)
+            originating_user_id=str(request.user.id),
         )
         return Response(
             self.get_serializer(instance).data, status=status.HTTP_202_ACCEPTED
@@ -86,7 +89,8 @@ class HookView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer.process_hook()
+        with buffered_notifications():
+            serializer.process_hook()
         return Response(status=status.HTTP_202_ACCEPTED)
 
 
@@ -118,7 +122,7 @@ class UserRefreshView(CurrentUserObjectMixin, APIView):
 
     def post(self, request):
         user = self.get_object()
-        user.queue_refresh_repositories()
+        user.queue_refresh_repositories(force=True)
         return Response(status=status.HTTP_202_ACCEPTED)
 
 
@@ -137,7 +141,7 @@ class UserViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewS
     permission_classes = (IsAuthenticated,)
     serializer_class = MinimalUserSerializer
     pagination_class = CustomPaginator
-    queryset = User.objects.all()
+    queryset = User.objects.with_social_accounts()
 
 
 class ProjectViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, GenericViewSet):
@@ -219,7 +223,7 @@ class EpicViewSet(CreatePrMixin, ModelViewSet):
 class TaskViewSet(CreatePrMixin, ModelViewSet):
     permission_classes = (IsAuthenticated,)
     serializer_class = TaskSerializer
-    queryset = Task.objects.active()
+    queryset = Task.objects.active().for_serialization()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TaskFilter
     error_pr_exists = _("Task has already been submitted for testing.")
@@ -244,6 +248,16 @@ class TaskViewSet(CreatePrMixin, ModelViewSet):
         )
         return Response(self.get_serializer(task).data, status=status.HTTP_202_ACCEPTED)
 
+    @action(detail=True, methods=["GET"])
+    def commits(self, request, pk=None):
+        task = self.get_object()
+        paginator = CustomPaginator()
+        page = paginator.paginate_queryset(
+            task.commits.select_related("author"), request, view=self
+        )
+        serializer = TaskCommitSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=["POST"])
     def can_reassign(self, request, pk=None):
         serializer = CanReassignSerializer(data=request.data)
@@ -263,7 +277,7 @@ class TaskViewSet(CreatePrMixin, ModelViewSet):
             None,
         )
         valid_commit = org and org.latest_commit == (
-            task.commits[0] if task.commits else task.origin_sha
+            task.latest_commit_sha or task.origin_sha
         )
         return Response(
             {
@@ -287,7 +301,7 @@ class ScratchOrgViewSet(
 ):
     permission_classes = (IsAuthenticated,)
     serializer_class = ScratchOrgSerializer
-    queryset = ScratchOrg.objects.active()
+    queryset = ScratchOrg.objects.active().for_serialization()
     filter_backends = (DjangoFilterBackend,)
     filterset_class = ScratchOrgFilter
 
@@ -421,3 +435,31 @@ class ScratchOrgViewSet(
         return Response(
             self.get_serializer(scratch_org).data, status=status.HTTP_202_ACCEPTED
         )
+
+    @action(detail=True, methods=["GET"])
+    def log(self, request, pk=None):
+        scratch_org = self.get_object()
+        if not request.user == scratch_org.owner:
+            return Response(
+                {"error": _("Requesting user did not create scratch org.")},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        size = get_log_size(scratch_org)
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except UnsatisfiableRange:
+            response = HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        start, end = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(
+            iter_log(scratch_org, start, end), content_type="text/plain"
+        )
+        if byte_range:
+            response.status_code = status.HTTP_206_PARTIAL_CONTENT
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+        response["Accept-Ranges"] = "bytes"
+        return response
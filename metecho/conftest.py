@@ -1,12 +1,23 @@
+from contextlib import contextmanager
+
 import factory
 import pytest
 from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
 from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections
 from pytest_factoryboy import register
 from rest_framework.test import APIClient
 from sfdo_template_helpers.crypto import fernet_encrypt
 
-from .api.models import Epic, GitHubRepository, Project, ScratchOrg, Task
+from .api.models import (
+    Commit,
+    CommitAuthor,
+    Epic,
+    GitHubRepository,
+    Project,
+    ScratchOrg,
+    Task,
+)
 
 User = get_user_model()
 
@@ -103,6 +114,31 @@ class TaskFactory(factory.django.DjangoModelFactory):
     org_config_name = "dev"
 
 
+@register
+class CommitAuthorFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = CommitAuthor
+        django_get_or_create = ("name", "email", "username", "avatar_url")
+
+    name = factory.Sequence("Author {}".format)
+    email = factory.Sequence("author_{}@example.com".format)
+    username = factory.Sequence("author_{}".format)
+    avatar_url = "https://example.com/avatar.png"
+
+
+@register
+class CommitFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Commit
+
+    task = factory.SubFactory(TaskFactory)
+    sha = factory.Sequence("{:040x}".format)
+    sequence = factory.Sequence(lambda n: n + 1)
+    author = factory.SubFactory(CommitAuthorFactory)
+    message = "Test commit"
+    url = "https://github.com/test/repo/commit/abc123"
+
+
 @register
 class ScratchOrgFactory(factory.django.DjangoModelFactory):
     class Meta:
@@ -121,3 +157,27 @@ def client(user_factory):
     client.force_login(user)
     client.user = user
     return client
+
+
+@contextmanager
+def capture_on_commit_callbacks(*, using=DEFAULT_DB_ALIAS, execute=False):
+    callbacks = []
+    start_count = len(connections[using].run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        # Those of savepoints that rolled back are already gone:
+        callbacks[:] = [
+            func for _sids, func in connections[using].run_on_commit[start_count:]
+        ]
+        if execute:
+            for callback in callbacks:
+                callback()
+
+
+@pytest.fixture
+def django_capture_on_commit_callbacks():
+    # Each test runs inside a transaction that is rolled back, so
+    # on_commit callbacks never run. This is pytest-django's fixture of
+    # the same name, which needs Django 3.2's captureOnCommitCallbacks:
+    return capture_on_commit_callbacks
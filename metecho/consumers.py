@@ -74,7 +74,11 @@ class PushNotificationConsumer(AsyncJsonWebsocketConsumer):
         # XXX: We currently hard-code API as it's our only
         # model-containing app:
         Model = apps.get_model("api", model)
-        return Model.objects.get(pk=id)
+        queryset = Model.objects.all()
+        # Some models can leave out fields their serializers don't use:
+        if hasattr(queryset, "for_serialization"):
+            queryset = queryset.for_serialization()
+        return queryset.get(pk=id)
 
     async def receive_json(self, content, **kwargs):
         # Just used to sub/unsub to notification channels.
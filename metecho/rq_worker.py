@@ -1,6 +1,37 @@
+import gc
+import logging
+import random
+import resource
+import time
+from contextlib import suppress
+from importlib import import_module
+
+from django.conf import settings
 from django.db import DatabaseError, InterfaceError, connections
 from rq.worker import HerokuWorker, Worker
 
+from .api.queueing import release_dedup_key
+
+logger = logging.getLogger("rq.worker")
+
+
+def preload():
+    """
+    Import the modules that jobs need, and build the state they can share,
+    once in the worker rather than in every work horse.
+    """
+    for module in settings.RQ_WORKER_PRELOAD_MODULES:
+        import_module(module)
+    from .api.custom_cci_configs import MetechoUniversalConfig
+
+    # UniversalConfig keeps the parsed CumulusCI config on the class, so
+    # every horse reuses this one instead of parsing its own:
+    MetechoUniversalConfig()
+    # Keep everything allocated so far out of the collector's reach, so
+    # that horses don't copy the pages it's on just by collecting:
+    gc.collect()
+    gc.freeze()
+
 
 class ConnectionClosingWorkerMixin(object):
     """Mixin for rq workers to ensure db connections are closed."""
@@ -16,22 +47,85 @@ class ConnectionClosingWorkerMixin(object):
                 if "closed" not in str_exc and "not connected" not in str_exc:
                     raise
 
-    def perform_job(self, *args, **kwargs):
+    def fork_work_horse(self, job, queue):
+        self.horse_forked_at = time.monotonic()
+        return super().fork_work_horse(job, queue)
+
+    def perform_job(self, job, *args, **kwargs):
+        started_at = getattr(self, "horse_forked_at", None) or time.monotonic()
+        # Changes made after this point are not seen by this run, so an
+        # identical job may be enqueued again as soon as it starts:
+        release_dedup_key(job)
         self.close_database()
         try:
-            return super().perform_job(*args, **kwargs)
+            # Resolve the job's function now, importing its module unless
+            # it was preloaded, so that it counts towards startup. If that
+            # fails, the job fails the same way below:
+            with suppress(Exception):
+                job.func
+            ready_at = time.monotonic()
+            try:
+                return super().perform_job(job, *args, **kwargs)
+            finally:
+                log_job_resources(job, started_at, ready_at)
         finally:
             self.close_database()
 
     def work(self, *args, **kwargs):
+        if settings.RQ_WORKER_PRELOAD:
+            preload()
         self.close_database()
         return super().work(*args, **kwargs)
 
 
+def log_job_resources(job, started_at, ready_at):
+    logger.info(
+        f"Job {job.id} resources",
+        extra={
+            "tag": "rq_worker.job_resources",
+            "context": {
+                "job_id": job.id,
+                "preloaded": settings.RQ_WORKER_PRELOAD,
+                "startup_seconds": round(ready_at - started_at, 3),
+                "run_seconds": round(time.monotonic() - ready_at, 3),
+                # Kilobytes, on Linux:
+                "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            },
+        },
+    )
+
+
+class WeightedQueuesMixin(object):
+    """Mixin for rq workers to drain their queues by weight.
+
+    rq takes the next job from the first non-empty queue in the worker's
+    list. Before each job, this shuffles the list so that each queue's
+    chance of coming first is proportional to its weight in
+    settings.RQ_QUEUE_WEIGHTS, so busy low-weight queues still get a
+    share of the worker, and busy high-weight queues get more of it.
+    """
+
+    def dequeue_job_and_maintain_ttl(self, *args, **kwargs):
+        self.queues = weighted_order(self.queues, settings.RQ_QUEUE_WEIGHTS)
+        return super().dequeue_job_and_maintain_ttl(*args, **kwargs)
+
+
+def weighted_order(queues, weights):
+    def sort_key(queue):
+        weight = weights.get(queue.name, 1)
+        return random.random() ** (1 / weight) if weight > 0 else 0
+
+    return sorted(queues, key=sort_key, reverse=True)
+
+
 class ConnectionClosingWorker(ConnectionClosingWorkerMixin, Worker):
     """Connection-closing worker for non-Heroku environments"""
 
 
+class WeightedWorker(WeightedQueuesMixin, ConnectionClosingWorker):
+    """Connection-closing worker that drains its queues by weight"""
+
+
 class ConnectionClosingHerokuWorker(ConnectionClosingWorkerMixin, HerokuWorker):
     """Connection-closing worker for Heroku
 
@@ -42,3 +136,7 @@ class ConnectionClosingHerokuWorker(ConnectionClosingWorkerMixin, HerokuWorker):
 
     SIGRTMIN is undefined on macOS, so we can't use this worker everywhere.
     """
+
+
+class WeightedHerokuWorker(WeightedQueuesMixin, ConnectionClosingHerokuWorker):
+    """Connection-closing worker for Heroku that drains its queues by weight"""
@@ -4,6 +4,8 @@ import pytest
 from django.db import DatabaseError, InterfaceError
 from django_rq import get_worker
 
+from ..rq_worker import log_job_resources, preload, weighted_order
+
 
 class TestConnectionClosingWorker:
     def test_close_database__good(self, mocker):
@@ -52,13 +54,33 @@ class TestConnectionClosingWorker:
         close_database = mocker.patch(
             "metecho.rq_worker.ConnectionClosingWorker.close_database"
         )
-        mocker.patch("rq.worker.Worker.perform_job")
+        release_dedup_key = mocker.patch("metecho.rq_worker.release_dedup_key")
+        # The key is released before the job's function runs:
+        perform_job = mocker.patch(
+            "rq.worker.Worker.perform_job",
+            side_effect=lambda *args: release_dedup_key.assert_called_once_with(job),
+        )
+        log_job_resources = mocker.patch("metecho.rq_worker.log_job_resources")
+        job = MagicMock()
 
         worker = get_worker()
         # Symbolic call only, since we've mocked out the super:
-        worker.perform_job(None, None)
+        worker.perform_job(job, None)
 
+        assert perform_job.called
         assert close_database.called
+        release_dedup_key.assert_called_once_with(job)
+        assert log_job_resources.called
+
+    def test_log_job_resources(self, mocker):
+        info = mocker.patch("metecho.rq_worker.logger.info")
+
+        log_job_resources(MagicMock(id="123"), 10, 12)
+
+        context = info.call_args[1]["extra"]["context"]
+        assert context["job_id"] == "123"
+        assert context["startup_seconds"] == 2
+        assert context["max_rss"] > 0
 
     def test_work(self, mocker):
         close_database = mocker.patch(
@@ -68,3 +90,55 @@ class TestConnectionClosingWorker:
         worker.work(burst=True)
 
         assert close_database.called
+
+
+class TestWeightedQueuesMixin:
+    def test_weighted_order(self):
+        queues = [MagicMock(name=name) for name in ("low", "high", "off")]
+        for queue, name in zip(queues, ("low", "high", "off")):
+            queue.name = name
+        weights = {"low": 1, "high": 9, "off": 0}
+
+        firsts = [weighted_order(queues, weights)[0].name for _ in range(1000)]
+
+        assert 800 < firsts.count("high") < 980
+        assert "off" not in firsts
+        assert all(
+            weighted_order(queues, weights)[-1].name == "off" for _ in range(100)
+        )
+
+    def test_dequeue_job_and_maintain_ttl(self, mocker, settings):
+        settings.RQ_QUEUE_WEIGHTS = {}
+        dequeue = mocker.patch("rq.worker.Worker.dequeue_job_and_maintain_ttl")
+
+        worker = get_worker("default")
+        worker.dequeue_job_and_maintain_ttl(None)
+
+        dequeue.assert_called_once_with(None)
+
+
+class TestPreload:
+    def test_preload(self, mocker, settings):
+        settings.RQ_WORKER_PRELOAD_MODULES = ["json"]
+        import_module = mocker.patch("metecho.rq_worker.import_module")
+        universal_config = mocker.patch(
+            "metecho.api.custom_cci_configs.MetechoUniversalConfig"
+        )
+        freeze = mocker.patch("gc.freeze")
+
+        preload()
+
+        import_module.assert_called_once_with("json")
+        assert universal_config.called
+        assert freeze.called
+
+    @pytest.mark.parametrize("enabled", (True, False))
+    def test_work(self, mocker, settings, enabled):
+        settings.RQ_WORKER_PRELOAD = enabled
+        preload = mocker.patch("metecho.rq_worker.preload")
+        mocker.patch("metecho.rq_worker.ConnectionClosingWorker.close_database")
+        mocker.patch("rq.worker.Worker.work")
+
+        get_worker().work(burst=True)
+
+        assert preload.called == enabled
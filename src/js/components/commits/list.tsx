@@ -1,14 +1,23 @@
 import Avatar from '@salesforce/design-system-react/components/avatar';
+import Button from '@salesforce/design-system-react/components/button';
 import DataTable from '@salesforce/design-system-react/components/data-table';
 import DataTableCell from '@salesforce/design-system-react/components/data-table/cell';
 import DataTableColumn from '@salesforce/design-system-react/components/data-table/column';
 import classNames from 'classnames';
 import { format, formatDistanceToNow } from 'date-fns';
 import i18n from 'i18next';
-import React, { ReactNode } from 'react';
+import { uniqBy } from 'lodash';
+import React, { ReactNode, useState } from 'react';
+import { useDispatch } from 'react-redux';
 
-import { ExternalLink } from '~js/components/utils';
+import {
+  ExternalLink,
+  LabelWithSpinner,
+  useIsMounted,
+} from '~js/components/utils';
+import { ThunkDispatch } from '~js/store';
 import { Commit } from '~js/store/tasks/reducer';
+import apiFetch from '~js/utils/api';
 
 interface TableCellProps {
   [key: string]: any;
@@ -94,8 +103,54 @@ const TimestampTableCell = ({ item, className, ...props }: TableCellProps) => {
 };
 TimestampTableCell.displayName = DataTableCell.displayName;
 
-const CommitList = ({ commits }: { commits: Commit[] }) =>
-  commits.length ? (
+const CommitList = ({
+  commits,
+  count,
+  taskId,
+}: {
+  commits: Commit[];
+  count?: number;
+  taskId?: string;
+}) => {
+  const [olderCommits, setOlderCommits] = useState<Commit[]>([]);
+  // `undefined` until the first page is fetched, `null` after the last:
+  const [nextUrl, setNextUrl] = useState<string | null | undefined>();
+  const [fetchingCommits, setFetchingCommits] = useState(false);
+  const isMounted = useIsMounted();
+  const dispatch = useDispatch<ThunkDispatch>();
+
+  // The task only includes its most recent commits; the rest are fetched a
+  // page at a time. Pages may overlap the recent commits, so drop duplicates.
+  const allCommits = uniqBy([...commits, ...olderCommits], 'id');
+  const hasMore = Boolean(
+    taskId && count && count > allCommits.length && nextUrl !== null,
+  );
+
+  const fetchMoreCommits = async () => {
+    /* istanbul ignore if */
+    if (!taskId) {
+      return;
+    }
+    setFetchingCommits(true);
+    try {
+      const response = await apiFetch({
+        url: nextUrl || window.api_urls.task_commits(taskId),
+        dispatch,
+      });
+      /* istanbul ignore else */
+      if (isMounted.current && response) {
+        setOlderCommits([...olderCommits, ...response.results]);
+        setNextUrl(response.next);
+      }
+    } finally {
+      /* istanbul ignore else */
+      if (isMounted.current) {
+        setFetchingCommits(false);
+      }
+    }
+  };
+
+  return allCommits.length ? (
     <>
       <h2
         className="slds-text-heading_medium
@@ -105,7 +160,7 @@ const CommitList = ({ commits }: { commits: Commit[] }) =>
         Commit History
       </h2>
       <DataTable
-        items={commits}
+        items={allCommits}
         id="task-commits-table"
         className="slds-table_header-hidden"
         noRowHover
@@ -144,7 +199,18 @@ const CommitList = ({ commits }: { commits: Commit[] }) =>
           <TimestampTableCell />
         </DataTableColumn>
       </DataTable>
+      {hasMore ? (
+        <div className="slds-m-top_large">
+          <Button
+            label={
+              fetchingCommits ? <LabelWithSpinner /> : i18n.t('Load More')
+            }
+            onClick={fetchMoreCommits}
+          />
+        </div>
+      ) : null}
     </>
   ) : null;
+};
 
 export default CommitList;
@@ -22,7 +22,7 @@ import {
   OrgTypes,
   SHOW_EPIC_COLLABORATORS,
 } from '~js/utils/constants';
-import { getTaskCommits } from '~js/utils/helpers';
+import { getCommitsBehind, getTaskCommits } from '~js/utils/helpers';
 import { logError } from '~js/utils/logging';
 
 interface OrgCardProps {
@@ -147,7 +147,7 @@ const OrgCard = ({
   }, [epicUrl]); // eslint-disable-line react-hooks/exhaustive-deps
 
   const taskCommits = getTaskCommits(task);
-  const orgCommitIdx = org ? taskCommits.indexOf(org.latest_commit) : -1;
+  const orgCommitIdx = org ? getCommitsBehind(task, org.latest_commit) : -1;
   // We consider an org out-of-date if it is not based on the first commit.
   const testOrgOutOfDate = Boolean(
     type === ORG_TYPES.QA && org && orgCommitIdx !== 0,
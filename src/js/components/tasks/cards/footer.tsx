@@ -33,6 +33,19 @@ const Footer = ({
   );
 
   if (isCreating || isRefreshingOrg) {
+    if (org?.flow_progress) {
+      return (
+        <>
+          {loadingMsg}
+          <div
+            className="slds-p-top_small slds-truncate"
+            title={org.flow_progress}
+          >
+            {org.flow_progress}
+          </div>
+        </>
+      );
+    }
     return loadingMsg;
   }
   if (isDeleting) {
@@ -51,7 +51,7 @@ import {
   REVIEW_STATUSES,
   TASK_STATUSES,
 } from '~js/utils/constants';
-import { getBranchLink, getTaskCommits } from '~js/utils/helpers';
+import { getBranchLink, getCommitsBehind } from '~js/utils/helpers';
 import routes from '~js/utils/routes';
 
 const TaskDetail = (props: RouteComponentProps) => {
@@ -151,10 +151,10 @@ const TaskDetail = (props: RouteComponentProps) => {
   }
   const readyToCaptureChanges: boolean = userIsDevOwner && orgHasChanges;
   const orgHasBeenVisited = Boolean(userIsDevOwner && devOrg?.has_been_visited);
-  const taskCommits = task ? getTaskCommits(task) : [];
   const testOrgOutOfDate = Boolean(
-    testOrg?.is_created &&
-      taskCommits.indexOf(testOrg.latest_commit || '') !== 0,
+    task &&
+      testOrg?.is_created &&
+      getCommitsBehind(task, testOrg.latest_commit) !== 0,
   );
   const testOrgReadyForReview = Boolean(
     task?.pr_is_open &&
@@ -644,7 +644,11 @@ const TaskDetail = (props: RouteComponentProps) => {
           redirect={epicUrl}
           handleClose={closeDeleteModal}
         />
-        <CommitList commits={task.commits} />
+        <CommitList
+          commits={task.commits}
+          count={task.commits_count}
+          taskId={task.id}
+        />
       </DetailPageLayout>
     </DocumentTitle>
   );
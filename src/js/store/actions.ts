@@ -76,6 +76,14 @@ interface ObjectRemoved {
   type: 'OBJECT_REMOVED';
   payload: Epic | Task;
 }
+interface ObjectsRemoved {
+  type: 'OBJECTS_REMOVED';
+  payload: {
+    objectType: ObjectTypes;
+    parent: string;
+    ids: string[];
+  };
+}
 
 export type ObjectsAction =
   | FetchObjectsStarted
@@ -88,7 +96,8 @@ export type ObjectsAction =
   | CreateUpdateObjectSucceeded
   | CreateUpdateObjectFailed
   | DeleteObjectAction
-  | ObjectRemoved;
+  | ObjectRemoved
+  | ObjectsRemoved;
 
 export type ObjectsActionType = ({
   objectType,
@@ -388,3 +397,10 @@ export const removeObject = (payload: Epic | Task): ObjectRemoved => ({
   type: 'OBJECT_REMOVED',
   payload,
 });
+
+export const removeObjects = (
+  payload: ObjectsRemoved['payload'],
+): ObjectsRemoved => ({
+  type: 'OBJECTS_REMOVED',
+  payload,
+});
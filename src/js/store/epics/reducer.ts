@@ -248,6 +248,20 @@ const reducer = (
         },
       };
     }
+    case 'OBJECTS_REMOVED': {
+      const { objectType, parent, ids } = action.payload;
+      const projectEpics = epics[parent];
+      if (objectType !== OBJECT_TYPES.EPIC || !projectEpics) {
+        return epics;
+      }
+      return {
+        ...epics,
+        [parent]: {
+          ...projectEpics,
+          epics: projectEpics.epics.filter((p) => !ids.includes(p.id)),
+        },
+      };
+    }
   }
   return epics;
 };
@@ -24,6 +24,10 @@ interface OrgUpdated {
   type: 'SCRATCH_ORG_UPDATE';
   payload: Org;
 }
+interface OrgFlowProgress {
+  type: 'SCRATCH_ORG_FLOW_PROGRESS';
+  payload: { org: Org; lines: string[] };
+}
 interface OrgDeleted {
   type: 'SCRATCH_ORG_DELETE';
   payload: Org | MinimalOrg;
@@ -62,6 +66,7 @@ export type OrgsAction =
   | OrgProvisionFailed
   | RefetchOrg
   | OrgUpdated
+  | OrgFlowProgress
   | OrgDeleted
   | OrgDeleteFailed
   | CommitEvent
@@ -198,6 +203,17 @@ export const updateOrg = (payload: Org): OrgUpdated => ({
   payload,
 });
 
+export const orgFlowProgress = ({
+  model,
+  lines,
+}: {
+  model: Org;
+  lines: string[];
+}): OrgFlowProgress => ({
+  type: 'SCRATCH_ORG_FLOW_PROGRESS',
+  payload: { org: model, lines },
+});
+
 export const updateFailed = ({
   model,
   message,
@@ -38,6 +38,8 @@ export interface Org extends MinimalOrg {
   has_been_visited: boolean;
   valid_target_directories: TargetDirectories;
   last_checked_unsaved_changes_at: string | null;
+  // Latest output of a running flow, only ever set client-side:
+  flow_progress?: string;
 }
 
 export interface TargetDirectories {
@@ -173,6 +175,20 @@ const reducer = (
         },
       };
     }
+    case 'SCRATCH_ORG_FLOW_PROGRESS': {
+      const { org, lines } = action.payload;
+      const taskOrgs = orgs[org.task] || {
+        [ORG_TYPES.DEV]: null,
+        [ORG_TYPES.QA]: null,
+      };
+      return {
+        ...orgs,
+        [org.task]: {
+          ...taskOrgs,
+          [org.org_type]: { ...org, flow_progress: lines[lines.length - 1] },
+        },
+      };
+    }
     case 'SCRATCH_ORG_PROVISION_FAILED':
     case 'SCRATCH_ORG_DELETE': {
       const org = action.payload;
@@ -188,6 +204,21 @@ const reducer = (
         },
       };
     }
+    case 'OBJECTS_REMOVED': {
+      const { objectType, parent, ids } = action.payload;
+      const taskOrgs = orgs[parent];
+      if (objectType !== OBJECT_TYPES.ORG || !taskOrgs) {
+        return orgs;
+      }
+      const remaining = { ...taskOrgs };
+      for (const orgType of [ORG_TYPES.DEV, ORG_TYPES.QA]) {
+        const org = remaining[orgType];
+        if (org && ids.includes(org.id)) {
+          remaining[orgType] = null;
+        }
+      }
+      return { ...orgs, [parent]: remaining };
+    }
     case 'REFETCH_ORG_STARTED':
     case 'REFETCH_ORG_SUCCEEDED':
     case 'REFETCH_ORG_FAILED': {
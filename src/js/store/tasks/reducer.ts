@@ -38,6 +38,7 @@ export interface Task {
   pr_url: string | null;
   pr_is_open: boolean;
   commits: Commit[];
+  commits_count: number;
   origin_sha: string;
   assigned_dev: GitHubUser | null;
   assigned_qa: GitHubUser | null;
@@ -207,6 +208,17 @@ const reducer = (
         [task.epic]: epicTasks.filter((t) => t.id !== task.id),
       };
     }
+    case 'OBJECTS_REMOVED': {
+      const { objectType, parent, ids } = action.payload;
+      const epicTasks = tasks[parent];
+      if (objectType !== OBJECT_TYPES.TASK || !epicTasks) {
+        return tasks;
+      }
+      return {
+        ...tasks,
+        [parent]: epicTasks.filter((t) => !ids.includes(t.id)),
+      };
+    }
   }
   return tasks;
 };
@@ -58,13 +58,25 @@ export const getBranchLink = (object: Task | Epic) => {
 export const getTaskCommits = (task: Task) => {
   // Get list of commit sha/ids, newest to oldest, ending with origin commit.
   // We consider an org out-of-date if it is not based on the first commit.
+  // The task only includes its most recent commits, so the origin commit
+  // only follows them if they are all there.
   const taskCommits = task.commits.map((c) => c.id);
-  if (task.origin_sha) {
+  if (task.origin_sha && taskCommits.length >= (task.commits_count || 0)) {
     taskCommits.push(task.origin_sha);
   }
   return taskCommits;
 };
 
+export const getCommitsBehind = (task: Task, sha?: string | null) => {
+  // Get number of commits `sha` is behind the latest task commit, or -1 if
+  // it is not a task commit we know of.
+  const idx = getTaskCommits(task).indexOf(sha || '');
+  if (idx === -1 && sha && sha === task.origin_sha) {
+    return task.commits_count;
+  }
+  return idx;
+};
+
 export const getPercentage = (complete: number, total: number) =>
   Math.floor((complete / total) * 100) || 0;
 
@@ -1,7 +1,7 @@
 import { ThunkDispatch } from 'redux-thunk';
 import Sockette from 'sockette';
 
-import { removeObject } from '~js/store/actions';
+import { removeObject, removeObjects } from '~js/store/actions';
 import {
   createEpicPR,
   createEpicPRFailed,
@@ -13,6 +13,7 @@ import {
   commitSucceeded,
   deleteFailed,
   deleteOrg,
+  orgFlowProgress,
   orgReassigned,
   orgReassignFailed,
   orgRefreshed,
@@ -165,6 +166,14 @@ interface OrgUpdatedEvent {
     originating_user_id: string | null;
   };
 }
+interface OrgFlowProgressEvent {
+  type: 'SCRATCH_ORG_FLOW_PROGRESS';
+  payload: {
+    model: Org;
+    lines: string[];
+    originating_user_id: null;
+  };
+}
 interface OrgUpdateFailedEvent {
   type: 'SCRATCH_ORG_FETCH_CHANGES_FAILED';
   payload: {
@@ -255,6 +264,15 @@ interface SoftDeletedEvent {
     originating_user_id: null;
   };
 }
+interface SoftDeletedManyEvent {
+  type: 'SOFT_DELETE_MANY';
+  payload: {
+    model: Project | Epic | Task;
+    object_type: ObjectTypes;
+    ids: string[];
+    originating_user_id: null;
+  };
+}
 type ModelEvent =
   | ProjectUpdatedEvent
   | ProjectUpdateErrorEvent
@@ -269,6 +287,7 @@ type ModelEvent =
   | OrgProvisionedEvent
   | OrgProvisionFailedEvent
   | OrgUpdatedEvent
+  | OrgFlowProgressEvent
   | OrgUpdateFailedEvent
   | OrgDeletedEvent
   | OrgDeleteFailedEvent
@@ -280,7 +299,8 @@ type ModelEvent =
   | OrgReassignFailedEvent
   | CommitSucceededEvent
   | CommitFailedEvent
-  | SoftDeletedEvent;
+  | SoftDeletedEvent
+  | SoftDeletedManyEvent;
 type EventType =
   | SubscriptionEvent
   | ModelEvent
@@ -325,6 +345,8 @@ export const getAction = (event: EventType) => {
       return hasModel(event) && provisionFailed(event.payload);
     case 'SCRATCH_ORG_UPDATE':
       return hasModel(event) && updateOrg(event.payload.model);
+    case 'SCRATCH_ORG_FLOW_PROGRESS':
+      return hasModel(event) && orgFlowProgress(event.payload);
     case 'SCRATCH_ORG_FETCH_CHANGES_FAILED':
       return hasModel(event) && updateFailed(event.payload);
     case 'SCRATCH_ORG_DELETE':
@@ -349,6 +371,15 @@ export const getAction = (event: EventType) => {
       return hasModel(event) && orgReassignFailed(event.payload);
     case 'SOFT_DELETE':
       return hasModel(event) && removeObject(event.payload.model);
+    case 'SOFT_DELETE_MANY':
+      return (
+        hasModel(event) &&
+        removeObjects({
+          objectType: event.payload.object_type,
+          parent: event.payload.model.id,
+          ids: event.payload.ids,
+        })
+      );
   }
   return null;
 };
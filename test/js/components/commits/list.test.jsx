@@ -1,31 +1,36 @@
-import { render } from '@testing-library/react';
+import { fireEvent } from '@testing-library/react';
+import fetchMock from 'fetch-mock';
 import React from 'react';
 
 import CommitList from '~js/components/commits/list';
 
+import { renderWithRedux, storeWithThunk } from '../../utils';
+
+const makeCommit = (id, message = 'This is a commit') => ({
+  id,
+  timestamp: '2019-12-09 12:24',
+  message,
+  author: {
+    name: 'Author',
+    email: 'author@example.com',
+    username: 'author123',
+    avatar_url: 'https://example.com/avatar.png',
+  },
+  url: `https://example.com/commit/${id}`,
+});
+
 describe('<CommitList/>', () => {
+  const setup = (props) =>
+    renderWithRedux(<CommitList {...props} />, {}, storeWithThunk);
+
   test('renders a table of commits', () => {
-    const commits = [
-      {
-        id: 'abc123def456',
-        timestamp: '2019-12-09 12:24',
-        message: 'This is a commit',
-        author: {
-          name: 'Author',
-          email: 'author@example.com',
-          username: 'author123',
-          avatar_url: 'https://example.com/avatar.png',
-        },
-        url: 'https://example.com/commit/abc123def456',
-      },
-    ];
-    const { getByText, getAllByTitle } = render(
-      <CommitList commits={commits} />,
-    );
+    const commits = [makeCommit('abc123def456')];
+    const { getByText, getAllByTitle, queryByText } = setup({ commits });
 
     expect(getByText('abc123d')).toBeVisible();
     expect(getByText('This is a commit')).toBeVisible();
     expect(getAllByTitle('author123 (Author)')).toHaveLength(2);
+    expect(queryByText('Load More')).toBeNull();
   });
 
   test('combines author username/name if identical', () => {
@@ -42,14 +47,46 @@ describe('<CommitList/>', () => {
         url: 'https://example.com/commit/abc123def456',
       },
     ];
-    const { getByTitle } = render(<CommitList commits={commits} />);
+    const { getByTitle } = setup({ commits });
 
     expect(getByTitle('author123')).toBeVisible();
   });
 
   test('does not render if list is empty', () => {
-    const { container } = render(<CommitList commits={[]} />);
+    const { container } = setup({ commits: [] });
 
     expect(container).toBeEmpty();
   });
+
+  describe('Load More click', () => {
+    test('fetches older commits a page at a time', async () => {
+      const url = window.api_urls.task_commits('task-id');
+      fetchMock.getOnce(url, {
+        next: `${url}?page=2`,
+        results: [makeCommit('newest'), makeCommit('older', 'Older commit')],
+      });
+      fetchMock.getOnce(`${url}?page=2`, {
+        next: null,
+        results: [makeCommit('oldest', 'Oldest commit')],
+      });
+      const { findByText, getByText, queryByText } = setup({
+        commits: [makeCommit('newest')],
+        count: 3,
+        taskId: 'task-id',
+      });
+      fireEvent.click(getByText('Load More'));
+
+      expect.assertions(4);
+      await findByText('Older commit');
+
+      expect(getByText('Load More')).toBeVisible();
+
+      fireEvent.click(getByText('Load More'));
+      await findByText('Oldest commit');
+
+      expect(getByText('Oldest commit')).toBeVisible();
+      expect(queryByText('Load More')).toBeNull();
+      expect(fetchMock.calls()).toHaveLength(2);
+    });
+  });
 });
@@ -696,6 +696,21 @@ describe('<OrgCards/>', () => {
       expect(getByText('Creating Org…')).toBeVisible();
     });
 
+    test('shows progress of currently creating', () => {
+      const { getByText } = setup({
+        orgs: {
+          ...defaultOrgs,
+          Dev: {
+            ...defaultOrgs.Dev,
+            is_created: false,
+            flow_progress: 'Running task: deploy',
+          },
+        },
+      });
+
+      expect(getByText('Running task: deploy')).toBeVisible();
+    });
+
     describe('connected to global devhub', () => {
       test('creates a new org', () => {
         const { getByText } = setup({
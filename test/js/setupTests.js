@@ -33,6 +33,7 @@ beforeAll(() => {
     task_create_pr: (id) => `/api/tasks/${id}/create_pr/`,
     task_review: (id) => `/api/tasks/${id}/review/`,
     task_can_reassign: (id) => `/api/tasks/${id}/can_reassign/`,
+    task_commits: (id) => `/api/tasks/${id}/commits/`,
     epic_detail: (id) => `/api/epics/${id}/`,
     epic_create_pr: (id) => `/api/epics/${id}/create_pr/`,
     epic_refresh_org_config_names: (id) =>
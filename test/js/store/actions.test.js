@@ -803,3 +803,12 @@ describe('removeObject', () => {
     expect(actions.removeObject(epic)).toEqual(expected);
   });
 });
+
+describe('removeObjects', () => {
+  test('returns OBJECTS_REMOVED action', () => {
+    const payload = { objectType: 'task', parent: 'epic-id', ids: ['task-id'] };
+    const expected = { type: 'OBJECTS_REMOVED', payload };
+
+    expect(actions.removeObjects(payload)).toEqual(expected);
+  });
+});
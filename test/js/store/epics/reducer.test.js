@@ -703,4 +703,35 @@ describe('reducer', () => {
       expect(actual).toEqual(initial);
     });
   });
+
+  describe('OBJECTS_REMOVED', () => {
+    const epic = { id: 'e1', project: 'project-1' };
+    const epic2 = { id: 'e2', project: 'project-1' };
+    const initial = {
+      'project-1': {
+        epics: [epic, epic2],
+        next: null,
+        notFound: [],
+        fetched: true,
+      },
+    };
+
+    test('removes epics', () => {
+      const actual = reducer(initial, {
+        type: 'OBJECTS_REMOVED',
+        payload: { objectType: 'epic', parent: 'project-1', ids: ['e1'] },
+      });
+
+      expect(actual['project-1'].epics).toEqual([epic2]);
+    });
+
+    test('ignores unknown project', () => {
+      const actual = reducer(initial, {
+        type: 'OBJECTS_REMOVED',
+        payload: { objectType: 'epic', parent: 'project-2', ids: ['e1'] },
+      });
+
+      expect(actual).toEqual(initial);
+    });
+  });
 });
@@ -253,6 +253,20 @@ describe('updateOrg', () => {
   });
 });
 
+describe('orgFlowProgress', () => {
+  test('returns SCRATCH_ORG_FLOW_PROGRESS action', () => {
+    const org = { id: 'org-id' };
+    const expected = {
+      type: 'SCRATCH_ORG_FLOW_PROGRESS',
+      payload: { org, lines: ['Running task: deploy'] },
+    };
+
+    expect(
+      actions.orgFlowProgress({ model: org, lines: ['Running task: deploy'] }),
+    ).toEqual(expected);
+  });
+});
+
 describe('updateFailed', () => {
   test('adds error message', () => {
     const store = storeWithThunk({
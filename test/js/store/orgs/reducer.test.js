@@ -565,4 +565,54 @@ describe('reducer', () => {
       expect(actual).toEqual(expected);
     });
   });
+
+  describe('SCRATCH_ORG_FLOW_PROGRESS', () => {
+    test('stores latest line of progress', () => {
+      const org = { id: 'org-1', task: 'task-1', org_type: 'Dev' };
+      const expected = {
+        'task-1': { Dev: { ...org, flow_progress: 'Running task: deploy' } },
+      };
+      const actual = reducer(
+        { 'task-1': { Dev: org } },
+        {
+          type: 'SCRATCH_ORG_FLOW_PROGRESS',
+          payload: { org, lines: ['Starting flow', 'Running task: deploy'] },
+        },
+      );
+
+      expect(actual).toEqual(expected);
+    });
+  });
+
+  describe('OBJECTS_REMOVED', () => {
+    const devOrg = { id: 'org-1', task: 'task-1', org_type: 'Dev' };
+    const qaOrg = { id: 'org-2', task: 'task-1', org_type: 'QA' };
+
+    test('removes orgs', () => {
+      const expected = { 'task-1': { Dev: null, QA: qaOrg } };
+      const actual = reducer(
+        { 'task-1': { Dev: devOrg, QA: qaOrg } },
+        {
+          type: 'OBJECTS_REMOVED',
+          payload: {
+            objectType: 'scratch_org',
+            parent: 'task-1',
+            ids: ['org-1'],
+          },
+        },
+      );
+
+      expect(actual).toEqual(expected);
+    });
+
+    test('ignores other object types', () => {
+      const initial = { 'task-1': { Dev: devOrg, QA: qaOrg } };
+      const actual = reducer(initial, {
+        type: 'OBJECTS_REMOVED',
+        payload: { objectType: 'task', parent: 'task-1', ids: ['org-1'] },
+      });
+
+      expect(actual).toEqual(initial);
+    });
+  });
 });
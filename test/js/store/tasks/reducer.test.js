@@ -471,4 +471,32 @@ describe('reducer', () => {
       expect(actual).toEqual(initial);
     });
   });
+
+  describe('OBJECTS_REMOVED', () => {
+    const task = { id: 't1', epic: 'epic-1' };
+    const task2 = { id: 't2', epic: 'epic-1' };
+    const task3 = { id: 't3', epic: 'epic-1' };
+
+    test('removes tasks', () => {
+      const actual = reducer(
+        { 'epic-1': [task, task2, task3] },
+        {
+          type: 'OBJECTS_REMOVED',
+          payload: { objectType: 'task', parent: 'epic-1', ids: ['t1', 't3'] },
+        },
+      );
+
+      expect(actual['epic-1']).toEqual([task2]);
+    });
+
+    test('ignores other object types', () => {
+      const initial = { 'epic-1': [task, task2] };
+      const actual = reducer(initial, {
+        type: 'OBJECTS_REMOVED',
+        payload: { objectType: 'epic', parent: 'epic-1', ids: ['t1'] },
+      });
+
+      expect(actual).toEqual(initial);
+    });
+  });
 });
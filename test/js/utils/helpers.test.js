@@ -33,6 +33,32 @@ describe('getBranchLink', () => {
   );
 });
 
+describe('getCommitsBehind', () => {
+  const task = {
+    commits: [{ id: 'newest' }, { id: 'older' }],
+    commits_count: 2,
+    origin_sha: 'origin',
+  };
+
+  test.each([
+    ['newest', 0],
+    ['older', 1],
+    ['origin', 2],
+    ['unknown', -1],
+    [null, -1],
+  ])('returns commits behind for %s', (sha, expected) => {
+    expect(helpers.getCommitsBehind(task, sha)).toEqual(expected);
+  });
+
+  test('counts commits missing from the task', () => {
+    const partialTask = { ...task, commits_count: 30 };
+
+    expect(helpers.getTaskCommits(partialTask)).toEqual(['newest', 'older']);
+    expect(helpers.getCommitsBehind(partialTask, 'origin')).toEqual(30);
+    expect(helpers.getCommitsBehind(partialTask, 'unknown')).toEqual(-1);
+  });
+});
+
 describe('splitChangeset', () => {
   test('removes members of one changeset from another', () => {
     const changeset1 = {
@@ -1,6 +1,6 @@
 import Sockette from 'sockette';
 
-import { removeObject } from '~js/store/actions';
+import { removeObject, removeObjects } from '~js/store/actions';
 import {
   createEpicPR,
   createEpicPRFailed,
@@ -11,6 +11,7 @@ import {
   commitSucceeded,
   deleteFailed,
   deleteOrg,
+  orgFlowProgress,
   orgReassigned,
   orgReassignFailed,
   orgRefreshed,
@@ -51,6 +52,7 @@ const actions = {
   createTaskPRFailed,
   deleteFailed,
   deleteOrg,
+  orgFlowProgress,
   orgReassigned,
   orgReassignFailed,
   orgRefreshed,
@@ -113,6 +115,7 @@ describe('getAction', () => {
     ['SCRATCH_ORG_PROVISION', 'provisionOrg', false],
     ['SCRATCH_ORG_PROVISION_FAILED', 'provisionFailed', false],
     ['SCRATCH_ORG_UPDATE', 'updateOrg', true],
+    ['SCRATCH_ORG_FLOW_PROGRESS', 'orgFlowProgress', false],
     ['SCRATCH_ORG_FETCH_CHANGES_FAILED', 'updateFailed', false],
     ['SCRATCH_ORG_DELETE', 'deleteOrg', false],
     ['SCRATCH_ORG_REMOVE', 'deleteOrg', false],
@@ -134,6 +137,26 @@ describe('getAction', () => {
     expect(actions[action]).toHaveBeenCalledWith(expected);
   });
 
+  describe('SOFT_DELETE_MANY', () => {
+    test('calls removeObjects', () => {
+      const event = {
+        type: 'SOFT_DELETE_MANY',
+        payload: {
+          model: { id: 'epic-1' },
+          object_type: 'task',
+          ids: ['task-1', 'task-2'],
+        },
+      };
+      sockets.getAction(event);
+
+      expect(removeObjects).toHaveBeenCalledWith({
+        objectType: 'task',
+        parent: 'epic-1',
+        ids: ['task-1', 'task-2'],
+      });
+    });
+  });
+
   describe('USER_REPOS_REFRESH', () => {
     test('calls projectsRefreshed', () => {
       const event = { type: 'USER_REPOS_REFRESH' };